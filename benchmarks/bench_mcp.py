@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Concurrent load and latency benchmark for the /mcp flow
+
+Simulates many test takers, each running a full session: start, answer
+every question (stepping back once and re-answering along the way), then
+ask for results. By default the FastAPI app is driven in-process over
+ASGI; use --spawn to benchmark a locally started server over HTTP, or
+--url for one that is already running.
+
+Reports throughput, p50/p95/p99 latency per command and RSS growth per
+10k sessions, and writes them to a JSON file for comparing releases.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from common import SERVER_DIR, start_server, summarize
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process (default: this one), from /proc"""
+    with open(f"/proc/{pid or 'self'}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+REQUESTS = {
+    "action": {
+        "start": lambda: {"action": "start"},
+        "answer": lambda answer: {"action": "answer", "value": answer},
+        "back": lambda: {"action": "back"},
+        "results": lambda: {"action": "results"}
+    },
+    "text": {
+        "start": lambda: {"query": "start test"},
+        "answer": lambda answer: {"query": f"answer: {answer}"},
+        "back": lambda: {"query": "back"},
+        "results": lambda: {"query": "results"}
+    }
+}
+
+
+async def run_session(http: httpx.AsyncClient, session_id: str, num_questions: int, protocol: str,
+                      latencies: Dict[str, List[float]], errors: List[str]):
+    """Run one full test session, recording the latency of every request"""
+    requests = REQUESTS[protocol]
+    context = {"session_id": session_id}
+    back_at = random.randint(2, num_questions)
+
+    async def send(command: str, payload: Dict[str, Any]):
+        payload["context"] = context
+        started = time.perf_counter()
+        response = await http.post("/mcp", json=payload)
+        latencies[command].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(f"{command}: HTTP {response.status_code}")
+
+    await send("start", requests["start"]())
+    for number in range(1, num_questions + 1):
+        await send("answer", requests["answer"](random.randint(1, 5)))
+        if number == back_at - 1:
+            await send("back", requests["back"]())
+            await send("answer", requests["answer"](random.randint(1, 5)))
+    await send("results", requests["results"]())
+
+
+async def run_benchmark(http: httpx.AsyncClient, sessions: int, concurrency: int, num_questions: int,
+                        protocol: str, rss) -> Dict[str, Any]:
+    """Run all sessions with bounded concurrency and collect the measurements"""
+    latencies: Dict[str, List[float]] = {"start": [], "answer": [], "back": [], "results": []}
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(index: int):
+        async with semaphore:
+            await run_session(http, f"bench-{index}", num_questions, protocol, latencies, errors)
+
+    rss_before = rss()
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    rss_after = rss()
+
+    total_requests = sum(len(values) for values in latencies.values())
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "protocol": protocol,
+        "elapsed_s": elapsed,
+        "requests": total_requests,
+        "requests_per_s": total_requests / elapsed,
+        "sessions_per_s": sessions / elapsed,
+        "errors": len(errors),
+        "rss_before_bytes": rss_before,
+        "rss_after_bytes": rss_after,
+        "rss_growth_per_10k_sessions_bytes": (rss_after - rss_before) * 10000 / sessions,
+        "latency": summarize(latencies)
+    }
+
+
+async def get_total_questions(base_url: str) -> int:
+    """Ask a running server how many questions a test has"""
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        response = await http.post("/mcp", json={"action": "start", "context": {"session_id": "bench-probe"}})
+        return response.json()["context"]["total_questions"]
+
+
+async def main_async(args) -> Dict[str, Any]:
+    """Benchmark the in-process app, a spawned server or a remote one"""
+    server = None
+    if args.spawn:
+        server = start_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    else:
+        base_url = args.url
+
+    try:
+        if base_url:
+            transport = None
+            # RSS can only be measured for a server started here
+            rss = (lambda: rss_bytes(server.pid)) if server else (lambda: 0)
+            num_questions = await get_total_questions(base_url)
+            mode = "spawned" if server else "remote"
+        else:
+            sys.path.insert(0, SERVER_DIR)
+            import app
+            # The app enables INFO logging, which would log every benchmark request
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            transport = httpx.ASGITransport(app=app.app)
+            base_url = "http://benchmark"
+            rss = rss_bytes
+            num_questions = app.default_runtime.total
+            mode = "in-process"
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30.0) as http:
+            results = await run_benchmark(http, args.sessions, args.concurrency, num_questions, args.protocol, rss)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    results["mode"] = mode
+    return results
+
+
+def main():
+    """Run the benchmark and write its results"""
+    parser = argparse.ArgumentParser(description="Benchmark the personality test /mcp flow")
+    parser.add_argument("--sessions", type=int, default=2000, help="Number of test sessions to run")
+    parser.add_argument("--concurrency", type=int, default=100, help="Sessions in flight at once")
+    parser.add_argument("--protocol", choices=["action", "text"], default="action",
+                        help="Send structured actions or free-text queries")
+    parser.add_argument("--url", help="Benchmark an already running server instead of the in-process app")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server and benchmark it over HTTP")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for answers")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = asyncio.run(main_async(args))
+    results["python"] = platform.python_version()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{results['mode']}: {results['sessions']} sessions, {results['requests']} requests in "
+          f"{results['elapsed_s']:.2f}s ({results['requests_per_s']:.0f} req/s, {results['errors']} errors)")
+    for command, stats in results["latency"].items():
+        print(f"  {command:8} n={stats['count']:<7} p50={stats['p50_ms']:.2f}ms "
+              f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    print(f"  RSS growth per 10k sessions: {results['rss_growth_per_10k_sessions_bytes'] / 1024:.0f} KiB")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Overhead of the metrics middleware per request
+
+Drives a minimal ASGI app directly (no HTTP, no FastAPI) with and without
+MetricsMiddleware in front of it, so the difference is the cost of timing
+and recording one request.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+sys.path.insert(0, SERVER_DIR)
+
+from metrics import COMMAND_SCOPE_KEY, Metrics, MetricsMiddleware  # noqa: E402
+from questionnaire import PERSONALITY_TYPES  # noqa: E402
+
+BODY = b'{"response":"ok","context":{"session_id":"bench"}}'
+
+
+async def endpoint(scope, receive, send):
+    """Smallest app that labels the request and answers it"""
+    scope[COMMAND_SCOPE_KEY] = "answer"
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def time_requests(app, requests: int) -> float:
+    """Seconds per request for the given app"""
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "POST", "path": "/mcp"}, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def main_async(requests: int, rounds: int):
+    plain = endpoint
+    instrumented = MetricsMiddleware(endpoint, Metrics(PERSONALITY_TYPES))
+    # Best of several rounds on each side, to filter out scheduling noise
+    plain_times, instrumented_times = [], []
+    for _ in range(rounds):
+        plain_times.append(await time_requests(plain, requests))
+        instrumented_times.append(await time_requests(instrumented, requests))
+
+    base, with_metrics = min(plain_times), min(instrumented_times)
+    print(f"without metrics: {base * 1e6:.2f} us/request")
+    print(f"with metrics:    {with_metrics * 1e6:.2f} us/request")
+    print(f"overhead:        {(with_metrics - base) * 1e6:.2f} us/request")
+
+
+def main():
+    """Measure the middleware overhead"""
+    parser = argparse.ArgumentParser(description="Measure the metrics middleware overhead per request")
+    parser.add_argument("--requests", type=int, default=200000, help="Requests per round")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds to take the best of")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Throughput of batch persona generation against the local Ollama stub
+
+Runs the same batch of (personality type, prompt) jobs through the batch
+dispatcher in a few configurations against client/ollama_stub.py, with
+simulated prompt evaluation cost, prefix caching in a few slots and a share
+of requests failed with 503: one job at a time in input order (like the
+interactive integration), concurrently in input order, and concurrently
+grouped by persona prompt. Reports jobs per second, latency percentiles,
+retries and the prompt characters the stub had to evaluate.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from typing import Any, Dict, List
+
+from common import CLIENT_DIR, percentile
+
+sys.path.insert(0, CLIENT_DIR)
+
+from ollama_batch import OllamaBatchDispatcher  # noqa: E402
+from ollama_stub import OllamaStub  # noqa: E402
+from personas import PERSONA_PROMPTS  # noqa: E402
+
+
+def run_batch(args, jobs: List[Dict[str, Any]], concurrency: int, group: bool) -> Dict[str, Any]:
+    """Run the jobs against a fresh stub and summarize the run"""
+    stub = OllamaStub(first_token_delay=args.first_token_delay, prompt_delay=args.prompt_delay,
+                      slots=args.slots, error_rate=args.error_rate, seed=args.seed).start()
+    uncached: List[int] = []
+    evaluate_prompt = stub.evaluate_prompt
+
+    def counting_evaluate_prompt(messages):
+        characters = evaluate_prompt(messages)
+        uncached.append(characters)
+        return characters
+
+    stub.evaluate_prompt = counting_evaluate_prompt
+    latencies: List[float] = []
+    dispatcher = OllamaBatchDispatcher(stub.url, model="stub", concurrency=concurrency, backoff=0.01,
+                                       group=group)
+    try:
+        summary = asyncio.run(dispatcher.run(jobs, lambda result: latencies.append(result["latency_s"])))
+    finally:
+        stub.stop()
+    latencies.sort()
+    summary.update({
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "prompt_chars_evaluated": sum(uncached)
+    })
+    return summary
+
+
+def main():
+    """Compare sequential, concurrent and grouped batch generation"""
+    parser = argparse.ArgumentParser(description="Measure batch persona generation throughput against a stub")
+    parser.add_argument("--jobs", type=int, default=400, help="Number of jobs")
+    parser.add_argument("--concurrency", type=int, default=16, help="Chats in flight for the concurrent runs")
+    parser.add_argument("--slots", type=int, default=4, help="Prompt cache slots of the stub")
+    parser.add_argument("--first-token-delay", type=float, default=0.02, help="Fixed stub delay per chat")
+    parser.add_argument("--prompt-delay", type=float, default=0.0001,
+                        help="Stub delay per prompt character not covered by a cached prefix")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of chats the stub fails with 503")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for job types")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    types = list(PERSONA_PROMPTS)
+    jobs = [{"id": index, "personality_type": rng.choice(types), "prompt": f"Write a welcome message for user {index}"}
+            for index in range(args.jobs)]
+
+    results = {
+        "sequential": run_batch(args, jobs, concurrency=1, group=False),
+        "concurrent": run_batch(args, jobs, concurrency=args.concurrency, group=False),
+        "grouped": run_batch(args, jobs, concurrency=args.concurrency, group=True)
+    }
+    for name, stats in results.items():
+        print(f"{name:10} {stats['jobs_per_s']:.1f} jobs/s p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms "
+              f"completed={stats['completed']} failed={stats['failed']} retries={stats['retries']} "
+              f"prompt chars evaluated={stats['prompt_chars_evaluated']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Time to first token of persona chats against the local Ollama stub
+
+Runs a series of short chats, each for a user of a random personality type,
+against client/ollama_stub.py with simulated prompt evaluation cost and
+prefix caching. Each run is done twice: once sending chats cold, and once
+warming up each persona prompt before its first chat. Reports time to first
+token percentiles for first turns and follow-up turns of both runs.
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, List
+
+from common import CLIENT_DIR, percentile
+
+sys.path.insert(0, CLIENT_DIR)
+
+from ollama_integration import ConversationWindow, OllamaPersonalityIntegration  # noqa: E402
+from ollama_stub import OllamaStub  # noqa: E402
+from personas import PERSONA_PROMPTS, persona_prompt  # noqa: E402
+
+
+def run_chats(args, warm: bool) -> Dict[str, Dict[str, float]]:
+    """Run all chats against a fresh stub and summarize their time to first token"""
+    stub = OllamaStub(first_token_delay=args.first_token_delay, prompt_delay=args.prompt_delay,
+                      slots=args.slots).start()
+    OllamaPersonalityIntegration._warmed_prefixes.clear()
+    rng = random.Random(args.seed)
+    types = list(PERSONA_PROMPTS)
+    ttft: Dict[str, List[float]] = {"first_turn": [], "later_turns": []}
+    try:
+        for user in range(args.chats):
+            integration = OllamaPersonalityIntegration(stub.url, model="stub")
+            system_prompt = persona_prompt(rng.choice(types))
+            if warm:
+                integration.warm_up(system_prompt)
+            window = ConversationWindow(system_prompt, args.context_chars)
+            for turn in range(args.turns):
+                integration.send_message(window, f"user {user} turn {turn}: {'lorem ipsum ' * 8}")
+                ttft["first_turn" if turn == 0 else "later_turns"].append(integration.last_ttft)
+    finally:
+        stub.stop()
+
+    summary = {}
+    for name, values in ttft.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "mean_ms": sum(values) / max(len(values), 1) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "max_ms": values[-1] * 1000 if values else 0.0
+        }
+    return summary
+
+
+def main():
+    """Compare cold and warmed-up persona chats"""
+    parser = argparse.ArgumentParser(description="Measure time to first token of persona chats against a stub")
+    parser.add_argument("--chats", type=int, default=48, help="Number of chats to run")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per chat")
+    parser.add_argument("--slots", type=int, default=64,
+                        help="Prompt cache slots of the stub; with fewer slots than chats, cached personas get evicted")
+    parser.add_argument("--first-token-delay", type=float, default=0.005, help="Fixed stub delay before the first token")
+    parser.add_argument("--prompt-delay", type=float, default=0.0001,
+                        help="Stub delay per prompt character not covered by a cached prefix")
+    parser.add_argument("--context-chars", type=int, default=8000, help="Conversation window budget")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for persona choice")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"cold": run_chats(args, warm=False), "warm": run_chats(args, warm=True)}
+    for mode, summary in results.items():
+        for name, stats in summary.items():
+            print(f"{mode:5} {name:12} n={stats['count']:<5} mean={stats['mean_ms']:.1f}ms p50={stats['p50_ms']:.1f}ms "
+                  f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Overload scenario: new sessions arriving at twice the server's capacity
+
+First measures capacity, the rate of full sessions (start, answer every
+question, results) a spawned server sustains with a fixed number of
+sessions in flight. Then, once without and once with admission control,
+starts new sessions at random (Poisson) arrival times at a multiple of that
+rate for a while, each running its full test as fast as replies come back.
+
+Reports the latency of requests of sessions already in progress (answers
+and results), how many new sessions were admitted or turned away with 503,
+and the rate of completed tests. Without admission control the server
+queues every arrival and in-progress latency grows for as long as the
+overload lasts; with it, excess sessions are turned away at the start and
+tail latency stays bounded.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from common import percentile, start_server
+
+
+class Run:
+    """Measurements of one scenario"""
+
+    def __init__(self):
+        self.in_progress: List[float] = []
+        self.starts: List[float] = []
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.errors = 0
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        self.in_progress.sort()
+        self.starts.sort()
+        return {
+            "elapsed_s": elapsed,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "completed_per_s": self.completed / elapsed,
+            "errors": self.errors,
+            "in_progress_p50_ms": percentile(self.in_progress, 50) * 1000,
+            "in_progress_p99_ms": percentile(self.in_progress, 99) * 1000,
+            "in_progress_max_ms": (self.in_progress[-1] if self.in_progress else 0.0) * 1000,
+            "start_p99_ms": percentile(self.starts, 99) * 1000
+        }
+
+
+async def run_session(http: httpx.AsyncClient, session_id: str, run: Run):
+    """Run one full test, recording whether it was admitted and the latency of its requests"""
+    context = {"session_id": session_id}
+    try:
+        started = time.perf_counter()
+        response = await http.post("/mcp", json={"action": "start", "context": context})
+        run.starts.append(time.perf_counter() - started)
+        if response.status_code == 503:
+            run.rejected += 1
+            return
+        response.raise_for_status()
+        run.admitted += 1
+        completed = False
+        while not completed:
+            started = time.perf_counter()
+            response = await http.post("/mcp", json={"action": "answer", "value": random.randint(1, 5),
+                                                     "context": context})
+            run.in_progress.append(time.perf_counter() - started)
+            response.raise_for_status()
+            completed = response.json()["context"].get("completed", False)
+        started = time.perf_counter()
+        response = await http.post("/mcp", json={"action": "results", "context": context})
+        run.in_progress.append(time.perf_counter() - started)
+        response.raise_for_status()
+        run.completed += 1
+    except httpx.HTTPError:
+        run.errors += 1
+
+
+async def measure_capacity(base_url: str, concurrency: int, duration: float) -> float:
+    """Completed sessions per second with a fixed number of sessions in flight"""
+    run = Run()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(1 << 62))
+
+    async def worker(http: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            await run_session(http, f"capacity-{next(counter)}", run)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(http) for _ in range(concurrency)))
+        return run.completed / (time.perf_counter() - started)
+
+
+async def open_loop(base_url: str, rate: float, duration: float, seed: int) -> Dict[str, Any]:
+    """Start sessions at Poisson arrival times at the given rate and wait for all of them to finish"""
+    rng = random.Random(seed)
+    run = Run()
+    tasks = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as http:
+        started = time.perf_counter()
+        next_arrival = started
+        index = 0
+        while next_arrival - started < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(run_session(http, f"overload-{index}", run)))
+            index += 1
+            next_arrival += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+        summary = run.summary(time.perf_counter() - started)
+    summary["offered"] = index
+    summary["offered_per_s"] = rate
+    return summary
+
+
+def main():
+    """Compare the server with and without admission control at a multiple of its capacity"""
+    parser = argparse.ArgumentParser(description="Tail latency of sessions in progress under overload")
+    parser.add_argument("--capacity", type=float, help="Sessions per second the server sustains; measured if omitted")
+    parser.add_argument("--load", type=float, default=2.0, help="Offered load as a multiple of capacity")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of arrivals per scenario")
+    parser.add_argument("--max-delay-ms", type=float, default=20.0,
+                        help="ADMISSION_MAX_DELAY_MS for the admission-controlled server")
+    parser.add_argument("--rate-fraction", type=float, default=0.9,
+                        help="ADMISSION_RATE as a fraction of capacity for the admission-controlled server")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the spawned servers")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for arrivals and answers")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    base_url = f"http://127.0.0.1:{args.port}"
+    capacity = args.capacity
+    if capacity is None:
+        server = start_server(args.port)
+        try:
+            capacity = asyncio.run(measure_capacity(base_url, concurrency=16, duration=5.0))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"capacity: {capacity:.1f} sessions/s")
+
+    scenarios = {
+        "unlimited": {},
+        "admission": {
+            "ADMISSION_RATE": str(capacity * args.rate_fraction),
+            "ADMISSION_BURST": str(max(1.0, capacity * args.rate_fraction / 4)),
+            "ADMISSION_MAX_DELAY_MS": str(args.max_delay_ms)
+        }
+    }
+    results: Dict[str, Any] = {"capacity_sessions_per_s": capacity, "load": args.load}
+    for name, env in scenarios.items():
+        server = start_server(args.port, {**os.environ, **env})
+        try:
+            results[name] = summary = asyncio.run(open_loop(base_url, capacity * args.load, args.duration, args.seed))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:9} offered={summary['offered']} admitted={summary['admitted']} rejected={summary['rejected']} "
+              f"completed/s={summary['completed_per_s']:.1f} errors={summary['errors']} "
+              f"in-progress p50={summary['in_progress_p50_ms']:.1f}ms p99={summary['in_progress_p99_ms']:.1f}ms "
+              f"max={summary['in_progress_max_ms']:.1f}ms start p99={summary['start_p99_ms']:.1f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
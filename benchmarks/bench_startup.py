@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cold start cost of the stdio and HTTP servers
+
+Starts each server from scratch a number of times and measures:
+
+- import time: how long importing the server module takes in a fresh interpreter
+- time to first response: from spawning the process to receiving the reply
+  to a first ``start`` command
+- idle RSS: resident memory of the server right after that first response
+
+The bare interpreter start-up time is reported alongside, as the floor none
+of the server code can go below. With --budget-ms, exits non-zero when the
+median stdio time to first response is over budget.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict
+
+import requests
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident set size of a process, from /proc"""
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def free_port() -> int:
+    """A port nothing is listening on"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def interpreter_ms() -> float:
+    """Wall time of starting and exiting a bare interpreter"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_ms(module: str) -> float:
+    """Time to import a server module in a fresh interpreter, as measured inside it"""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def first_response_stdio() -> Dict[str, float]:
+    """Spawn the stdio server, initialize it and start a test"""
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, os.path.join(SERVER_DIR, "mcp_stdio.py")], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, bufsize=1)
+    try:
+        messages = [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+             "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "bench", "version": "0"}}},
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "start_test", "arguments": {}}}
+        ]
+        server.stdin.write("".join(json.dumps(message) + "\n" for message in messages))
+        server.stdin.flush()
+        for _ in range(2):
+            reply = json.loads(server.stdout.readline())
+            if "error" in reply:
+                raise RuntimeError(reply["error"]["message"])
+        elapsed = time.perf_counter() - started
+        return {"first_response_ms": elapsed * 1000, "idle_rss_bytes": rss_bytes(server.pid)}
+    finally:
+        server.stdin.close()
+        server.wait(timeout=10)
+
+
+def first_response_http() -> Dict[str, float]:
+    """Spawn the HTTP server and start a test as soon as it accepts connections"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "app.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"]
+    )
+    try:
+        deadline = started + 30
+        while True:
+            try:
+                response = requests.post(f"http://127.0.0.1:{port}/mcp", json={"action": "start"}, timeout=5)
+                response.raise_for_status()
+                break
+            except requests.exceptions.ConnectionError:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("Server did not start within 30 seconds")
+                time.sleep(0.002)
+        elapsed = time.perf_counter() - started
+        return {"first_response_ms": elapsed * 1000, "idle_rss_bytes": rss_bytes(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def measure(module: str, first_response: Callable[[], Dict[str, float]], runs: int) -> Dict[str, Any]:
+    """Median and worst of each measurement over several cold starts"""
+    imports = [import_ms(module) for _ in range(runs)]
+    starts = [first_response() for _ in range(runs)]
+    ttfr = [start["first_response_ms"] for start in starts]
+    rss = [start["idle_rss_bytes"] for start in starts]
+    return {
+        "import_ms": statistics.median(imports),
+        "import_max_ms": max(imports),
+        "first_response_ms": statistics.median(ttfr),
+        "first_response_max_ms": max(ttfr),
+        "idle_rss_bytes": statistics.median(rss)
+    }
+
+
+def main():
+    """Measure cold starts of both transports"""
+    parser = argparse.ArgumentParser(description="Measure cold start time and idle memory of the servers")
+    parser.add_argument("--runs", type=int, default=10, help="Cold starts per transport")
+    parser.add_argument("--transport", choices=["stdio", "http", "all"], default="all", help="Transports to measure")
+    parser.add_argument("--budget-ms", type=float,
+                        help="Fail if the median stdio time to first response is above this many milliseconds")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"interpreter_ms": statistics.median(interpreter_ms() for _ in range(args.runs))}
+    if args.transport in ("stdio", "all"):
+        results["stdio"] = measure("mcp_stdio", first_response_stdio, args.runs)
+    if args.transport in ("http", "all"):
+        results["http"] = measure("app", first_response_http, args.runs)
+
+    print(f"interpreter {results['interpreter_ms']:.1f}ms")
+    for transport in ("stdio", "http"):
+        if transport in results:
+            stats = results[transport]
+            print(f"{transport:5} import={stats['import_ms']:.1f}ms (max {stats['import_max_ms']:.1f}ms) "
+                  f"first_response={stats['first_response_ms']:.1f}ms (max {stats['first_response_max_ms']:.1f}ms) "
+                  f"idle_rss={stats['idle_rss_bytes'] / 2**20:.1f}MiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget_ms is not None and "stdio" in results:
+        if results["stdio"]["first_response_ms"] > args.budget_ms:
+            print(f"stdio cold start is over the {args.budget_ms:.0f}ms budget", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
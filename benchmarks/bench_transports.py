@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Per-call latency of the stdio, HTTP and WebSocket transports
+
+Spawns the stdio server and the HTTP server locally and runs the same
+sequential full sessions over stdio, POST /mcp and the /ws endpoint: start,
+answer every question, then ask for results. Over WebSocket each session is
+one connection, opened by the start call. Every call waits for its reply
+before the next is sent, so the numbers are round-trip latency of a single
+local client rather than server throughput. Reports calls per second and
+latency percentiles.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import requests
+from websockets.sync.client import connect
+
+from common import SERVER_DIR, percentile, start_server
+
+
+def stdio_caller(server: subprocess.Popen) -> Callable[[str, Any, str], Dict[str, Any]]:
+    """Send one tools/call per action over the server's stdin and read its reply"""
+    tools = {"start": "start_test", "answer": "answer_question", "results": "get_results"}
+    ids = iter(range(1, 1 << 62))
+
+    def rpc(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        server.stdin.write(json.dumps({"jsonrpc": "2.0", "id": next(ids), "method": method, "params": params}) + "\n")
+        server.stdin.flush()
+        reply = json.loads(server.stdout.readline())
+        if "error" in reply:
+            raise RuntimeError(reply["error"]["message"])
+        return reply["result"]
+
+    rpc("initialize", {"protocolVersion": "2024-11-05", "capabilities": {},
+                       "clientInfo": {"name": "bench", "version": "0"}})
+    server.stdin.write(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}) + "\n")
+
+    def call(action: str, value: Any, session_id: str) -> Dict[str, Any]:
+        arguments = {"session_id": session_id}
+        if action == "answer":
+            arguments["answer"] = value
+        return rpc("tools/call", {"name": tools[action], "arguments": arguments})["structuredContent"]
+
+    return call
+
+
+def http_caller(base_url: str) -> Callable[[str, Any, str], Dict[str, Any]]:
+    """Post one /mcp request per action over a keep-alive connection"""
+    http = requests.Session()
+
+    def call(action: str, value: Any, session_id: str) -> Dict[str, Any]:
+        response = http.post(f"{base_url}/mcp", json={"action": action, "value": value,
+                                                      "context": {"session_id": session_id}})
+        response.raise_for_status()
+        return response.json()["context"]
+
+    return call
+
+
+def ws_caller(base_url: str) -> Callable[[str, Any, str], Dict[str, Any]]:
+    """Open a connection per session on start, send one short message per action and close after results"""
+    url = base_url.replace("http://", "ws://", 1) + "/ws"
+    connection = None
+
+    def call(action: str, value: Any, session_id: str) -> Dict[str, Any]:
+        nonlocal connection
+        if action == "start":
+            connection = connect(f"{url}?session_id={session_id}")
+        else:
+            connection.send(str(value) if action == "answer" else action)
+        reply = json.loads(connection.recv())
+        if action == "results":
+            connection.close()
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["context"]
+
+    return call
+
+
+def run_sessions(call: Callable[[str, Any, str], Dict[str, Any]], transport: str, sessions: int,
+                 seed: int) -> Dict[str, float]:
+    """Run full sessions one call at a time and summarize the call latencies"""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+
+    def timed(action: str, value: Any, session_id: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        context = call(action, value, session_id)
+        latencies.append(time.perf_counter() - started)
+        return context
+
+    started = time.perf_counter()
+    for index in range(sessions):
+        # Transports sharing a server must not resume each other's sessions
+        session_id = f"bench-{transport}-{index}"
+        context = timed("start", None, session_id)
+        while not context.get("completed"):
+            context = timed("answer", rng.randint(1, 5), session_id)
+        timed("results", None, session_id)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "calls_per_s": len(latencies) / elapsed,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p95_us": percentile(latencies, 95) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "max_us": latencies[-1] * 1e6
+    }
+
+
+def bench_stdio(args) -> Dict[str, float]:
+    """Benchmark a spawned stdio server"""
+    server = subprocess.Popen([sys.executable, os.path.join(SERVER_DIR, "mcp_stdio.py")], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, bufsize=1)
+    try:
+        return run_sessions(stdio_caller(server), "stdio", args.sessions, args.seed)
+    finally:
+        server.stdin.close()
+        server.wait(timeout=10)
+
+
+def bench_http(args) -> Dict[str, Dict[str, float]]:
+    """Benchmark a spawned HTTP server over POST /mcp and over /ws"""
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        return {
+            "http": run_sessions(http_caller(base_url), "http", args.sessions, args.seed),
+            "ws": run_sessions(ws_caller(base_url), "ws", args.sessions, args.seed)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    """Compare the transports"""
+    parser = argparse.ArgumentParser(description="Compare per-call latency of the stdio, HTTP and WebSocket transports")
+    parser.add_argument("--sessions", type=int, default=200, help="Number of full sessions per transport")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the spawned HTTP server")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for answers")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    results = {"stdio": bench_stdio(args), **bench_http(args)}
+    for transport, stats in results.items():
+        print(f"{transport:5} calls={stats['calls']:<6} {stats['calls_per_s']:.0f} calls/s "
+              f"p50={stats['p50_us']:.0f}us p95={stats['p95_us']:.0f}us p99={stats['p99_us']:.0f}us "
+              f"max={stats['max_us']:.0f}us")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
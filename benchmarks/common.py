@@ -0,0 +1,55 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+CLIENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "client")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Per-command request counts and latency percentiles in milliseconds"""
+    summary = {}
+    for command, values in sorted(latencies.items()):
+        values.sort()
+        summary[command] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000
+        }
+    return summary
+
+
+def start_server(port: int, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Start the HTTP server locally, with the given environment, and wait until it answers health checks"""
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "app.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Replay captured /mcp traffic and compare the responses
+
+Re-drives a capture log written by the server with CAPTURE_FILE set,
+keeping the original timing between requests (optionally sped up, or as
+fast as possible with --speed 0). Requests of one session are sent in their
+captured order, each after the previous one was answered; sessions run
+concurrently. By default the app is driven in-process over ASGI, starting
+from empty state like the captured server; use --spawn or --url to replay
+against a server over HTTP.
+
+Reports throughput, latency percentiles per command, how far behind schedule
+requests were sent, and every response whose status or body digest differs
+from the captured one.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from common import SERVER_DIR, percentile, start_server, summarize
+
+sys.path.insert(0, SERVER_DIR)
+
+from capture import read_capture, response_digest  # noqa: E402
+
+
+def request_payload(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """The /mcp request body of a captured entry"""
+    payload: Dict[str, Any] = {"query": entry.get("q", "")}
+    for key, field in (("c", "context"), ("a", "action"), ("v", "value"), ("r", "request_id")):
+        if key in entry:
+            payload[field] = entry[key]
+    return payload
+
+
+async def replay(http: httpx.AsyncClient, entries: List[Dict[str, Any]], speed: float) -> Dict[str, Any]:
+    """Replay all entries, one task per session, and collect the measurements"""
+    sessions: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        sessions.setdefault(json.dumps(entry["s"]), []).append(entry)
+
+    latencies: Dict[str, List[float]] = {}
+    lag: List[float] = []
+    divergences: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    first_arrival = entries[0]["t"] if entries else 0.0
+    started = time.perf_counter()
+
+    async def replay_session(session_entries: List[Dict[str, Any]]):
+        for index, entry in enumerate(session_entries):
+            if speed > 0:
+                due = started + (entry["t"] - first_arrival) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lag.append(max(0.0, -delay))
+            sent = time.perf_counter()
+            try:
+                response = await http.post("/mcp", json=request_payload(entry))
+            except httpx.HTTPError as e:
+                errors.append(f"{entry['s']}#{index}: {e!r}")
+                continue
+            latencies.setdefault(entry.get("k", "other"), []).append(time.perf_counter() - sent)
+            digest = response_digest(response.content)
+            if response.status_code != entry.get("st", 200) or digest != entry.get("d", digest):
+                divergences.append({
+                    "session_id": entry["s"],
+                    "index": index,
+                    "command": entry.get("k"),
+                    "expected_status": entry.get("st"),
+                    "status": response.status_code,
+                    "expected_digest": entry.get("d"),
+                    "digest": digest,
+                    "body": response.text[:200]
+                })
+
+    await asyncio.gather(*(replay_session(session_entries) for session_entries in sessions.values()))
+    elapsed = time.perf_counter() - started
+
+    lag.sort()
+    captured_span = entries[-1]["t"] - first_arrival if entries else 0.0
+    return {
+        "requests": len(entries),
+        "sessions": len(sessions),
+        "speed": speed,
+        "captured_span_s": captured_span,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(entries) / elapsed if elapsed else 0.0,
+        "schedule_lag_p99_ms": percentile(lag, 99) * 1000,
+        "errors": errors,
+        "divergences": divergences,
+        "latency": summarize(latencies)
+    }
+
+
+async def main_async(args, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Replay against the in-process app, a spawned server or a remote one"""
+    server = None
+    if args.spawn:
+        # Don't capture the replay into the log being replayed
+        server = start_server(args.port, {key: value for key, value in os.environ.items() if key != "CAPTURE_FILE"})
+        base_url, transport = f"http://127.0.0.1:{args.port}", None
+    elif args.url:
+        base_url, transport = args.url, None
+    else:
+        # Don't capture the replay into the log being replayed
+        os.environ.pop("CAPTURE_FILE", None)
+        import app
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        base_url, transport = "http://replay", httpx.ASGITransport(app=app.app)
+    try:
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30.0) as http:
+            return await replay(http, entries, args.speed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    """Replay a capture log and report the results"""
+    parser = argparse.ArgumentParser(description="Replay captured /mcp traffic and compare the responses")
+    parser.add_argument("capture", help="Capture log written by the server with CAPTURE_FILE set")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed as a multiple of the captured pace, 0 for as fast as possible")
+    parser.add_argument("--url", help="Replay against an already running server instead of the in-process app")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server and replay against it over HTTP")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--connections", type=int, default=100, help="Maximum concurrent connections")
+    parser.add_argument("--show", type=int, default=5, help="Number of divergences to print")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args()
+
+    entries = read_capture(args.capture)
+    results = asyncio.run(main_async(args, entries))
+
+    print(f"{results['requests']} requests in {results['sessions']} sessions, captured over "
+          f"{results['captured_span_s']:.2f}s, replayed in {results['elapsed_s']:.2f}s "
+          f"({results['requests_per_s']:.0f} req/s, schedule lag p99 {results['schedule_lag_p99_ms']:.1f}ms)")
+    for command, stats in results["latency"].items():
+        print(f"  {command:8} n={stats['count']:<7} p50={stats['p50_ms']:.2f}ms "
+              f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    print(f"{len(results['divergences'])} divergences, {len(results['errors'])} errors")
+    for divergence in results["divergences"][:args.show]:
+        print(f"  {divergence['session_id']}#{divergence['index']} ({divergence['command']}): "
+              f"status {divergence['expected_status']} -> {divergence['status']}, "
+              f"digest {divergence['expected_digest']} -> {divergence['digest']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if results["divergences"] or results["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,83 @@
 Personality Test MCP Client
 """
 
+import asyncio
+import itertools
 import json
 import uuid
 import requests
 import argparse
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # Only needed by AsyncPersonalityTestClient
+    httpx = None
+
+# Server errors worth retrying; every request carries a request id, so retries are safe
+RETRY_STATUSES = (500, 502, 503, 504)
+
+def retrying_session(retries: int = 3, backoff: float = 0.2) -> requests.Session:
+    """A requests session that retries failed and timed out requests, POSTs included, with exponential backoff"""
+    http = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
 
 class PersonalityTestClient:
-    """Client for interacting with the Personality Test MCP Server"""
+    """Client for interacting with the Personality Test MCP Server
+
+    Every request carries a sequence number as its request id, which the
+    server uses to answer a retried request with the original response
+    instead of applying it twice. A client-created connection pool retries
+    timeouts, connection errors and 5xx responses with backoff.
+    """
     
-    def __init__(self, server_url: str = "http://localhost:8000"):
+    def __init__(self, server_url: str = "http://localhost:8000", http: Optional[requests.Session] = None,
+                 timeout: float = 10.0, retries: int = 3):
         self.server_url = server_url
         self.session_id = str(uuid.uuid4())
         self.context = {"session_id": self.session_id}
+        self.timeout = timeout
+        # Keep-alive connection pool, shareable between clients
+        self.http = http or retrying_session(retries)
+        self._seq = itertools.count(1)
     
     def send_query(self, query: str) -> Dict[str, Any]:
         """Send a query to the MCP server"""
-        payload = {
+        return self._post({
             "query": query,
-            "context": self.context
-        }
-        
+            "context": {"session_id": self.session_id}
+        })
+    
+    def send_action(self, action: str, value: Any = None) -> Dict[str, Any]:
+        """Send a structured command to the MCP server, bypassing text parsing"""
+        return self._post({
+            "action": action,
+            "value": value,
+            "context": {"session_id": self.session_id}
+        })
+    
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Post a request to the MCP endpoint and merge the returned context"""
+        payload["request_id"] = next(self._seq)
         try:
-            response = requests.post(f"{self.server_url}/mcp", json=payload)
+            response = self.http.post(f"{self.server_url}/mcp", json=payload, timeout=self.timeout)
             response.raise_for_status()
             result = response.json()
             
-            # Update context with server response
+            # Keep the server's context for local reads; only the session id is sent back
             if result.get("context"):
                 self.context.update(result["context"])
                 
@@ -40,19 +90,153 @@ class PersonalityTestClient:
     
     def start_test(self) -> str:
         """Start the personality test"""
-        result = self.send_query("start test")
+        self.context = {"session_id": self.session_id}
+        result = self.send_action("start")
         return result["response"]
     
     def answer_question(self, answer: int) -> str:
         """Submit an answer to the current question"""
-        result = self.send_query(f"answer: {answer}")
+        result = self.send_action("answer", answer)
+        return result["response"]
+    
+    def submit_answers(self, answers: Union[List[int], Dict[str, int]]) -> str:
+        """Submit several answers at once
+
+        Pass a list of answers for consecutive questions starting at the current
+        one, or a mapping from question id to answer. The test is started
+        automatically if needed, and completing the sheet returns the results.
+        """
+        result = self.send_action("answers", answers)
+        return result["response"]
+    
+    def go_back(self) -> str:
+        """Go back to the previous question"""
+        result = self.send_action("back")
         return result["response"]
     
     def get_results(self) -> str:
         """Get the personality test results"""
-        result = self.send_query("results")
+        result = self.send_action("results")
         return result["response"]
     
+    def get_status(self) -> Dict[str, Any]:
+        """Get the provisional personality type and scores from the answers so far"""
+        return self.send_action("status")["context"]
+    
+    def get_personality_type(self) -> Optional[str]:
+        """Get just the personality type from the context"""
+        return self.context.get("personality_type")
+
+class AsyncPersonalityTestClient:
+    """Asyncio client for the Personality Test MCP Server
+
+    Many clients can share one ``httpx.AsyncClient`` so that hundreds of test
+    sessions driven from a single event loop reuse the same connection pool:
+
+        async with httpx.AsyncClient() as http:
+            clients = [AsyncPersonalityTestClient(url, http=http) for _ in range(100)]
+            await asyncio.gather(*(client.start_test() for client in clients))
+    """
+    
+    def __init__(self, server_url: str = "http://localhost:8000", http: Optional["httpx.AsyncClient"] = None,
+                 timeout: float = 10.0, retries: int = 3, backoff: float = 0.2):
+        if httpx is None:
+            raise ImportError("AsyncPersonalityTestClient requires httpx (pip install httpx)")
+        self.server_url = server_url
+        self.session_id = str(uuid.uuid4())
+        self.context = {"session_id": self.session_id}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._owns_http = http is None
+        self.http = http or httpx.AsyncClient()
+        self._seq = itertools.count(1)
+    
+    async def __aenter__(self) -> "AsyncPersonalityTestClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        """Close the connection pool, unless it was passed in and is shared"""
+        if self._owns_http:
+            await self.http.aclose()
+    
+    async def send_query(self, query: str) -> Dict[str, Any]:
+        """Send a query to the MCP server"""
+        return await self._post({
+            "query": query,
+            "context": {"session_id": self.session_id}
+        })
+    
+    async def send_action(self, action: str, value: Any = None) -> Dict[str, Any]:
+        """Send a structured command to the MCP server, bypassing text parsing"""
+        return await self._post({
+            "action": action,
+            "value": value,
+            "context": {"session_id": self.session_id}
+        })
+    
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Post a request to the MCP endpoint and merge the returned context
+
+        Timeouts, connection errors and 5xx responses are retried with
+        exponential backoff, resending the same request id.
+        """
+        payload["request_id"] = next(self._seq)
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self.http.post(f"{self.server_url}/mcp", json=payload, timeout=self.timeout)
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        break
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+            response.raise_for_status()
+            result = response.json()
+            
+            # Keep the server's context for local reads; only the session id is sent back
+            if result.get("context"):
+                self.context.update(result["context"])
+                
+            return result
+        except httpx.HTTPError as e:
+            print(f"Error communicating with MCP server: {e}")
+            return {"response": "Error: Could not connect to MCP server", "context": self.context}
+    
+    async def start_test(self) -> str:
+        """Start the personality test"""
+        self.context = {"session_id": self.session_id}
+        result = await self.send_action("start")
+        return result["response"]
+    
+    async def answer_question(self, answer: int) -> str:
+        """Submit an answer to the current question"""
+        result = await self.send_action("answer", answer)
+        return result["response"]
+    
+    async def submit_answers(self, answers: Union[List[int], Dict[str, int]]) -> str:
+        """Submit several answers at once"""
+        result = await self.send_action("answers", answers)
+        return result["response"]
+    
+    async def go_back(self) -> str:
+        """Go back to the previous question"""
+        result = await self.send_action("back")
+        return result["response"]
+    
+    async def get_results(self) -> str:
+        """Get the personality test results"""
+        result = await self.send_action("results")
+        return result["response"]
+    
+    async def get_status(self) -> Dict[str, Any]:
+        """Get the provisional personality type and scores from the answers so far"""
+        return (await self.send_action("status"))["context"]
+    
     def get_personality_type(self) -> Optional[str]:
         """Get just the personality type from the context"""
         return self.context.get("personality_type")
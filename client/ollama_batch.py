@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Batch generation of personalized messages with Ollama
+
+Takes jobs of (personality type, prompt), for users whose types are already
+known, and runs them against Ollama's chat API without any interaction.
+Jobs are grouped by persona system prompt so chats sharing a prompt run
+back to back and reuse Ollama's cached prompt prefix (a batch needs no
+separate warm-up: the first chat of a group evaluates the prompt for the
+rest), and are sent with bounded concurrency over one pool of keep-alive
+connections. Each result is written out as soon as its job completes.
+
+Input is JSON lines or CSV with ``personality_type`` and ``prompt`` fields,
+and optionally ``id`` and ``description`` (used for types without a persona
+prompt). Output is one JSON line per job, in completion order, holding the
+reply or the error of a job that failed after all retries.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+from personas import persona_prompt
+
+# Ollama answers these while overloaded or loading a model; anything else is not worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class OllamaBatchDispatcher:
+    """
+    Runs chat jobs against Ollama concurrently over a shared connection pool
+    """
+
+    def __init__(self, ollama_url: str = "http://localhost:11434", model: str = "llama3",
+                 concurrency: int = 8, timeout: float = 120.0, retries: int = 3, backoff: float = 0.5,
+                 keep_alive: str = "30m", group: bool = True,
+                 options: Optional[Dict[str, Any]] = None):
+        self.ollama_url = ollama_url
+        self.model = model
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        # Run jobs sharing a persona prompt back to back instead of in input order
+        self.group = group
+        self.options = options
+
+    def order_jobs(self, jobs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Jobs with their system prompt, grouped by it in order of first appearance"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        ordered = []
+        for job in jobs:
+            job = dict(job, system_prompt=persona_prompt(job.get("personality_type"), job.get("description")))
+            if self.group:
+                groups.setdefault(job["system_prompt"], []).append(job)
+            else:
+                ordered.append(job)
+        for group in groups.values():
+            ordered.extend(group)
+        return ordered
+
+    async def run(self, jobs: Iterable[Dict[str, Any]],
+                  on_result: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Run all jobs, passing each result to on_result as it completes, and summarize the run"""
+        ordered = self.order_jobs(jobs)
+        counts = {"jobs": len(ordered), "completed": 0, "failed": 0, "retries": 0}
+        # Shared by all workers, each taking the next job when it is free
+        pending = iter(ordered)
+
+        async def worker(http: httpx.AsyncClient):
+            for job in pending:
+                result = await self.run_job(http, job)
+                counts["failed" if "error" in result else "completed"] += 1
+                counts["retries"] += result["attempts"] - 1
+                on_result(result)
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        started = time.perf_counter()
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as http:
+            await asyncio.gather(*(worker(http) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+        return dict(counts, elapsed_s=elapsed, jobs_per_s=counts["jobs"] / elapsed if elapsed else 0.0)
+
+    async def run_job(self, http: httpx.AsyncClient, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate the reply of one job, never raising"""
+        result = {"id": job.get("id"), "personality_type": job.get("personality_type"), "attempts": 0}
+        started = time.perf_counter()
+        try:
+            messages = [{"role": "system", "content": job["system_prompt"]},
+                        {"role": "user", "content": job["prompt"]}]
+            reply = await self.chat(http, messages, result)
+            result["reply"] = reply["message"]["content"]
+            result["done_reason"] = reply.get("done_reason")
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            result["error"] = str(e) or type(e).__name__
+        result["latency_s"] = round(time.perf_counter() - started, 4)
+        return result
+
+    async def chat(self, http: httpx.AsyncClient, messages: List[Dict[str, str]],
+                   result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send one non-streamed chat request and return Ollama's reply
+
+        Timeouts, connection errors and overload statuses are retried with
+        exponential backoff and jitter, waiting at least as long as a
+        Retry-After header asks. The number of attempts is counted in result.
+        """
+        payload = {"model": self.model, "messages": messages, "stream": False, "keep_alive": self.keep_alive}
+        if self.options:
+            payload["options"] = self.options
+        for attempt in range(self.retries + 1):
+            if result is not None:
+                result["attempts"] = attempt + 1
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            try:
+                response = await http.post(f"{self.ollama_url}/api/chat", json=payload)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(delay)
+        response.raise_for_status()
+        reply = response.json()
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply
+
+def read_jobs(path: str) -> List[Dict[str, Any]]:
+    """Jobs from a JSON lines or CSV file, numbered by position when they have no id"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            jobs = [dict(row) for row in csv.DictReader(f)]
+        else:
+            jobs = [json.loads(line) for line in f if line.strip()]
+    for index, job in enumerate(jobs):
+        if job.get("id") in (None, ""):
+            job["id"] = index
+        if not job.get("prompt"):
+            raise ValueError(f"Job {job['id']} has no prompt")
+    return jobs
+
+def finished_ids(path: str) -> Set[str]:
+    """Ids of jobs with a reply in an earlier output file"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    return {str(result["id"]) for result in results if "reply" in result}
+
+def main():
+    """Run a batch of jobs and write the results as they complete"""
+    parser = argparse.ArgumentParser(description="Generate personalized messages with Ollama for a batch of users")
+    parser.add_argument("jobs", help="JSON lines or .csv file of jobs with personality_type and prompt fields")
+    parser.add_argument("--output", default="-", help="JSON lines file to write results to, - for stdout")
+    parser.add_argument("--resume", action="store_true",
+                        help="Append to the output file, skipping jobs that already have a reply there")
+    parser.add_argument("--ollama", default="http://localhost:11434", help="Ollama API URL")
+    parser.add_argument("--model", default="llama3", help="Ollama model to use")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum chats in flight; match Ollama's OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for a reply")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of a failed chat")
+    parser.add_argument("--keep-alive", default="30m", help="How long Ollama keeps the model loaded")
+    parser.add_argument("--max-tokens", type=int, help="Limit the length of each reply (num_predict)")
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.jobs)
+    if args.resume and args.output != "-":
+        done = finished_ids(args.output)
+        jobs = [job for job in jobs if str(job["id"]) not in done]
+    dispatcher = OllamaBatchDispatcher(args.ollama, args.model, concurrency=args.concurrency, timeout=args.timeout,
+                                       retries=args.retries, keep_alive=args.keep_alive,
+                                       options={"num_predict": args.max_tokens} if args.max_tokens else None)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a" if args.resume else "w", encoding="utf-8")
+
+    def write(result: Dict[str, Any]):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+    try:
+        summary = asyncio.run(dispatcher.run(jobs, write))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{summary['completed']} of {summary['jobs']} jobs completed, {summary['failed']} failed, "
+          f"{summary['retries']} retries, "
+          f"{summary['elapsed_s']:.1f}s ({summary['jobs_per_s']:.1f} jobs/s)", file=sys.stderr)
+    if summary["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,99 @@ Ollama Integration for Personality Test MCP
 import json
 import requests
 import argparse
-from typing import Dict, Any, Optional
+import time
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set, Tuple
 from mcp_client import PersonalityTestClient
+from personas import persona_prompt
+
+# Rough size of a token, for turning a token budget into characters
+CHARS_PER_TOKEN = 4
+
+class ConversationWindow:
+    """
+    Chat history bounded by a character budget
+
+    The system prompt is always kept, followed by as many of the most recent
+    exchanges as fit in the budget. Exchanges (a user turn and the reply to
+    it) that fall out of the window are dropped together and folded into a
+    short summary of what the user asked earlier, which takes at most a
+    quarter of the budget and counts against it.
+    """
+    
+    SUMMARY_PREFIX = "Earlier in this conversation the user asked about: "
+    
+    def __init__(self, system_prompt: str, max_chars: int = 8000):
+        self.system = {"role": "system", "content": system_prompt}
+        self.max_chars = max_chars
+        self.turns: List[Dict[str, str]] = []
+        self.size = 0
+        self.dropped_topics: List[str] = []
+        self._summary: Optional[str] = None
+    
+    def add(self, role: str, content: str):
+        """Append a turn, dropping the oldest exchanges once over budget"""
+        self.turns.append({"role": role, "content": content})
+        self.size += len(content)
+        while self.size > self.max_chars - len(self.system["content"]) - len(self._summary or ""):
+            # A user turn goes together with the reply to it, so the window never opens on a reply
+            pair = len(self.turns) > 1 and self.turns[0]["role"] == "user" and self.turns[1]["role"] == "assistant"
+            count = 2 if pair else 1
+            # Always keep the latest exchange, even if it alone exceeds the budget
+            if count >= len(self.turns):
+                break
+            for dropped in self.turns[:count]:
+                self.size -= len(dropped["content"])
+                if dropped["role"] == "user":
+                    self.dropped_topics.append(" ".join(dropped["content"].split())[:80])
+            del self.turns[:count]
+            self._summary = self._summarize()
+    
+    def _summarize(self) -> Optional[str]:
+        # Newest topics first to survive, within a quarter of the budget including the prefix
+        limit = self.max_chars // 4 - len(self.SUMMARY_PREFIX)
+        topics: List[str] = []
+        length = 0
+        for topic in reversed(self.dropped_topics):
+            length += len(topic) + 3
+            if length > limit:
+                break
+            topics.append(topic)
+        if not topics:
+            return None
+        return self.SUMMARY_PREFIX + " | ".join(reversed(topics))
+    
+    def summary(self) -> Optional[str]:
+        """One-line summary of the turns that no longer fit"""
+        return self._summary
+    
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages to send: system prompt, summary of dropped turns, recent turns"""
+        messages = [self.system]
+        if self._summary:
+            messages.append({"role": "system", "content": self._summary})
+        return messages + self.turns
 
 class OllamaPersonalityIntegration:
     """
     Integrates personality test results with Ollama for personalized interactions
     """
     
-    def __init__(self, ollama_url: str = "http://localhost:11434", model: str = "llama3"):
+    # (Ollama URL, model, system prompt) prefixes already evaluated by this process,
+    # shared by every integration so later users of the same type skip the warm-up
+    _warmed_prefixes: Set[Tuple[str, str, str]] = set()
+    
+    def __init__(self, ollama_url: str = "http://localhost:11434", model: str = "llama3",
+                 context_chars: int = 8000, http: Optional[requests.Session] = None,
+                 keep_alive: str = "30m"):
         self.ollama_url = ollama_url
         self.model = model
+        self.context_chars = context_chars
+        # How long Ollama keeps the model, and with it the cached prompt prefix, loaded
+        self.keep_alive = keep_alive
+        # Seconds from sending the last chat turn to its first streamed token
+        self.last_ttft: Optional[float] = None
+        # Keep-alive connection pool to Ollama, reused across chat turns
+        self.http = http or requests.Session()
         self.personality_client = PersonalityTestClient()
         self.personality_type = None
         self.personality_description = None
@@ -73,39 +155,79 @@ class OllamaPersonalityIntegration:
     
     def generate_personality_system_prompt(self) -> str:
         """Generate a system prompt for Ollama based on personality type"""
-        if not self.personality_type:
-            return "You are a helpful AI assistant."
-        
-        # Create personalized system prompts based on personality type
-        prompts = {
-            # Analysts (NT)
-            "INTJ": "You are communicating with an INTJ personality type. Be logical, direct, and efficient. Focus on concepts and ideas rather than small talk. Provide well-reasoned arguments and avoid emotional appeals. Respect their independence and offer insightful perspectives.",
-            "INTP": "You are communicating with an INTP personality type. Engage with complex ideas and theoretical concepts. Be logical and precise in your explanations. Avoid social niceties and get straight to the intellectual content. Respect their need to question and analyze everything.",
-            "ENTJ": "You are communicating with an ENTJ personality type. Be direct, efficient, and focused on results. Present information in a structured way with clear action items. Acknowledge their leadership qualities and provide strategic insights. Avoid being overly emotional or indecisive.",
-            "ENTP": "You are communicating with an ENTP personality type. Engage with innovative ideas and be open to debate. Present multiple perspectives and possibilities. Use humor and wit when appropriate. Avoid rigid thinking or excessive detail without context.",
-            
-            # Diplomats (NF)
-            "INFJ": "You are communicating with an INFJ personality type. Connect ideas to values and human impact. Be authentic and thoughtful in your responses. Acknowledge emotions and provide depth rather than surface-level answers. Respect their need for meaning and purpose.",
-            "INFP": "You are communicating with an INFP personality type. Be gentle and authentic in your communication. Connect to values and personal meaning. Respect their individuality and avoid rigid structures. Acknowledge emotions and provide supportive, thoughtful responses.",
-            "ENFJ": "You are communicating with an ENFJ personality type. Be warm and personable while still providing substance. Connect ideas to people and values. Acknowledge their supportive nature and leadership qualities. Provide positive reinforcement when appropriate.",
-            "ENFP": "You are communicating with an ENFP personality type. Be enthusiastic and open to possibilities. Connect ideas in creative ways and avoid overly rigid structures. Use humor and warmth in your communication. Acknowledge their creativity and provide novel perspectives.",
-            
-            # Sentinels (SJ)
-            "ISTJ": "You are communicating with an ISTJ personality type. Be clear, concise, and practical. Provide detailed, factual information with logical organization. Respect traditions and established methods. Avoid abstract theories without practical applications.",
-            "ISFJ": "You are communicating with an ISFJ personality type. Be warm but practical in your communication. Respect traditions and provide detailed information. Acknowledge their helpful nature and desire for harmony. Be reliable and consistent in your responses.",
-            "ESTJ": "You are communicating with an ESTJ personality type. Be direct, practical, and focused on results. Provide clear structure and actionable steps. Respect established procedures and be straightforward in your communication. Avoid ambiguity or excessive theorizing.",
-            "ESFJ": "You are communicating with an ESFJ personality type. Be warm and considerate while providing practical information. Acknowledge social harmony and community values. Be specific and concrete rather than abstract. Provide supportive and structured responses.",
-            
-            # Explorers (SP)
-            "ISTP": "You are communicating with an ISTP personality type. Be concise and practical. Focus on how things work and provide technical details when relevant. Respect their independence and problem-solving abilities. Avoid unnecessary social niceties or emotional content.",
-            "ISFP": "You are communicating with an ISFP personality type. Be gentle and authentic in your communication. Respect their values and artistic sensibilities. Provide practical information with sensitivity. Avoid being pushy or overly structured in your approach.",
-            "ESTP": "You are communicating with an ESTP personality type. Be direct and action-oriented. Focus on immediate results and practical applications. Use energetic language and get to the point quickly. Avoid abstract theories without clear applications.",
-            "ESFP": "You are communicating with an ESFP personality type. Be friendly and enthusiastic. Focus on practical matters with a positive tone. Acknowledge their social nature and provide options rather than rigid structures. Use engaging language and concrete examples."
-        }
-        
-        base_prompt = f"You are a helpful AI assistant communicating with someone who has a {self.personality_type} personality type. {self.personality_description}"
-        
-        return prompts.get(self.personality_type, base_prompt)
+        return persona_prompt(self.personality_type, self.personality_description)
+    
+    def warm_up(self, system_prompt: str) -> bool:
+        """Have Ollama evaluate a system prompt once, so chats starting with it reuse the cached prefix
+
+        Ollama keeps the evaluated prompt of a loaded model and only processes
+        the part of a new prompt that differs from it, so warming up pays for
+        the persona prompt once instead of on the first turn of every chat.
+        Returns False if this prompt was already warmed up by this process.
+        """
+        key = (self.ollama_url, self.model, system_prompt)
+        if key in self._warmed_prefixes:
+            return False
+        response = self.http.post(
+            f"{self.ollama_url}/api/chat",
+            json={
+                "model": self.model,
+                "messages": [{"role": "system", "content": system_prompt}],
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {"num_predict": 1}
+            }
+        )
+        response.raise_for_status()
+        self._warmed_prefixes.add(key)
+        return True
+    
+    def stream_chat(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Send messages to Ollama and yield the reply's tokens as they are generated"""
+        with self.http.post(
+            f"{self.ollama_url}/api/chat",
+            json={
+                "model": self.model,
+                "messages": messages,
+                "stream": True,
+                "keep_alive": self.keep_alive
+            },
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            # One JSON object per line, the last one marked done
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    # A truncated or garbled chunk fails the turn like any other transport error
+                    raise requests.exceptions.RequestException(f"Malformed reply from Ollama: {e}") from e
+                if "error" in chunk:
+                    raise requests.exceptions.RequestException(chunk["error"])
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+    
+    def send_message(self, window: ConversationWindow, user_input: str,
+                     on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Send one user turn, streaming the reply to on_token, and record both in the window"""
+        window.add("user", user_input)
+        tokens = []
+        self.last_ttft = None
+        started = time.perf_counter()
+        for token in self.stream_chat(window.messages()):
+            if not tokens:
+                self.last_ttft = time.perf_counter() - started
+            tokens.append(token)
+            if on_token:
+                on_token(token)
+        reply = "".join(tokens)
+        window.add("assistant", reply)
+        return reply
     
     def chat_with_ollama(self):
         """Start a chat session with Ollama using personality-tailored prompts"""
@@ -114,36 +236,24 @@ class OllamaPersonalityIntegration:
             return
         
         system_prompt = self.generate_personality_system_prompt()
+        window = ConversationWindow(system_prompt, self.context_chars)
+        try:
+            self.warm_up(system_prompt)
+        except requests.exceptions.RequestException as e:
+            print(f"Could not warm up Ollama: {e}")
         
         print(f"\nStarting personalized chat for {self.personality_type} personality type...")
         print("Type 'exit' to end the conversation.\n")
         
-        messages = [{"role": "system", "content": system_prompt}]
-        
         while True:
             user_input = input("\nYou: ")
             if user_input.lower() == 'exit':
                 break
-                
-            messages.append({"role": "user", "content": user_input})
             
             try:
-                response = requests.post(
-                    f"{self.ollama_url}/api/chat",
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "stream": False
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                assistant_message = result["message"]["content"]
-                
-                print(f"\nAssistant: {assistant_message}")
-                
-                messages.append({"role": "assistant", "content": assistant_message})
-                
+                print("\nAssistant: ", end="", flush=True)
+                self.send_message(window, user_input, on_token=lambda token: print(token, end="", flush=True))
+                print()
             except requests.exceptions.RequestException as e:
                 print(f"Error communicating with Ollama: {e}")
                 break
@@ -153,9 +263,14 @@ def main():
     parser = argparse.ArgumentParser(description="Personality Test Ollama Integration")
     parser.add_argument("--ollama", default="http://localhost:11434", help="Ollama API URL")
     parser.add_argument("--model", default="llama3", help="Ollama model to use")
+    parser.add_argument("--context-tokens", type=int, default=2000,
+                        help=f"Approximate token budget for the conversation sent to Ollama (~{CHARS_PER_TOKEN} characters per token)")
+    parser.add_argument("--keep-alive", default="30m", help="How long Ollama keeps the model loaded between turns")
     args = parser.parse_args()
     
-    integration = OllamaPersonalityIntegration(ollama_url=args.ollama, model=args.model)
+    integration = OllamaPersonalityIntegration(ollama_url=args.ollama, model=args.model,
+                                               context_chars=args.context_tokens * CHARS_PER_TOKEN,
+                                               keep_alive=args.keep_alive)
     integration.run_personality_test()
     integration.chat_with_ollama()
 
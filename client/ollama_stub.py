@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama chat API
+
+Serves ``POST /api/chat`` the way Ollama does, streaming newline-delimited
+JSON chunks (or one JSON reply with ``"stream": false``), so the Ollama
+integration can be exercised and timed without a model. The reply echoes
+the last user message word by word, with a configurable delay before the
+first token and between tokens, and can fail a share of requests with 503
+to exercise client retries.
+
+Prompt evaluation is simulated like Ollama's prompt cache: each of a few
+slots remembers the last prompt it evaluated, and a request only pays
+``prompt_delay`` per character of its prompt beyond the longest prefix it
+shares with one of them. A prompt extending a cached one replaces it;
+any other prompt replaces the least recently used slot.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    """Handles /api/chat requests with canned, echoing replies"""
+
+    # Keep-alive connections, like the real server
+    protocol_version = "HTTP/1.1"
+    # Send each streamed chunk right away instead of waiting on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "stub"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests.append(request)
+        if self.server.should_fail():
+            self._send_json({"error": "server busy"}, status=503)
+            return
+
+        messages = request.get("messages", [])
+        prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        tokens = [word + " " for word in f"You said: {prompt}".split()]
+        num_predict = request.get("options", {}).get("num_predict")
+        if num_predict is not None and num_predict >= 0:
+            tokens = tokens[:num_predict]
+        model = request.get("model", "stub")
+        uncached = self.server.evaluate_prompt(messages)
+        time.sleep(self.server.first_token_delay + uncached * self.server.prompt_delay)
+
+        if not request.get("stream", True):
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(self._chunk(model, "".join(tokens), done=True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self.server.token_delay)
+            self._write_chunk(self._chunk(model, token, done=False))
+        self._write_chunk(self._chunk(model, "", done=True))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, model: str, content: str, done: bool) -> Dict[str, Any]:
+        chunk = {"model": model, "message": {"role": "assistant", "content": content}, "done": done}
+        if done:
+            chunk["done_reason"] = "stop"
+        return chunk
+
+    def _write_chunk(self, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OllamaStub(ThreadingHTTPServer):
+    """Stub server keeping the most recent chat requests it receives"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_delay: float = 0.0,
+                 token_delay: float = 0.0, prompt_delay: float = 0.0, slots: int = 4, verbose: bool = False,
+                 error_rate: float = 0.0, seed: int = 0,
+                 history: int = 100):
+        super().__init__((host, port), OllamaStubHandler)
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_delay = prompt_delay
+        self.verbose = verbose
+        # Share of chat requests answered with 503 instead of a reply
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        # Bounded so a long benchmark or stub session does not grow without limit
+        self.requests: Deque[Dict[str, Any]] = deque(maxlen=history)
+        # Last prompt evaluated by each slot, least recently used first
+        self.slots: List[str] = [""] * slots
+        self._slots_lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        """Whether to reject the current request, drawn from a seeded generator"""
+        with self._slots_lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def evaluate_prompt(self, messages: List[Dict[str, Any]]) -> int:
+        """Characters of the prompt not covered by a cached prefix, updating the slot cache"""
+        prompt = "".join(f"<{m.get('role')}>{m.get('content')}\n" for m in messages)
+        with self._slots_lock:
+            cached = max(len(os.path.commonprefix([previous, prompt])) for previous in self.slots)
+            # A prompt continuing a cached one takes over its slot, others the least recently used one
+            slot = next((index for index, previous in enumerate(self.slots) if prompt.startswith(previous) and previous), 0)
+            del self.slots[slot]
+            self.slots.append(prompt)
+        return len(prompt) - cached
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "OllamaStub":
+        """Serve from a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    """Run the stub server in the foreground"""
+    parser = argparse.ArgumentParser(description="Local stub of the Ollama chat API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind to")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between tokens")
+    parser.add_argument("--prompt-delay", type=float, default=0.0002,
+                        help="Seconds per prompt character not covered by a cached prefix")
+    parser.add_argument("--slots", type=int, default=4, help="Number of cached prompts")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of chat requests failed with 503")
+    args = parser.parse_args()
+
+    stub = OllamaStub(args.host, args.port, args.first_token_delay, args.token_delay, args.prompt_delay,
+                      args.slots, verbose=True, error_rate=args.error_rate)
+    print(f"Ollama stub listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Admission control for new test sessions
+"""
+
+import math
+from time import monotonic
+
+
+class Overloaded(Exception):
+    """A new session was turned away; the client should retry after the given number of seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits how fast new sessions are started, shedding them first when the server falls behind
+
+    New sessions spend a token from a bucket refilled at ``rate`` per second
+    and holding up to ``burst`` tokens. Independently, while the measured
+    queueing delay is above ``max_delay`` seconds no new session is admitted
+    at all. Requests of sessions already in progress are never limited, so
+    people mid-test keep their latency while new arrivals wait.
+
+    A rate of 0 disables the token bucket and a max_delay of 0 the delay check.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float = 0.0, max_delay: float = 0.0, clock=monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0) if rate > 0 else 0.0
+        self.max_delay = max_delay
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        # Most recent queueing delay measurement and its smoothed value, in seconds
+        self.delay = 0.0
+        self.smoothed_delay = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured"""
+        return self.rate > 0 or self.max_delay > 0
+
+    def observe_delay(self, delay: float):
+        """Record a queueing delay measurement"""
+        self.delay = delay
+        # Rises immediately with the delay and decays over a few measurements, so
+        # a single quiet tick doesn't reopen admission in the middle of a spike
+        self.smoothed_delay = max(delay, self.smoothed_delay * 0.5)
+
+    def admit(self):
+        """Take a new session in, or raise Overloaded"""
+        if self.max_delay > 0 and self.smoothed_delay > self.max_delay:
+            self.rejected += 1
+            raise Overloaded(f"Server is busy (queueing delay {self.smoothed_delay * 1000:.0f}ms)", 1)
+        if self.rate > 0:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1.0:
+                self.rejected += 1
+                raise Overloaded("Too many new sessions", self.retry_after())
+            self.tokens -= 1.0
+        self.admitted += 1
+
+    def retry_after(self) -> int:
+        """Whole seconds until the bucket holds a token again"""
+        return max(1, math.ceil((1.0 - self.tokens) / self.rate))
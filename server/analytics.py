@@ -0,0 +1,176 @@
+"""
+Streaming population analytics over completed tests
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from questionnaire import DIMENSIONS, NEUTRAL_ANSWER
+
+# Snapshot file format, bumped when its layout changes
+SNAPSHOT_VERSION = 1
+
+# Score quantiles reported per dimension
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class BankAggregate:
+    """Aggregates of the completed tests of one question bank
+
+    Every completion is folded in once, in time proportional to the number
+    of questions: a count per type, a histogram of the answers to each
+    question (0 for questions adaptive testing skipped) and, per dimension,
+    a histogram over the dimension's whole possible score range. Scores are
+    small bounded integers, so that histogram is an exact sketch that any
+    quantile can be read from.
+    """
+
+    __slots__ = ("completions", "types", "items", "bounds", "scores")
+
+    def __init__(self, num_types: int, num_items: int, bounds: Sequence[int]):
+        self.completions = 0
+        self.types = [0] * num_types
+        # Flattened (item, answer 0-5) counts
+        self.items = [0] * (num_items * 6)
+        # Per dimension, counts of scores -bound..+bound
+        self.bounds = list(bounds)
+        self.scores = [[0] * (2 * bound + 1) for bound in self.bounds]
+
+    def fold(self, answers: Sequence[int], scores: Sequence[int], type_code: int):
+        """Add one completed test"""
+        self.completions += 1
+        self.types[type_code] += 1
+        items = self.items
+        for index, answer in enumerate(answers):
+            items[index * 6 + answer] += 1
+        for dim, score in enumerate(scores):
+            self.scores[dim][score + self.bounds[dim]] += 1
+
+    def item_histogram(self, index: int) -> List[int]:
+        """Counts of answers 0-5 to one item"""
+        return self.items[index * 6:index * 6 + 6]
+
+    def score_summary(self, dim: int) -> Dict[str, Any]:
+        """Mean, range and quantiles of one dimension's scores"""
+        counts, bound = self.scores[dim], self.bounds[dim]
+        total = sum(counts)
+        if not total:
+            return {"count": 0}
+        observed = [i for i, count in enumerate(counts) if count]
+        summary: Dict[str, Any] = {
+            "count": total,
+            "mean": sum((i - bound) * count for i, count in enumerate(counts)) / total,
+            "min": observed[0] - bound,
+            "max": observed[-1] - bound
+        }
+        targets = iter(QUANTILES)
+        target = next(targets)
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            while target is not None and seen >= target * total:
+                summary[f"p{round(target * 100)}"] = i - bound
+                target = next(targets, None)
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"completions": self.completions, "types": self.types, "items": self.items,
+                "bounds": self.bounds, "scores": self.scores}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BankAggregate":
+        aggregate = cls(len(data["types"]), len(data["items"]) // 6, data["bounds"])
+        aggregate.completions = data["completions"]
+        aggregate.types = list(data["types"])
+        aggregate.items = list(data["items"])
+        aggregate.scores = [list(counts) for counts in data["scores"]]
+        return aggregate
+
+
+class PopulationAnalytics:
+    """Type distribution, per-question answer histograms and score sketches, per question bank"""
+
+    def __init__(self, personality_types: Sequence[str]):
+        self.personality_types = list(personality_types)
+        self.banks: Dict[int, BankAggregate] = {}
+        # Bumped on every change, so rendered reports and snapshots are only redone when stale
+        self.version = 0
+        self._report: Optional[Tuple[int, bytes]] = None
+        self._saved_version = 0
+
+    def record_completion(self, bank: int, questionnaire, answers: Sequence[int], scores: Sequence[int],
+                          type_code: int):
+        """Fold a completed test of a bank into the aggregates"""
+        aggregate = self.banks.get(bank)
+        if aggregate is None:
+            # Largest score magnitude of each dimension: every item answered at an extreme
+            bounds = [0] * len(DIMENSIONS)
+            for dim, weight in zip(questionnaire.item_dims, questionnaire.item_weights):
+                bounds[dim] += abs(weight) * (5 - NEUTRAL_ANSWER)
+            aggregate = self.banks[bank] = BankAggregate(len(self.personality_types), len(questionnaire), bounds)
+        aggregate.fold(answers, scores, type_code)
+        self.version += 1
+
+    def report(self, describe: Callable[[int], Optional[Tuple[str, Sequence[str]]]]) -> bytes:
+        """Serialized report of every bank, only rebuilt after new completions
+
+        describe maps a bank code to the bank's name and question ids, or to
+        None for banks no longer available, which are reported by code with
+        numbered questions.
+        """
+        if self._report is not None and self._report[0] == self.version:
+            return self._report[1]
+        banks = {}
+        for code, aggregate in self.banks.items():
+            described = describe(code)
+            if described is None:
+                described = (str(code), [str(number) for number in range(1, len(aggregate.items) // 6 + 1)])
+            key, question_ids = described
+            # Answer counts 1-5 per question, and how often adaptive testing skipped it
+            items = {}
+            for index, question_id in enumerate(question_ids):
+                histogram = aggregate.item_histogram(index)
+                items[question_id] = {"answers": histogram[1:], "skipped": histogram[0]}
+            banks[key] = {
+                "code": code,
+                "completions": aggregate.completions,
+                "types": dict(zip(self.personality_types, aggregate.types)),
+                "items": items,
+                "scores": {dim: aggregate.score_summary(k) for k, dim in enumerate(DIMENSIONS)}
+            }
+        body = json.dumps({"completions": sum(a.completions for a in self.banks.values()), "banks": banks},
+                          separators=(",", ":")).encode("utf-8")
+        self._report = (self.version, body)
+        return body
+
+    def save(self, path: str) -> bool:
+        """Write a compact snapshot if anything changed since the last one; returns whether it wrote"""
+        if self.version == self._saved_version:
+            return False
+        version = self.version
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "types": self.personality_types,
+            "banks": {str(code): aggregate.to_dict() for code, aggregate in self.banks.items()}
+        }
+        # Written under a temporary name and renamed, so a crash never leaves a partial snapshot
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(temporary, path)
+        self._saved_version = version
+        return True
+
+    def load(self, path: str) -> bool:
+        """Resume from a snapshot, if there is one; returns whether one was loaded"""
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("types") != self.personality_types:
+            raise ValueError(f"{path} is not an analytics snapshot of format {SNAPSHOT_VERSION}")
+        self.banks = {int(code): BankAggregate.from_dict(data) for code, data in snapshot["banks"].items()}
+        self.version += 1
+        self._saved_version = self.version
+        return True
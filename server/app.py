@@ -3,280 +3,381 @@
 Personality Test MCP Server
 """
 
+import argparse
+import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any
-from fastapi import FastAPI, HTTPException, Request
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Any, Tuple, Union
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-import uvicorn
+
+from admission import Overloaded
+from capture import TrafficCapture
+from engine import (
+    ANALYTICS_SNAPSHOT, ANALYTICS_SNAPSHOT_INTERVAL, BANK_SELECTORS, EMPTY_SESSION, admission, analytics,
+    default_response, default_runtime, describe_bank, get_runtime, handle_session_action, metrics, process_request,
+    registry, session_store, snapshot_analytics
+)
+from metrics import COMMAND_SCOPE_KEY, CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+from session_store import SessionStore
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "info").upper())
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Personality Test MCP Server")
+async def flush_sessions_periodically(interval: float):
+    """Periodically write out buffered session changes"""
+    while True:
+        await asyncio.sleep(interval)
+        session_store.flush()
+
+async def snapshot_analytics_periodically(interval: float):
+    """Periodically write the analytics snapshot"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snapshot_analytics()
+        except OSError as e:
+            logger.warning("Could not write analytics snapshot: %s", e)
+
+async def flush_capture_periodically(interval: float):
+    """Periodically write out buffered capture log lines"""
+    while True:
+        await asyncio.sleep(interval)
+        capture.flush()
+
+async def measure_queueing_delay(interval: float):
+    """Measure how late the event loop runs a timer, i.e. how long ready work waits to run
+
+    Requests are handled on the event loop, so when it falls behind every
+    request waits about this long before being processed.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        admission.observe_delay(max(0.0, loop.time() - scheduled))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background tasks while serving and flush sessions, analytics and captured traffic on shutdown"""
+    tasks = []
+    interval = getattr(session_store, "flush_interval", 0)
+    if interval > 0:
+        tasks.append(asyncio.create_task(flush_sessions_periodically(interval)))
+    if admission.max_delay > 0:
+        tasks.append(asyncio.create_task(measure_queueing_delay(QUEUE_DELAY_PROBE_INTERVAL)))
+    if ANALYTICS_SNAPSHOT and ANALYTICS_SNAPSHOT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(snapshot_analytics_periodically(ANALYTICS_SNAPSHOT_INTERVAL)))
+    if capture:
+        tasks.append(asyncio.create_task(flush_capture_periodically(CAPTURE_FLUSH_INTERVAL)))
+    yield
+    for task in tasks:
+        task.cancel()
+    session_store.close()
+    snapshot_analytics()
+    if capture:
+        capture.close()
+
+# Seconds between queueing delay measurements, when admission control sheds on delay
+QUEUE_DELAY_PROBE_INTERVAL = 0.01
+
+# Opt-in log of every /mcp request, for replaying real traffic (see benchmarks/replay_capture.py)
+CAPTURE_FILE = os.environ.get("CAPTURE_FILE", "")
+CAPTURE_FLUSH_INTERVAL = float(os.environ.get("CAPTURE_FLUSH_INTERVAL", "1"))
+capture = TrafficCapture(CAPTURE_FILE) if CAPTURE_FILE else None
+
+app = FastAPI(title="Personality Test MCP Server", lifespan=lifespan)
+
+# Request latencies per command and test completions, served at /metrics
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 # Define models for MCP protocol
 class MCPRequest(BaseModel):
-    query: str
+    query: str = ""
     context: Optional[Dict[str, Any]] = None
+    # Structured command for machine clients; when set, query is ignored
+    action: Optional[str] = None
+    value: Optional[Any] = None
+    # Client-chosen id (e.g. a sequence number) that makes retries of this request safe
+    request_id: Optional[Union[str, int]] = None
 
 class MCPResponse(BaseModel):
     response: str
     context: Optional[Dict[str, Any]] = None
 
-# Personality test questions
-personality_questions = [
-    # Extraversion (E) vs. Introversion (I)
-    {"id": "EI1", "question": "You prefer spending time with others rather than alone.", "dimension": "EI"},
-    {"id": "EI2", "question": "You often take initiative in social situations.", "dimension": "EI"},
-    {"id": "EI3", "question": "You get energized from social gatherings.", "dimension": "EI"},
-    {"id": "EI4", "question": "You enjoy being the center of attention.", "dimension": "EI"},
-    {"id": "EI5", "question": "You prefer working in teams rather than independently.", "dimension": "EI"},
-    
-    # Sensing (S) vs. Intuition (N)
-    {"id": "SN1", "question": "You focus more on details than the big picture.", "dimension": "SN"},
-    {"id": "SN2", "question": "You prefer concrete facts over abstract theories.", "dimension": "SN"},
-    {"id": "SN3", "question": "You trust experience more than intuition.", "dimension": "SN"},
-    {"id": "SN4", "question": "You prefer practical solutions over innovative ideas.", "dimension": "SN"},
-    {"id": "SN5", "question": "You focus more on present realities than future possibilities.", "dimension": "SN"},
-    
-    # Thinking (T) vs. Feeling (F)
-    {"id": "TF1", "question": "You make decisions based on logic rather than feelings.", "dimension": "TF"},
-    {"id": "TF2", "question": "You value objective truth over social harmony.", "dimension": "TF"},
-    {"id": "TF3", "question": "You find it easy to criticize others when necessary.", "dimension": "TF"},
-    {"id": "TF4", "question": "You prioritize efficiency over people's feelings.", "dimension": "TF"},
-    {"id": "TF5", "question": "You prefer honest feedback over tactful communication.", "dimension": "TF"},
-    
-    # Judging (J) vs. Perceiving (P)
-    {"id": "JP1", "question": "You prefer having a detailed plan rather than being spontaneous.", "dimension": "JP"},
-    {"id": "JP2", "question": "You like to have things decided and settled.", "dimension": "JP"},
-    {"id": "JP3", "question": "You prefer structure and order over flexibility.", "dimension": "JP"},
-    {"id": "JP4", "question": "You tend to complete tasks well ahead of deadlines.", "dimension": "JP"},
-    {"id": "JP5", "question": "You prefer environments that are neat and organized.", "dimension": "JP"}
-]
-
-# Personality type descriptions
-personality_descriptions = {
-    "ISTJ": "Quiet, serious, practical, and dependable. Values traditions and loyalty.",
-    "ISFJ": "Quiet, friendly, responsible, and conscientious. Committed to meeting obligations.",
-    "INFJ": "Seeks meaning and connection. Insightful about others with strong values.",
-    "INTJ": "Independent, analytical, and determined. High standards and original thinking.",
-    "ISTP": "Tolerant, flexible problem-solver. Interested in how things work.",
-    "ISFP": "Quiet, friendly, sensitive, and kind. Enjoys the present moment.",
-    "INFP": "Idealistic, loyal, and adaptable. Cares deeply about personal values.",
-    "INTP": "Logical, original thinker. Interested in ideas and theoretical concepts.",
-    "ESTP": "Flexible, tolerant, and spontaneous. Focuses on immediate results.",
-    "ESFP": "Outgoing, friendly, and accepting. Enjoys making things fun for others.",
-    "ENFP": "Enthusiastic, creative, and spontaneous. Sees possibilities and connections.",
-    "ENTP": "Quick, ingenious, and stimulating. Enjoys new challenges.",
-    "ESTJ": "Practical, realistic, and decisive. Organized and quick to implement decisions.",
-    "ESFJ": "Warmhearted, conscientious, and cooperative. Seeks harmony and values traditions.",
-    "ENFJ": "Warm, empathetic, responsive, and responsible. Attuned to others' needs.",
-    "ENTJ": "Frank, decisive, and assumes leadership easily. Driven to organize and implement."
-}
-
-# Session storage for ongoing tests
-active_sessions = {}
+def capture_request(arrival: float, request: MCPRequest, session_id: Any, command: str, status: int,
+                    body: bytes):
+    """Append a handled /mcp request to the capture log"""
+    capture.record(arrival, session_id, request.query, request.context, request.action, request.value,
+                   request.request_id, command, status, body)
+
+def error_body(detail: str) -> bytes:
+    """Body FastAPI sends for an HTTPException, for capturing it"""
+    return json.dumps({"detail": detail}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 @app.post("/mcp", response_model=MCPResponse)
-async def process_mcp_request(request: MCPRequest):
+async def process_mcp_request(request: MCPRequest, http_request: Request):
     """Process MCP requests for personality testing"""
-    query = request.query.lower()
     context = request.context or {}
     session_id = context.get("session_id", "default")
-    
-    # Initialize session if it doesn't exist
-    if session_id not in active_sessions:
-        active_sessions[session_id] = {
-            "current_question": 0,
-            "answers": {},
-            "completed": False,
-            "personality_type": None
-        }
-    
-    session = active_sessions[session_id]
-    
-    # Handle different query types
-    if "start test" in query or "take personality test" in query:
-        return start_test(session_id)
-    elif "back" in query and not session["completed"] and session["current_question"] > 1:
-        return go_back(session_id)
-    elif "answer:" in query and not session["completed"]:
-        # Extract answer (1-5) from query
-        try:
-            answer = int(query.split("answer:")[1].strip())
-            if 1 <= answer <= 5:
-                return process_answer(session_id, answer)
-            else:
-                return MCPResponse(
-                    response="Please provide an answer between 1 (Strongly Disagree) and 5 (Strongly Agree).",
-                    context={"session_id": session_id}
-                )
-        except (ValueError, IndexError):
-            return MCPResponse(
-                response="I couldn't understand your answer. Please respond with 'answer: X' where X is a number from 1-5.",
-                context={"session_id": session_id}
-            )
-    elif "results" in query and session["completed"]:
-        return get_results(session_id)
-    else:
-        # Default response
-        if session["completed"]:
-            return MCPResponse(
-                response="Your personality test is complete. Ask for 'results' to see your personality type.",
-                context={"session_id": session_id}
-            )
-        elif session["current_question"] > 0:
-            current_q = personality_questions[session["current_question"] - 1]
-            return MCPResponse(
-                response=f"Please answer the current question: {current_q['question']} (1-5, where 1=Strongly Disagree, 5=Strongly Agree)\n\n"
-                        f"Type 'back' to go back to the previous question.",
-                context={"session_id": session_id, "current_question": session["current_question"]}
-            )
+    arrival = time.time() if capture else 0.0
+    try:
+        command, body = process_request(session_id, request.query, context, request.action, request.value,
+                                        request.request_id)
+    except ValueError as e:
+        http_request.scope[COMMAND_SCOPE_KEY] = "invalid"
+        if capture:
+            capture_request(arrival, request, session_id, "invalid", 400, error_body(str(e)))
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        # Turned away before any work was done, with a hint when to try again
+        http_request.scope[COMMAND_SCOPE_KEY] = "rejected"
+        if capture:
+            capture_request(arrival, request, session_id, "rejected", 503, error_body(str(e)))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    # Label the request's metrics with the command that handled it
+    http_request.scope[COMMAND_SCOPE_KEY] = command
+    if capture:
+        capture_request(arrival, request, session_id, command, 200, body)
+    # Bodies are pre-serialized, so skip response model validation and encoding
+    return Response(content=body, media_type="application/json")
+
+def parse_frame(frame: str) -> Tuple[str, Any]:
+    """Action and value of a WebSocket message
+
+    A message is a bare rating ("4"), a bare action name ("back", "results",
+    "status", "start"), or a JSON object with "action" and "value" as sent to /mcp.
+    """
+    frame = frame.strip()
+    if frame.startswith("{"):
+        message = json.loads(frame)
+        if not isinstance(message, dict) or not isinstance(message.get("action"), str):
+            raise ValueError("Messages must have an action")
+        return message["action"], message.get("value")
+    if frame.isdigit():
+        return "answer", int(frame)
+    return frame, None
+
+def error_frame(error: Exception) -> str:
+    """WebSocket message reporting a rejected message, with a retry hint when overloaded"""
+    message: Dict[str, Any] = {"error": str(error)}
+    if isinstance(error, Overloaded):
+        message["retry_after"] = error.retry_after
+    return json.dumps(message, separators=(",", ":"))
+
+def error_label(error: Exception) -> Tuple[str, int]:
+    """Metrics command label and status of a rejected message, as /mcp would report the request"""
+    return ("rejected", 503) if isinstance(error, Overloaded) else ("invalid", 400)
+
+@app.websocket("/ws")
+async def websocket_session(websocket: WebSocket):
+    """Run a whole test over one connection
+
+    The session is given by the ``session_id`` query parameter (a new one by
+    default) and bound to the connection. A new test is started on connect,
+    on the bank selected by the ``instrument``, ``locale`` and ``version``
+    query parameters; an existing session resumes where it was. Each message
+    is answered with the same JSON body /mcp would return.
+
+    The session is looked up again for every message, as /mcp does, so the
+    store sees it in use. If it was evicted or expired in the meantime the
+    connection is closed with 1008.
+
+    The metrics middleware only sees HTTP requests, so each message is
+    counted in /metrics here, labelled like the /mcp request it stands for.
+    """
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id") or uuid.uuid4().hex
+    selectors = {key: websocket.query_params[key] for key in BANK_SELECTORS if key in websocket.query_params}
+    started = time.perf_counter()
+    try:
+        session = session_store.get(session_id)
+        if session is None:
+            command, reply = handle_session_action("start", selectors or None, session_id, EMPTY_SESSION)
         else:
-            return MCPResponse(
-                response="Welcome to the Personality Test. Type 'start test' to begin.",
-                context={"session_id": session_id}
-            )
-
-def start_test(session_id: str) -> MCPResponse:
-    """Start a new personality test"""
-    active_sessions[session_id] = {
-        "current_question": 1,
-        "answers": {},
-        "completed": False,
-        "personality_type": None
-    }
-    
-    first_question = personality_questions[0]
-    return MCPResponse(
-        response=f"Let's start your personality test. For each statement, respond with a number from 1-5:\n"
-                f"1 = Strongly Disagree\n2 = Disagree\n3 = Neutral\n4 = Agree\n5 = Strongly Agree\n\n"
-                f"Question 1: {first_question['question']}\n\n"
-                f"Respond with 'answer: X' where X is your rating.",
-        context={"session_id": session_id, "current_question": 1, "total_questions": len(personality_questions)}
-    )
+            command, reply = "fallback", default_response(session)
+    except (ValueError, Overloaded) as e:
+        metrics.observe_request(*error_label(e), time.perf_counter() - started)
+        await websocket.send_text(error_frame(e))
+        # 1013: try again later, 1008: policy violation
+        await websocket.close(code=1013 if isinstance(e, Overloaded) else 1008)
+        return
+    await websocket.send_text(reply.render(session_id).decode("utf-8"))
+    metrics.observe_request(command, 200, time.perf_counter() - started)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            started = time.perf_counter()
+            session = session_store.get(session_id)
+            if session is None:
+                metrics.observe_request("expired", 410, time.perf_counter() - started)
+                await websocket.send_text(error_frame(ValueError("Session expired; reconnect to start a new test")))
+                await websocket.close(code=1008)
+                break
+            try:
+                # Binary frames are taken as UTF-8 text
+                frame = message.get("text")
+                if frame is None:
+                    frame = (message.get("bytes") or b"").decode("utf-8")
+                action, value = parse_frame(frame)
+                command, reply = handle_session_action(action, value, session_id, session)
+            except (ValueError, Overloaded) as e:
+                metrics.observe_request(*error_label(e), time.perf_counter() - started)
+                await websocket.send_text(error_frame(e))
+                continue
+            await websocket.send_text(reply.render(session_id).decode("utf-8"))
+            metrics.observe_request(command, 200, time.perf_counter() - started)
+    except WebSocketDisconnect:
+        pass
 
-def process_answer(session_id: str, answer: int) -> MCPResponse:
-    """Process an answer and return the next question"""
-    session = active_sessions[session_id]
-    current_idx = session["current_question"] - 1
-    
-    # Store the answer
-    current_question = personality_questions[current_idx]
-    session["answers"][current_question["id"]] = answer
-    
-    # Move to next question
-    session["current_question"] += 1
-    
-    # Check if test is complete
-    if session["current_question"] > len(personality_questions):
-        session["completed"] = True
-        session["personality_type"] = calculate_personality_type(session["answers"])
-        return MCPResponse(
-            response="Thank you for completing the test! Type 'results' to see your personality type.",
-            context={"session_id": session_id, "completed": True}
+@app.post("/score/batch")
+async def score_batch(request: Request):
+    """Score many answer sheets in one call
+
+    The body is either JSON ``{"sheets": [...]}`` where each sheet is a list of
+    answers in question order or a question id -> answer mapping, or a packed
+    int8 matrix sent as ``application/octet-stream`` with one row per sheet and
+    one column per question. Answers are 1-5, with 0 for unanswered questions.
+
+    Send ``Accept: application/octet-stream`` to get a packed reply: one uint8
+    type code per sheet followed by the little-endian int16 scores, four per
+    sheet. Bit k of a type code is set when dimension k scored negative
+    (e.g. code 0 is ESTJ, code 15 is INFP).
+
+    Sheets are scored with the default question bank unless another one is
+    selected with the ``instrument``, ``locale`` and ``version`` query parameters.
+    """
+    # Imported here rather than at startup; see questionnaire.py
+    import numpy as np
+
+    body = await request.body()
+    try:
+        selectors = {key: request.query_params[key] for key in BANK_SELECTORS if key in request.query_params}
+        questionnaire = get_runtime(registry.get(**selectors)).questionnaire if selectors else default_runtime.questionnaire
+        if request.headers.get("content-type", "").startswith("application/octet-stream"):
+            if len(body) % len(questionnaire):
+                raise ValueError(f"Packed body must be a multiple of {len(questionnaire)} bytes")
+            matrix = np.frombuffer(body, dtype=np.int8).reshape(-1, len(questionnaire))
+            questionnaire.validate_matrix(matrix)
+        else:
+            payload = json.loads(body or b"{}")
+            matrix = questionnaire.answer_matrix(payload.get("sheets") or [])
+    except (ValueError, TypeError, OverflowError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid answer sheets: {e}")
+
+    codes, scores = questionnaire.score_batch(matrix)
+
+    if request.headers.get("accept", "").startswith("application/octet-stream"):
+        return Response(
+            content=codes.tobytes() + scores.astype("<i2").tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Sheet-Count": str(len(codes))}
         )
-    
-    # Return next question
-    next_question = personality_questions[session["current_question"] - 1]
-    return MCPResponse(
-        response=f"Question {session['current_question']}/{len(personality_questions)}: {next_question['question']}\n\n"
-                f"(1=Strongly Disagree, 5=Strongly Agree)\n\n"
-                f"Type 'back' to go back to the previous question.",
-        context={
-            "session_id": session_id, 
-            "current_question": session["current_question"],
-            "total_questions": len(personality_questions),
-            "progress": f"{session['current_question']}/{len(personality_questions)}"
-        }
-    )
 
-def calculate_personality_type(answers: Dict[str, int]) -> str:
-    """Calculate MBTI personality type based on answers"""
-    # Initialize scores for each dimension
-    scores = {
-        "EI": 0,  # Positive = E, Negative = I
-        "SN": 0,  # Positive = S, Negative = N
-        "TF": 0,  # Positive = T, Negative = F
-        "JP": 0,  # Positive = J, Negative = P
+    return {
+        "count": len(codes),
+        "dimensions": list(DIMENSIONS),
+        "types": [PERSONALITY_TYPES[code] for code in codes.tolist()],
+        "scores": scores.tolist()
     }
-    
-    # Calculate scores
-    for question_id, answer in answers.items():
-        dimension = next((q["dimension"] for q in personality_questions if q["id"] == question_id), None)
-        if dimension:
-            # Convert 1-5 scale to -2 to +2 scale
-            adjusted_score = answer - 3
-            scores[dimension] += adjusted_score
-    
-    # Determine type
-    personality_type = ""
-    personality_type += "E" if scores["EI"] >= 0 else "I"
-    personality_type += "S" if scores["SN"] >= 0 else "N"
-    personality_type += "T" if scores["TF"] >= 0 else "F"
-    personality_type += "J" if scores["JP"] >= 0 else "P"
-    
-    return personality_type
-
-def get_results(session_id: str) -> MCPResponse:
-    """Return personality test results"""
-    session = active_sessions[session_id]
-    if not session["completed"]:
-        return MCPResponse(
-            response="You haven't completed the test yet.",
-            context={"session_id": session_id}
-        )
-    
-    personality_type = session["personality_type"]
-    description = personality_descriptions.get(personality_type, "No description available.")
-    
-    return MCPResponse(
-        response=f"Your personality type is: {personality_type}\n\n{description}",
-        context={
-            "session_id": session_id,
-            "personality_type": personality_type,
-            "description": description
-        }
-    )
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "sessions": len(session_store),
+        "max_sessions": session_store.max_sessions,
+        "bytes_per_session": session_store.bytes_per_session()
+    }
 
-if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-def go_back(session_id: str) -> MCPResponse:
-    """Go back to the previous question"""
-    session = active_sessions[session_id]
-    
-    # Can't go back if at first question
-    if session["current_question"] <= 1:
-        return MCPResponse(
-            response="You're already at the first question.",
-            context={"session_id": session_id, "current_question": session["current_question"]}
-        )
-    
-    # Move back one question
-    session["current_question"] -= 1
-    
-    # Get the previous question
-    prev_question = personality_questions[session["current_question"] - 1]
-    
-    # Get the previous answer if it exists
-    prev_answer = session["answers"].get(prev_question["id"], None)
-    prev_answer_text = f" (Your previous answer: {prev_answer})" if prev_answer else ""
-    
-    return MCPResponse(
-        response=f"Going back to Question {session['current_question']}/{len(personality_questions)}: {prev_question['question']}\n\n"
-                f"(1=Strongly Disagree, 5=Strongly Agree){prev_answer_text}\n\n"
-                f"Type 'answer: X' to provide a new answer.",
-        context={
-            "session_id": session_id, 
-            "current_question": session["current_question"],
-            "total_questions": len(personality_questions),
-            "progress": f"{session['current_question']}/{len(personality_questions)}"
-        }
+@app.get("/analytics")
+async def get_analytics():
+    """Type distribution, per-question answer histograms and score quantiles of all completed tests
+
+    Completions are folded into running aggregates as they happen, so this
+    never looks at sessions; the report is only re-rendered after new completions.
+    """
+    return Response(content=analytics.report(describe_bank), media_type="application/json")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, session and completion metrics in the Prometheus text format"""
+    sessions = len(session_store)
+    completed = session_store.completed_count()
+    gauges = {
+        "mcp_sessions_live": ("Stored sessions with a test in progress", sessions - completed),
+        "mcp_sessions_completed": ("Stored sessions with a completed test", completed),
+        "mcp_session_store_bytes": ("Estimated bytes used by the session store",
+                                    sessions * session_store.bytes_per_session()),
+        "mcp_queueing_delay_seconds": ("Smoothed event loop queueing delay seen by admission control",
+                                       admission.smoothed_delay)
+    }
+    return PlainTextResponse(metrics.render(gauges), media_type=METRICS_CONTENT_TYPE)
+
+def main():
+    """Run the server"""
+    parser = argparse.ArgumentParser(description="Personality Test MCP Server")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind to")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes, 0 for one per CPU core")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Seconds to hold idle keep-alive connections open")
+    parser.add_argument("--backlog", type=int, default=2048, help="Maximum number of pending connections")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto",
+                        help="Event loop implementation (auto picks uvloop when installed)")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default="auto",
+                        help="HTTP parser (auto picks httptools when installed)")
+    parser.add_argument("--log-level", choices=["critical", "error", "warning", "info", "debug"], default="info",
+                        help="Log level")
+    parser.add_argument("--access-log", action="store_true", help="Log every request")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds to let in-flight requests finish after SIGTERM")
+    parser.add_argument("--debug", action="store_true", help="Debug logging, including every request")
+    args = parser.parse_args()
+
+    if args.debug:
+        args.log_level = "debug"
+        args.access_log = True
+    workers = args.workers or os.cpu_count() or 1
+
+    # Worker processes import the app afresh, so pass the log level through the environment
+    os.environ["LOG_LEVEL"] = args.log_level
+    logging.getLogger().setLevel(args.log_level.upper())
+    if workers > 1 and isinstance(session_store, SessionStore):
+        logger.warning("Running %d workers with in-memory sessions; set SESSION_BACKEND=sqlite to share them", workers)
+    if workers > 1 and ANALYTICS_SNAPSHOT:
+        logger.warning("Running %d workers with one analytics snapshot; each worker keeps its own aggregates and "
+                       "overwrites the others' snapshot", workers)
+
+    # Only needed to serve, not to import the app (e.g. in-process benchmarks or worker processes)
+    import uvicorn
+
+    # On SIGTERM uvicorn stops accepting connections, lets in-flight requests
+    # finish within the graceful timeout, then runs the shutdown handlers
+    uvicorn.run(
+        "app:app" if workers > 1 else app,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        access_log=args.access_log
     )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Opt-in capture of /mcp traffic to a compact JSON lines log, for replaying later
+"""
+
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+
+def response_digest(body: bytes) -> str:
+    """Short fingerprint of a response body, for spotting divergences on replay"""
+    return format(zlib.crc32(body), "08x")
+
+
+class TrafficCapture:
+    """Appends one line per /mcp request to a log file
+
+    Each line holds the arrival time (``t``, Unix seconds), the session id
+    (``s``), whichever of query (``q``), context (``c``), action (``a``),
+    value (``v``) and request id (``r``) the request carried, and the
+    outcome: the command that handled it (``k``), the HTTP status (``st``)
+    and a digest of the response body (``d``).
+
+    Lines are buffered in memory and written with a single append per batch
+    of whole lines, so several worker processes can share one log without
+    interleaving partial lines.
+    """
+
+    def __init__(self, path: str, buffer_lines: int = 256):
+        self.path = path
+        self.buffer_lines = buffer_lines
+        self.captured = 0
+        self._buffer: List[str] = []
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def record(self, arrival: float, session_id: Any, query: str, context: Optional[Dict[str, Any]],
+               action: Optional[str], value: Any, request_id: Any, command: str, status: int, body: bytes):
+        """Log one handled request"""
+        entry: Dict[str, Any] = {"t": round(arrival, 6), "s": session_id}
+        if query:
+            entry["q"] = query
+        if context:
+            entry["c"] = context
+        if action is not None:
+            entry["a"] = action
+        if value is not None:
+            entry["v"] = value
+        if request_id is not None:
+            entry["r"] = request_id
+        entry["k"] = command
+        entry["st"] = status
+        entry["d"] = response_digest(body)
+        self._buffer.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        self.captured += 1
+        if len(self._buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        """Write out buffered lines"""
+        if self._buffer:
+            data = ("\n".join(self._buffer) + "\n").encode("utf-8")
+            self._buffer.clear()
+            os.write(self._fd, data)
+
+    def close(self):
+        """Flush and close the log"""
+        self.flush()
+        os.close(self._fd)
+
+
+def read_capture(path: str) -> List[Dict[str, Any]]:
+    """Entries of a capture log, in arrival order"""
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
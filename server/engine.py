@@ -0,0 +1,445 @@
+"""
+Transport-independent core of the personality test MCP server
+
+Holds the question banks, session storage and command handlers, and turns
+one MCP request into its serialized response. The HTTP app and the stdio
+JSON-RPC server are thin layers over process_request(); this module does
+not import FastAPI or uvicorn.
+"""
+
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Any, Tuple
+
+from admission import AdmissionController
+from analytics import PopulationAnalytics
+from metrics import Metrics
+from question_bank import BANK_SELECTORS, QuestionBank, registry
+from questionnaire import CompiledQuestionnaire, DIMENSIONS, PERSONALITY_TYPES
+from replay_cache import ReplayCache
+from responses import PreparedResponse, load_responses
+from session_store import Session, SessionBackend, SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Request latencies per command and test completions
+metrics = Metrics(PERSONALITY_TYPES)
+
+class BankRuntime:
+    """A question bank compiled for scoring, with every response it can produce rendered"""
+
+    def __init__(self, bank: QuestionBank):
+        self.bank = bank
+        self.questionnaire = CompiledQuestionnaire(bank.questions)
+        # Rendered ahead of time next to the compiled bank (see main()), or on first use
+        self.responses = load_responses(bank.path + ".responses", bank.source, bank.questions, bank.descriptions,
+                                        PERSONALITY_TYPES)
+        self.total = len(self.questionnaire)
+        # Read-only stand-in for unknown sessions, so queries that don't start a test allocate nothing
+        self.empty_session = Session(self.total, bank.code)
+
+# Banks in use by this worker, by bank code; loaded on first use
+bank_runtimes: Dict[int, BankRuntime] = {}
+
+def get_runtime(bank: QuestionBank) -> BankRuntime:
+    """Compiled questionnaire and responses of a bank, built once per worker"""
+    runtime = bank_runtimes.get(bank.code)
+    if runtime is None:
+        runtime = bank_runtimes[bank.code] = BankRuntime(bank)
+    return runtime
+
+# The default bank, compiled once at startup for O(1) lookups and matrix scoring
+default_runtime = get_runtime(registry.get())
+questionnaire = default_runtime.questionnaire
+
+def runtime_for(session: Session) -> BankRuntime:
+    """The bank a session is pinned to"""
+    if not session.bank or session.bank == default_runtime.bank.code:
+        return default_runtime
+    runtime = bank_runtimes.get(session.bank)
+    return runtime if runtime is not None else get_runtime(registry.by_code(session.bank))
+
+def create_session_store() -> SessionBackend:
+    """Create the session backend selected by the SESSION_BACKEND environment variable"""
+    backend = os.environ.get("SESSION_BACKEND", "memory")
+    idle_ttl = float(os.environ.get("SESSION_IDLE_TTL", "3600"))
+
+    if backend == "memory":
+        # In-process storage, bounded by a memory budget and an idle TTL
+        return SessionStore(
+            len(questionnaire),
+            memory_budget=int(os.environ.get("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024,
+            idle_ttl=idle_ttl
+        )
+    if backend == "sqlite":
+        # Shared by all worker processes on this host
+        from session_sqlite import SQLiteSessionStore
+        return SQLiteSessionStore(
+            os.environ.get("SESSION_DB", "sessions.db"),
+            len(questionnaire),
+            idle_ttl=idle_ttl,
+            flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", "0"))
+        )
+    raise ValueError(f"Unknown session backend: {backend}")
+
+# Session storage for ongoing tests
+session_store = create_session_store()
+
+# Every response body of the default bank, rendered once at startup
+responses = default_runtime.responses
+
+# Adaptive testing skips questions that can no longer change a dimension's letter,
+# optionally also those that could only move it by at most the margin
+ADAPTIVE_TESTING = os.environ.get("ADAPTIVE_TESTING", "0").lower() in ("1", "true", "yes", "on")
+ADAPTIVE_MARGIN = int(os.environ.get("ADAPTIVE_MARGIN", "0"))
+
+EMPTY_SESSION = default_runtime.empty_session
+
+# Limits on starting new sessions under load; sessions in progress are never limited
+admission = AdmissionController(
+    rate=float(os.environ.get("ADMISSION_RATE", "0")),
+    burst=float(os.environ.get("ADMISSION_BURST", "0")),
+    max_delay=float(os.environ.get("ADMISSION_MAX_DELAY_MS", "0")) / 1000
+)
+
+# Population aggregates of completed tests, optionally resumed from and
+# periodically written to a snapshot file
+analytics = PopulationAnalytics(PERSONALITY_TYPES)
+ANALYTICS_SNAPSHOT = os.environ.get("ANALYTICS_SNAPSHOT", "")
+ANALYTICS_SNAPSHOT_INTERVAL = float(os.environ.get("ANALYTICS_SNAPSHOT_INTERVAL", "60"))
+if ANALYTICS_SNAPSHOT:
+    analytics.load(ANALYTICS_SNAPSHOT)
+
+def snapshot_analytics():
+    """Write the analytics snapshot, if one is configured and anything changed since the last"""
+    if ANALYTICS_SNAPSHOT:
+        analytics.save(ANALYTICS_SNAPSHOT)
+
+def describe_bank(code: int) -> Optional[Tuple[str, List[str]]]:
+    """Name and question ids of a bank, for analytics reports; None if it is no longer available"""
+    try:
+        runtime = get_runtime(registry.by_code(code))
+    except ValueError:
+        return None
+    return runtime.bank.key, runtime.questionnaire.ids
+
+# Recent responses per session, replayed when a request id is seen again
+replay_cache = ReplayCache(
+    max_sessions=int(os.environ.get("REPLAY_CACHE_SESSIONS", "4096")),
+    per_session=int(os.environ.get("REPLAY_CACHE_PER_SESSION", "4"))
+)
+
+def process_request(session_id: Any, query: str = "", context: Optional[Dict[str, Any]] = None,
+                    action: Optional[str] = None, value: Any = None,
+                    request_id: Any = None) -> Tuple[str, bytes]:
+    """Handle one MCP request, returning the command that handled it and the serialized response
+
+    Raises ValueError for requests that can't be handled, such as unknown actions,
+    and Overloaded when a request that would start a new session is turned away.
+    """
+    # A retry of a request that was already applied gets the same response again
+    if request_id is not None:
+        replay = replay_cache.get(session_id, request_id)
+        if replay is not None:
+            return "replay", replay
+    
+    if action is not None:
+        command, reply = handle_action(action, value, session_id)
+    else:
+        command, reply = handle_query(query, session_id, context)
+    body = reply.render(session_id)
+    
+    if request_id is not None:
+        # Request ids may start over with a new test
+        if command == "start":
+            replay_cache.clear(session_id)
+        replay_cache.put(session_id, request_id, body)
+    return command, body
+
+# Free-text phrases for each command, found with a single scan of the query
+_COMMAND_PATTERN = re.compile(r"start test|take personality test|\bback\b|answer:|answers:|results|\bstatus\b")
+_COMMAND_PHRASES = {
+    "start test": "start",
+    "take personality test": "start",
+    "back": "back",
+    "answer:": "answer",
+    "answers:": "answers",
+    "results": "results",
+    "status": "status"
+}
+
+def parse_query(query: str) -> Dict[str, Any]:
+    """Find the commands mentioned in a lowercased query, mapped to their values"""
+    mentioned = {}
+    for match in _COMMAND_PATTERN.finditer(query):
+        action = _COMMAND_PHRASES[match.group()]
+        if action in mentioned:
+            continue
+        if action == "answer":
+            # An answer's value is the text up to the next "answer:", if any
+            mentioned[action] = query[match.end():].split("answer:", 1)[0]
+        elif action == "answers":
+            mentioned[action] = query[match.end():]
+        else:
+            mentioned[action] = None
+    return mentioned
+
+def handle_query(query: str, session_id: Any, context: Optional[Dict[str, Any]] = None) -> Tuple[str, PreparedResponse]:
+    """Dispatch a free-text query for a session, returning the command that handled it and its response"""
+    mentioned = parse_query(query.lower())
+    
+    # An answer set can also be sent in the context, keyed by question id
+    if "answers" in mentioned and not mentioned["answers"].strip() and context:
+        mentioned["answers"] = context.get("answers")
+    
+    # A test can be started on another bank by naming it in the context
+    if "start" in mentioned and context:
+        mentioned["start"] = {key: context[key] for key in BANK_SELECTORS if key in context} or None
+    
+    # Sessions are only created when a test starts
+    session = session_store.get(session_id) or EMPTY_SESSION
+    
+    # When several commands are mentioned, the first one allowed in the session's state wins
+    for action in COMMAND_PRIORITY:
+        if action in mentioned:
+            allowed, handler = COMMANDS[action]
+            if allowed(session):
+                return action, handler(session_id, session, mentioned[action])
+    return "fallback", default_response(session)
+
+def handle_action(action: str, value: Any, session_id: Any) -> Tuple[str, PreparedResponse]:
+    """Dispatch a structured command for a session, without any text parsing"""
+    if action not in COMMANDS:
+        raise ValueError(f"Unknown action: {action}")
+    return handle_session_action(action, value, session_id, session_store.get(session_id) or EMPTY_SESSION)
+
+def handle_session_action(action: str, value: Any, session_id: Any, session: Session) -> Tuple[str, PreparedResponse]:
+    """Dispatch a structured command for a session the caller already holds, e.g. one pinned to a connection
+
+    Pass EMPTY_SESSION for a session that doesn't exist yet. Starting a test
+    replaces the stored session, so callers holding one should fetch it
+    again after a "start" (or after answers submitted for EMPTY_SESSION).
+    """
+    command = COMMANDS.get(action)
+    if command is None:
+        raise ValueError(f"Unknown action: {action}")
+    
+    allowed, handler = command
+    if allowed(session):
+        return action, handler(session_id, session, value)
+    return "fallback", default_response(session)
+
+def default_response(session: Session) -> PreparedResponse:
+    """Respond to a query that isn't a command allowed in the session's state"""
+    responses = runtime_for(session).responses
+    if session.completed:
+        return responses.test_complete
+    elif session.current_question > 0:
+        return responses.current[session.current_question]
+    else:
+        return responses.welcome
+
+def submit_answers(session_id: Any, session: Session, value: Any) -> PreparedResponse:
+    """Validate and record a full or partial answer set in one pass"""
+    runtime = runtime_for(session)
+    questionnaire, responses = runtime.questionnaire, runtime.responses
+    updates = parse_answer_set(value, session, runtime)
+    if not updates:
+        return responses.invalid_answers
+    
+    # Submitting answers implicitly starts the test
+    if session is EMPTY_SESSION:
+        admission.admit()
+        session = session_store.create(session_id, runtime.total, runtime.bank.code)
+    for index, answer in updates:
+        questionnaire.record_answer(session, index, answer)
+    
+    # Continue at the first unanswered question, or score the completed sheet
+    if ADAPTIVE_TESTING:
+        next_idx = questionnaire.first_open_item(session.answers, ADAPTIVE_MARGIN)
+    else:
+        next_idx = session.answers.find(0)
+    if next_idx == -1:
+        session.current_question = runtime.total + 1
+        complete_test(runtime, session_id, session)
+        session_store.save(session_id, session)
+        return responses.completion_with_results(runtime.total - session.answered, session.type_code)
+    
+    session.current_question = next_idx + 1
+    session_store.save(session_id, session)
+    return responses.question[session.current_question]
+
+def parse_answer(value: Any) -> Optional[int]:
+    """An answer given as an int or a string of digits, or None; floats and booleans are not answers"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdecimal():
+        return int(value)
+    return None
+
+def parse_answer_set(value: Any, session: Session, runtime: BankRuntime) -> Optional[List[Tuple[int, int]]]:
+    """Turn an answer set into (question index, answer) pairs, or None if any part is invalid
+
+    The set is either a sequence of answers for consecutive questions starting
+    at the current one (a list, or text like "4,5,3"), or a mapping from
+    question id to answer.
+    """
+    if isinstance(value, str):
+        value = [token for token in re.split(r"[\s,]+", value) if token]
+    
+    if isinstance(value, dict):
+        pairs = [(runtime.questionnaire.index.get(question_id), answer) for question_id, answer in value.items()]
+    elif isinstance(value, (list, tuple)):
+        start = max(session.current_question, 1) - 1
+        if start + len(value) > runtime.total:
+            return None
+        pairs = list(enumerate(value, start=start))
+    else:
+        return None
+    
+    updates = []
+    for index, answer in pairs:
+        answer = parse_answer(answer)
+        if index is None or answer is None or not 1 <= answer <= 5:
+            return None
+        updates.append((index, answer))
+    return updates
+
+def answer_command(session_id: Any, session: Session, value: Any) -> PreparedResponse:
+    """Validate an answer (1-5) and record it"""
+    responses = runtime_for(session).responses
+    answer = parse_answer(value)
+    if answer is None:
+        return responses.unparseable_answer
+    if not 1 <= answer <= 5:
+        return responses.invalid_answer
+    return process_answer(session_id, session, answer)
+
+def start_test(session_id: Any, value: Any = None, session: Optional[Session] = None) -> PreparedResponse:
+    """Start a new personality test, on the default bank or the one selected by instrument/locale/version
+
+    Raises Overloaded when admission control turns away a new session;
+    restarting a stored session is always allowed.
+    """
+    if isinstance(value, dict) and any(key in value for key in BANK_SELECTORS):
+        runtime = get_runtime(registry.get(**{key: value[key] for key in BANK_SELECTORS if key in value}))
+    else:
+        runtime = default_runtime
+    # Only after the bank is known to exist, so bad requests don't spend admission tokens
+    if session is None or session is EMPTY_SESSION:
+        admission.admit()
+    session = session_store.create(session_id, runtime.total, runtime.bank.code)
+    session.current_question = 1
+    session_store.save(session_id, session)
+    return runtime.responses.start
+
+def process_answer(session_id: Any, session: Session, answer: int) -> PreparedResponse:
+    """Process an answer and return the next question"""
+    runtime = runtime_for(session)
+    questionnaire, responses = runtime.questionnaire, runtime.responses
+    current_idx = session.current_question - 1
+    
+    # Store the answer, updating the running scores
+    questionnaire.record_answer(session, current_idx, answer)
+    
+    # Move to next question, skipping those that can't change the result in adaptive mode
+    if ADAPTIVE_TESTING:
+        next_idx = questionnaire.next_item(session.answers, current_idx + 1, ADAPTIVE_MARGIN)
+        session.current_question = next_idx + 1 if next_idx >= 0 else runtime.total + 1
+    else:
+        session.current_question += 1
+    
+    # Score the test once the last question is answered
+    if session.current_question > runtime.total:
+        complete_test(runtime, session_id, session)
+    session_store.save(session_id, session)
+    
+    # Check if test is complete
+    if session.completed:
+        return responses.completion(runtime.total - session.answered)
+    
+    # Return next question
+    return responses.question[session.current_question]
+
+def complete_test(runtime: BankRuntime, session_id: Any, session: Session):
+    """Score a session whose last question was answered, and count it in the store, metrics and analytics"""
+    scores = runtime.questionnaire.running_scores(session)
+    session.type_code = runtime.questionnaire.scores_type_code(scores)
+    session_store.record_completion(session_id, session)
+    metrics.record_completion(session.type_code)
+    analytics.record_completion(runtime.bank.code, runtime.questionnaire, session.answers, scores, session.type_code)
+
+def go_back(session_id: Any, session: Session) -> PreparedResponse:
+    """Go back to the previous question"""
+    responses = runtime_for(session).responses
+    # Can't go back if at first question
+    if session.current_question <= 1:
+        return responses.already_first[session.current_question]
+    
+    # Move back one question; in adaptive mode, to the previous answered one
+    previous_idx = session.current_question - 2
+    if ADAPTIVE_TESTING:
+        while previous_idx > 0 and not session.answers[previous_idx]:
+            previous_idx -= 1
+    session.current_question = previous_idx + 1
+    session_store.save(session_id, session)
+    
+    # Show the previous question along with the previous answer if it exists
+    return responses.back[session.current_question][session.answers[session.current_question - 1]]
+
+def calculate_personality_type(answers: Dict[str, int]) -> str:
+    """Calculate MBTI personality type based on answers"""
+    return questionnaire.personality_type(questionnaire.score(answers))
+
+def get_results(session_id: Any, session: Session) -> PreparedResponse:
+    """Return personality test results"""
+    responses = runtime_for(session).responses
+    if not session.completed:
+        return responses.not_completed
+    return responses.results[session.type_code]
+
+def get_status(session_id: Any, session: Session) -> PreparedResponse:
+    """Return the provisional type and scores from the answers so far"""
+    questionnaire = runtime_for(session).questionnaire
+    scores = questionnaire.running_scores(session)
+    personality_type = PERSONALITY_TYPES[questionnaire.scores_type_code(scores)]
+    answered = session.answered
+    total = len(questionnaire)
+    score_text = ", ".join(f"{dim}: {score:+d}" for dim, score in zip(DIMENSIONS, scores))
+    return PreparedResponse(
+        f"{'Final' if session.completed else 'Provisional'} personality type after {answered} of {total} "
+        f"answers: {personality_type} ({score_text})",
+        {
+            "answered": answered,
+            "total_questions": total,
+            "provisional_type": personality_type,
+            "scores": dict(zip(DIMENSIONS, scores)),
+            "completed": session.completed
+        }
+    )
+
+# Dispatch table: action -> (whether the session's state allows it, handler)
+COMMANDS = {
+    "start": (lambda session: True, lambda session_id, session, value: start_test(session_id, value, session)),
+    "back": (lambda session: not session.completed and session.current_question > 1,
+             lambda session_id, session, value: go_back(session_id, session)),
+    "answer": (lambda session: not session.completed and session.current_question > 0, answer_command),
+    "answers": (lambda session: not session.completed, submit_answers),
+    "results": (lambda session: session.completed,
+                lambda session_id, session, value: get_results(session_id, session)),
+    "status": (lambda session: session.current_question > 0,
+               lambda session_id, session, value: get_status(session_id, session))
+}
+
+# Order in which free-text commands take precedence
+COMMAND_PRIORITY = ("start", "back", "answer", "answers", "results", "status")
+
+def main():
+    """Compile every question bank and render its responses ahead of time, e.g. while building an image"""
+    for selector in sorted(registry.sources):
+        runtime = get_runtime(registry.get(*selector))
+        print(f"{runtime.bank.key} -> {runtime.bank.path}, {runtime.bank.path}.responses")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Personality Test MCP Server over stdio
+
+Speaks MCP's newline-delimited JSON-RPC 2.0 on stdin and stdout, so a local
+client can spawn the server as a subprocess instead of going through HTTP.
+Each test command is exposed as a tool and handled by the same engine as the
+HTTP server. Logs go to stderr; stdout carries protocol messages only.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, Optional, TextIO
+
+from admission import Overloaded
+from engine import BANK_SELECTORS, process_request, session_store, snapshot_analytics
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2024-11-05"
+SERVER_INFO = {"name": "personality-test-mcp", "version": "1.0.0"}
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Arguments every tool accepts
+_COMMON_PROPERTIES = {
+    "session_id": {"type": "string", "description": "Session to act on; defaults to one session per server process"},
+    "request_id": {"type": ["string", "integer"],
+                   "description": "Client-chosen id that makes retries of this call safe"}
+}
+
+# Tool name -> (engine action, description, input schema properties, required properties)
+TOOLS = {
+    "start_test": ("start", "Start a new personality test, optionally on a specific question bank", {
+        "instrument": {"type": "string", "description": "Question bank instrument"},
+        "locale": {"type": "string", "description": "Question bank locale"},
+        "version": {"type": "integer", "description": "Question bank version, latest if omitted"}
+    }, []),
+    "answer_question": ("answer", "Answer the current question on a 1-5 scale", {
+        "answer": {"type": "integer", "minimum": 1, "maximum": 5,
+                   "description": "1 = strongly disagree, 5 = strongly agree"}
+    }, ["answer"]),
+    "go_back": ("back", "Go back to the previous question", {}, []),
+    "submit_answers": ("answers", "Submit several answers at once", {
+        "answers": {"type": ["array", "object"],
+                    "description": "Answers in question order, or a question id -> answer mapping"}
+    }, ["answers"]),
+    "get_results": ("results", "Get the personality type of a completed test", {}, []),
+    "get_status": ("status", "Get progress and provisional scores of the current test", {}, [])
+}
+
+
+def tool_definitions():
+    """Tool list in the shape returned by tools/list"""
+    return [
+        {
+            "name": name,
+            "description": description,
+            "inputSchema": {
+                "type": "object",
+                "properties": {**_COMMON_PROPERTIES, **properties},
+                "required": required
+            }
+        }
+        for name, (_, description, properties, required) in TOOLS.items()
+    ]
+
+
+class StdioServer:
+    """Handles JSON-RPC messages read one per line"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a tool, returning its tools/call result"""
+        action = TOOLS[name][0]
+        if action == "start":
+            value = {key: arguments[key] for key in BANK_SELECTORS if key in arguments} or None
+        elif action == "answer":
+            value = arguments.get("answer")
+        elif action == "answers":
+            value = arguments.get("answers")
+        else:
+            value = None
+        session_id = arguments.get("session_id", self.session_id)
+        if not isinstance(session_id, str):
+            raise RpcError(INVALID_PARAMS, "session_id must be a string")
+        try:
+            _, body = process_request(session_id, action=action, value=value, request_id=arguments.get("request_id"))
+        except (ValueError, Overloaded) as e:
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        reply = json.loads(body)
+        return {
+            "content": [{"type": "text", "text": reply["response"]}],
+            "structuredContent": reply["context"],
+            "isError": False
+        }
+
+    def dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        """Result of a request; raises RpcError for errors to send back"""
+        if method == "initialize":
+            return {
+                "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+                "capabilities": {"tools": {}},
+                "serverInfo": SERVER_INFO
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": tool_definitions()}
+        if method == "tools/call":
+            name = params.get("name")
+            if name not in TOOLS:
+                raise RpcError(INVALID_PARAMS, f"Unknown tool: {name}")
+            arguments = params.get("arguments") or {}
+            if not isinstance(arguments, dict):
+                raise RpcError(INVALID_PARAMS, "Tool arguments must be an object")
+            return self.call_tool(name, arguments)
+        raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+
+    def handle_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """Reply to one message, or None for notifications"""
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            return _error(None, PARSE_ERROR, f"Parse error: {e}")
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            return _error(message.get("id") if isinstance(message, dict) else None, INVALID_REQUEST, "Invalid request")
+
+        # Notifications (no id) never get a reply
+        is_notification = "id" not in message
+        params = message.get("params") or {}
+        try:
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "Params must be an object")
+            result = self.dispatch(message["method"], params)
+        except RpcError as e:
+            return None if is_notification else _error(message["id"], e.code, e.message)
+        except Exception:
+            # One bad call must not take down the server and every session it holds
+            logger.exception("Error handling %s", message["method"])
+            return None if is_notification else _error(message["id"], INTERNAL_ERROR, "Internal error")
+        if is_notification:
+            return None
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+    def serve(self, stdin: TextIO, stdout: TextIO):
+        """Serve messages until stdin is closed"""
+        for line in stdin:
+            if not line.strip():
+                continue
+            reply = self.handle_line(line)
+            if reply is not None:
+                stdout.write(json.dumps(reply) + "\n")
+                stdout.flush()
+
+
+class RpcError(Exception):
+    """JSON-RPC error to send back for a request"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _error(message_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": message_id, "error": {"code": code, "message": message}}
+
+
+def main():
+    """Run the server on stdin and stdout"""
+    parser = argparse.ArgumentParser(description="Personality Test MCP Server over stdio")
+    parser.add_argument("--session-id", default="stdio", help="Session used by tool calls that don't name one")
+    parser.add_argument("--log-level", choices=["critical", "error", "warning", "info", "debug"],
+                        default=os.environ.get("LOG_LEVEL", "warning"), help="Log level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr)
+    try:
+        StdioServer(args.session_id).serve(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session_store.close()
+        snapshot_analytics()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Low-overhead request metrics in the Prometheus text format
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, List, Sequence, Tuple
+
+# Latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# ASGI scope key the /mcp handler sets to the command it dispatched
+COMMAND_SCOPE_KEY = "mcp.command"
+
+# Starlette appends the charset to text responses
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions"""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # One count per bucket plus the +Inf bucket, stored non-cumulatively
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """Request latencies per dispatched command, response codes and test completions"""
+
+    def __init__(self, personality_types: Sequence[str]):
+        self.personality_types = list(personality_types)
+        self.latency: Dict[str, Histogram] = {}
+        self.responses: Dict[Tuple[str, int], int] = {}
+        self.completions = [0] * len(self.personality_types)
+
+    def observe_request(self, command: str, status: int, duration: float):
+        """Record a finished request"""
+        histogram = self.latency.get(command)
+        if histogram is None:
+            histogram = self.latency[command] = Histogram()
+        histogram.observe(duration)
+        key = (command, status)
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+    def record_completion(self, type_code: int):
+        """Count a completed test by its resulting type"""
+        self.completions[type_code] += 1
+
+    def render(self, gauges: Dict[str, Tuple[str, float]]) -> str:
+        """Prometheus text exposition, with extra gauges given as name -> (help, value)"""
+        lines: List[str] = [
+            "# HELP mcp_request_duration_seconds Request latency by dispatched command",
+            "# TYPE mcp_request_duration_seconds histogram"
+        ]
+        for command, histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f'mcp_request_duration_seconds_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+            lines.append(f'mcp_request_duration_seconds_sum{{command="{command}"}} {histogram.sum}')
+            lines.append(f'mcp_request_duration_seconds_count{{command="{command}"}} {cumulative}')
+
+        lines.append("# HELP mcp_requests_total Requests by dispatched command and response status")
+        lines.append("# TYPE mcp_requests_total counter")
+        for (command, status), count in sorted(self.responses.items()):
+            lines.append(f'mcp_requests_total{{command="{command}",code="{status}"}} {count}')
+
+        lines.append("# HELP mcp_completions_total Completed tests by personality type")
+        lines.append("# TYPE mcp_completions_total counter")
+        for personality_type, count in zip(self.personality_types, self.completions):
+            lines.append(f'mcp_completions_total{{type="{personality_type}"}} {count}')
+
+        for name, (help_text, value) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request
+
+    Requests are labelled with the command the /mcp handler stored in the
+    scope, or "other" for the remaining endpoints.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.observe_request(scope.get(COMMAND_SCOPE_KEY, "other"), status, perf_counter() - started)
@@ -0,0 +1,268 @@
+"""
+Versioned question banks, compiled to a compact binary form cached on disk
+
+Banks are JSON files named ``<instrument>.<locale>.v<version>.json`` in the
+bank directory. On first use each bank is compiled into a binary file
+(header, fixed-size item and description tables, and a pool of interned
+UTF-8 strings), so workers load it with one read and no JSON parsing; a
+read-only install without a compiled file compiles it in memory instead,
+and a file left by a release with another format is compiled again. Each
+worker decodes the bank once into its own scoring tables and responses.
+Banks are identified by a stable 32-bit code derived from their
+instrument, locale and version, which is what sessions store to stay
+pinned to the bank they started on.
+"""
+
+import argparse
+import json
+import os
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+
+BANK_DIR = os.environ.get("QUESTION_BANK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "banks"))
+COMPILED_DIR = os.environ.get("QUESTION_BANK_CACHE", os.path.join(BANK_DIR, "compiled"))
+DEFAULT_INSTRUMENT = os.environ.get("QUESTION_BANK", "personality")
+DEFAULT_LOCALE = os.environ.get("QUESTION_BANK_LOCALE", "en")
+
+# Compiled file layout (little-endian):
+#   header: magic, format version, bank version, item count, description count,
+#           string refs to instrument, locale and title
+#   items: string refs to id and text, dimension index, signed weight
+#   descriptions: type code, string ref to text
+#   string pool: UTF-8, each distinct string stored once
+# A string ref is a (pool offset, byte length) pair.
+_MAGIC = b"PTQB"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHIHH" + "IH" * 3)
+_ITEM = struct.Struct("<IHIHBb")
+_DESCRIPTION = struct.Struct("<BIH")
+
+# Session selectors accepted when choosing a bank
+BANK_SELECTORS = ("instrument", "locale", "version")
+
+
+def bank_key(instrument: str, locale: str, version: int) -> str:
+    """Canonical name of a bank version"""
+    return f"{instrument}/{locale}/v{version}"
+
+
+def bank_code(instrument: str, locale: str, version: int) -> int:
+    """Stable 32-bit code of a bank version, the same in every process"""
+    return zlib.crc32(bank_key(instrument, locale, version).encode("utf-8"))
+
+
+def compile_bank(source: Dict[str, Any]) -> bytes:
+    """Compile a bank definition into its binary form"""
+    pool = bytearray()
+    interned: Dict[str, Tuple[int, int]] = {}
+
+    def ref(text: str) -> Tuple[int, int]:
+        if text not in interned:
+            data = text.encode("utf-8")
+            interned[text] = (len(pool), len(data))
+            pool.extend(data)
+        return interned[text]
+
+    items = []
+    for question in source["questions"]:
+        if question["dimension"] not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {question['dimension']!r} for question {question['id']!r}")
+        weight = int(question.get("weight", 1))
+        if question.get("reverse"):
+            weight = -weight
+        items.append(_ITEM.pack(*ref(question["id"]), *ref(question["question"]),
+                                DIMENSIONS.index(question["dimension"]), weight))
+
+    descriptions = [
+        _DESCRIPTION.pack(PERSONALITY_TYPES.index(personality_type), *ref(text))
+        for personality_type, text in source.get("descriptions", {}).items()
+    ]
+
+    header = _HEADER.pack(
+        _MAGIC, _FORMAT_VERSION, int(source["version"]), len(items), len(descriptions),
+        *ref(source["instrument"]), *ref(source["locale"]), *ref(source.get("title", source["instrument"]))
+    )
+    return header + b"".join(items) + b"".join(descriptions) + bytes(pool)
+
+
+class QuestionBank:
+    """A compiled question bank, read from its compiled file or from bytes compiled in memory
+
+    ``path`` is where the compiled file is (or would be) and ``source`` the
+    newest file the bank's contents depend on.
+    """
+
+    def __init__(self, path: str, data: Optional[bytes] = None, source: Optional[str] = None):
+        self.path = path
+        self.source = source or path
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        self._data = data
+        if len(data) < _HEADER.size:
+            raise ValueError(f"{path} is not a compiled question bank of format {_FORMAT_VERSION}")
+        fields = _HEADER.unpack_from(data)
+        magic, format_version, self.version, self._num_items, self._num_descriptions = fields[:5]
+        if magic != _MAGIC or format_version != _FORMAT_VERSION:
+            raise ValueError(f"{path} is not a compiled question bank of format {_FORMAT_VERSION}")
+        self._items_offset = _HEADER.size
+        self._descriptions_offset = self._items_offset + self._num_items * _ITEM.size
+        self._pool_offset = self._descriptions_offset + self._num_descriptions * _DESCRIPTION.size
+
+        self.instrument = self._string(*fields[5:7])
+        self.locale = self._string(*fields[7:9])
+        self.title = self._string(*fields[9:11])
+        self.key = bank_key(self.instrument, self.locale, self.version)
+        self.code = bank_code(self.instrument, self.locale, self.version)
+
+    def __len__(self) -> int:
+        return self._num_items
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._pool_offset + offset
+        return self._data[start:start + length].decode("utf-8")
+
+    def item(self, index: int) -> Dict[str, Any]:
+        """One question as a dict, in the same shape as the source file (with signed weights)"""
+        id_offset, id_length, text_offset, text_length, dim, weight = _ITEM.unpack_from(
+            self._data, self._items_offset + index * _ITEM.size
+        )
+        return {
+            "id": self._string(id_offset, id_length),
+            "question": self._string(text_offset, text_length),
+            "dimension": DIMENSIONS[dim],
+            "weight": weight
+        }
+
+    @property
+    def questions(self) -> List[Dict[str, Any]]:
+        """All questions in bank order"""
+        return [self.item(i) for i in range(self._num_items)]
+
+    @property
+    def descriptions(self) -> Dict[str, str]:
+        """Personality type -> description"""
+        descriptions = {}
+        for i in range(self._num_descriptions):
+            code, offset, length = _DESCRIPTION.unpack_from(self._data, self._descriptions_offset + i * _DESCRIPTION.size)
+            descriptions[PERSONALITY_TYPES[code]] = self._string(offset, length)
+        return descriptions
+
+
+class BankRegistry:
+    """Available question banks, each compiled and loaded on first use"""
+
+    def __init__(self, bank_dir: str = BANK_DIR, compiled_dir: str = COMPILED_DIR):
+        self.bank_dir = bank_dir
+        self.compiled_dir = compiled_dir
+        # (instrument, locale, version) -> source file, found by file name only
+        self.sources: Dict[Tuple[str, str, int], str] = {}
+        self._codes: Dict[int, Tuple[str, str, int]] = {}
+        self._loaded: Dict[int, QuestionBank] = {}
+
+        for name in sorted(os.listdir(bank_dir)) if os.path.isdir(bank_dir) else []:
+            parts = name.split(".")
+            if len(parts) != 4 or parts[3] != "json" or not parts[2].startswith("v") or not parts[2][1:].isdigit():
+                continue
+            selector = (parts[0], parts[1], int(parts[2][1:]))
+            self.sources[selector] = os.path.join(bank_dir, name)
+            self._codes[bank_code(*selector)] = selector
+
+    def get(self, instrument: Optional[str] = None, locale: Optional[str] = None,
+            version: Optional[int] = None) -> QuestionBank:
+        """A bank by instrument and locale (defaults from the environment), latest version unless given
+
+        Raises ValueError for malformed selectors and unknown banks.
+        """
+        for name, selector in (("instrument", instrument), ("locale", locale)):
+            if selector is not None and not isinstance(selector, str):
+                raise ValueError(f"Question bank {name} must be a string")
+        if version is not None:
+            try:
+                if isinstance(version, bool):
+                    raise TypeError
+                version = int(version)
+            except (TypeError, ValueError):
+                raise ValueError("Question bank version must be an integer") from None
+        instrument = instrument or DEFAULT_INSTRUMENT
+        locale = locale or DEFAULT_LOCALE
+        versions = [v for (i, l, v) in self.sources if i == instrument and l == locale]
+        if version is not None:
+            versions = [v for v in versions if v == version]
+        if not versions:
+            wanted = bank_key(instrument, locale, version) if version is not None else f"{instrument}/{locale}"
+            raise ValueError(f"Unknown question bank: {wanted}")
+        return self.by_code(bank_code(instrument, locale, max(versions)))
+
+    def by_code(self, code: int) -> QuestionBank:
+        """A bank by its code, as stored in sessions"""
+        bank = self._loaded.get(code)
+        if bank is None:
+            selector = self._codes.get(code)
+            if selector is None:
+                raise ValueError(f"Unknown question bank code: {code}")
+            try:
+                try:
+                    bank = QuestionBank(self.compile(*selector))
+                except ValueError:
+                    # Compiled by a release with another format (or cut short); compile it again
+                    bank = QuestionBank(self.compile(*selector, force=True))
+            except OSError:
+                # Read-only install without an up-to-date compiled file
+                bank = QuestionBank(self.compiled_path(*selector), compile_bank(self._definition(*selector)),
+                                    source=self.sources[selector])
+            self._loaded[code] = bank
+        return bank
+
+    def _definition(self, instrument: str, locale: str, version: int) -> Dict[str, Any]:
+        """Source definition of a bank, checked against its file name"""
+        source = self.sources[(instrument, locale, version)]
+        with open(source, encoding="utf-8") as f:
+            definition = json.load(f)
+        if (definition["instrument"], definition["locale"], int(definition["version"])) != (instrument, locale, version):
+            raise ValueError(f"{source} does not match its file name")
+        return definition
+
+    def compiled_path(self, instrument: str, locale: str, version: int) -> str:
+        """Where the compiled file of a bank goes"""
+        return os.path.join(self.compiled_dir, f"{instrument}.{locale}.v{version}.bank")
+
+    def compile(self, instrument: str, locale: str, version: int, force: bool = False) -> str:
+        """Compile a bank unless an up-to-date compiled file exists (or force is set), returning its path"""
+        source = self.sources[(instrument, locale, version)]
+        target = self.compiled_path(instrument, locale, version)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+            return target
+
+        definition = self._definition(instrument, locale, version)
+        # Written under a temporary name and renamed, so concurrent workers never read a partial file
+        os.makedirs(self.compiled_dir, exist_ok=True)
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(compile_bank(definition))
+        os.replace(temporary, target)
+        return target
+
+
+# Banks shipped with the server
+registry = BankRegistry()
+
+# The default bank, for callers that only use one
+default_bank = registry.get()
+personality_questions = default_bank.questions
+personality_descriptions = default_bank.descriptions
+
+
+def main():
+    """Compile every bank ahead of time"""
+    parser = argparse.ArgumentParser(description="Compile question banks to their binary form")
+    parser.parse_args()
+    for selector in sorted(registry.sources):
+        print(f"{bank_key(*selector)} -> {registry.compile(*selector)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Compiled questionnaire for fast personality scoring
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# NumPy takes longer to import than the rest of the server put together, and
+# only batch scoring needs it, so it is imported on first use
+if TYPE_CHECKING:
+    import numpy as np
+
+# Scoring dimensions and the letter chosen for a non-negative / negative score
+DIMENSIONS = ("EI", "SN", "TF", "JP")
+
+# All 16 type codes, indexed by a 4-bit code where bit k is set when
+# dimension k scored negative (i.e. took its second letter)
+PERSONALITY_TYPES = [
+    "".join(dim[(code >> k) & 1] for k, dim in enumerate(DIMENSIONS))
+    for code in range(1 << len(DIMENSIONS))
+]
+
+# Answers are stored on a 1-5 scale, 0 means "not answered"
+NEUTRAL_ANSWER = 3
+
+
+class CompiledQuestionnaire:
+    """Question bank compiled once into lookup tables and a scoring matrix"""
+
+    def __init__(self, questions: Sequence[Dict[str, Any]]):
+        self.questions = list(questions)
+        self.ids = [q["id"] for q in self.questions]
+        self.index = {question_id: i for i, question_id in enumerate(self.ids)}
+
+        # Per-item dimension index and signed weight, for scoring one session item by item.
+        # Reverse-keyed items get a negative weight so agreeing with them pushes
+        # towards the second letter.
+        self.item_dims: List[int] = []
+        self.item_weights: List[int] = []
+        for question in self.questions:
+            if question["dimension"] not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {question['dimension']!r} for question {question['id']!r}")
+            weight = int(question.get("weight", 1))
+            if question.get("reverse"):
+                weight = -weight
+            self.item_dims.append(DIMENSIONS.index(question["dimension"]))
+            self.item_weights.append(weight)
+        self._weights: Optional["np.ndarray"] = None
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    @property
+    def weights(self) -> "np.ndarray":
+        """Scoring matrix with one row per item and one column per dimension, built on first use"""
+        if self._weights is None:
+            import numpy as np
+            weights = np.zeros((len(self.questions), len(DIMENSIONS)), dtype=np.int32)
+            weights[np.arange(len(self.questions)), self.item_dims] = self.item_weights
+            self._weights = weights
+        return self._weights
+
+    def answer_vector(self, answers: Dict[str, int]) -> "np.ndarray":
+        """Convert an id->answer mapping into a dense answer vector"""
+        import numpy as np
+        vector = np.zeros(len(self.questions), dtype=np.int8)
+        for question_id, answer in answers.items():
+            i = self.index.get(question_id)
+            if i is not None:
+                vector[i] = answer
+        return vector
+
+    def answer_row(self, sheet: Union[Sequence[int], Dict[str, int]]) -> List[int]:
+        """Convert one answer sheet (a list in question order or an id->answer mapping) into a list of answers
+
+        Answers must be integers between 0 and 5; floats and booleans are
+        rejected rather than truncated to an answer.
+        """
+        if isinstance(sheet, dict):
+            row = [0] * len(self.questions)
+            for question_id, answer in sheet.items():
+                i = self.index.get(question_id)
+                if i is not None:
+                    row[i] = answer
+            answers = sheet.values()
+        elif isinstance(sheet, (list, tuple)):
+            if len(sheet) != len(self.questions):
+                raise ValueError(f"Each answer sheet must have exactly {len(self.questions)} answers")
+            row = answers = list(sheet)
+        else:
+            raise ValueError("Each answer sheet must be a list of answers or a question id map")
+        for answer in answers:
+            # type() rather than isinstance(), as bool is a subclass of int
+            if type(answer) is not int or not 0 <= answer <= 5:
+                raise ValueError("Answers must be integers between 1 and 5, or 0 for unanswered questions")
+        return row
+
+    def answer_matrix(self, sheets: Sequence[Union[Sequence[int], Dict[str, int]]]) -> "np.ndarray":
+        """Convert answer sheets (lists in question order or id->answer mappings) into a matrix"""
+        import numpy as np
+        if not isinstance(sheets, (list, tuple)):
+            raise ValueError("Answer sheets must be a list")
+        matrix = np.array([self.answer_row(sheet) for sheet in sheets], dtype=np.int8)
+        return matrix.reshape(len(sheets), len(self.questions))
+
+    def validate_matrix(self, matrix: "np.ndarray"):
+        """Check an answer matrix has one column per question and answers in 0-5"""
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.questions):
+            raise ValueError(f"Each answer sheet must have exactly {len(self.questions)} answers")
+        if matrix.size and (matrix.min() < 0 or matrix.max() > 5):
+            raise ValueError("Answers must be between 1 and 5, or 0 for unanswered questions")
+
+    def score_vector(self, vector: "np.ndarray") -> "np.ndarray":
+        """Score a single answer vector, returning one score per dimension"""
+        return self.score_matrix(vector.reshape(1, -1))[0]
+
+    def score_matrix(self, matrix: "np.ndarray") -> "np.ndarray":
+        """Score a (sheets x items) answer matrix with a single matrix product"""
+        import numpy as np
+        # Convert the 1-5 scale to -2..+2, leaving unanswered items at 0
+        matrix = matrix.astype(np.int32, copy=False)
+        centered = np.where(matrix > 0, matrix - NEUTRAL_ANSWER, 0)
+        return centered @ self.weights
+
+    def score(self, answers: Dict[str, int]) -> Dict[str, int]:
+        """Score an id->answer mapping, returning scores keyed by dimension"""
+        scores = self.score_vector(self.answer_vector(answers))
+        return {dim: int(score) for dim, score in zip(DIMENSIONS, scores)}
+
+    def dimension_bounds(self, answers: Sequence[int]) -> Tuple[List[int], List[int]]:
+        """Per-dimension scores of the answered items, and how far the unanswered items could still move them"""
+        scores = [0] * len(DIMENSIONS)
+        remaining = [0] * len(DIMENSIONS)
+        for dim, weight, answer in zip(self.item_dims, self.item_weights, answers):
+            if answer:
+                scores[dim] += weight * (answer - NEUTRAL_ANSWER)
+            else:
+                remaining[dim] += abs(weight) * (5 - NEUTRAL_ANSWER)
+        return scores, remaining
+
+    def running_scores(self, session) -> List[int]:
+        """A session's per-dimension scores, rebuilt from its answers only if they aren't tracked yet"""
+        if session.scores is None:
+            session.scores = self.dimension_bounds(session.answers)[0]
+            session.answered = len(session.answers) - session.answers.count(0)
+        return session.scores
+
+    def record_answer(self, session, index: int, answer: int):
+        """Store an answer in a session, adjusting its running scores and answered count by the change"""
+        scores = self.running_scores(session)
+        previous = session.answers[index]
+        delta = (answer - NEUTRAL_ANSWER if answer else 0) - (previous - NEUTRAL_ANSWER if previous else 0)
+        scores[self.item_dims[index]] += self.item_weights[index] * delta
+        session.answered += (answer != 0) - (previous != 0)
+        session.answers[index] = answer
+
+    @staticmethod
+    def scores_type_code(scores: Sequence[int]) -> int:
+        """4-bit type code of one set of per-dimension scores"""
+        return sum(1 << k for k, score in enumerate(scores) if score < 0)
+
+    def locked_dimensions(self, answers: Sequence[int], margin: int = 0) -> List[bool]:
+        """Whether each dimension's letter is decided, whatever the unanswered items are answered
+
+        With a margin > 0, a dimension also counts as decided when the
+        unanswered items could only flip it by at most that many points.
+        """
+        scores, remaining = self.dimension_bounds(answers)
+        return [
+            score >= left - margin if score >= 0 else -score > left - margin
+            for score, left in zip(scores, remaining)
+        ]
+
+    def next_item(self, answers: Sequence[int], start: int, margin: int = 0) -> int:
+        """Index of the next item to ask at or after start, or -1 if none is left
+
+        Unanswered items of decided dimensions are skipped; answered ones are
+        still revisited, as when stepping forward again after going back.
+        """
+        locked = self.locked_dimensions(answers, margin)
+        for i in range(start, len(self.questions)):
+            if answers[i] or not locked[self.item_dims[i]]:
+                return i
+        return -1
+
+    def first_open_item(self, answers: Sequence[int], margin: int = 0) -> int:
+        """Index of the first unanswered item whose dimension is not decided yet, or -1"""
+        locked = self.locked_dimensions(answers, margin)
+        for i, answer in enumerate(answers):
+            if not answer and not locked[self.item_dims[i]]:
+                return i
+        return -1
+
+    def score_batch(self, matrix: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """Score an answer matrix, returning (type codes, per-dimension scores)"""
+        scores = self.score_matrix(matrix)
+        return self.type_codes(scores), scores
+
+    def type_code(self, vector: "np.ndarray") -> int:
+        """Score a single answer vector and return its 4-bit type code"""
+        return int(self.type_codes(self.score_matrix(vector.reshape(1, -1)))[0])
+
+    @staticmethod
+    def type_codes(scores: "np.ndarray") -> "np.ndarray":
+        """Map a (sheets x dimensions) score matrix to 4-bit type codes"""
+        import numpy as np
+        bits = (scores < 0).astype(np.uint8)
+        return (bits << np.arange(len(DIMENSIONS), dtype=np.uint8)).sum(axis=1, dtype=np.uint8)
+
+    @staticmethod
+    def personality_type(scores: Dict[str, int]) -> str:
+        """Determine the four-letter type from per-dimension scores"""
+        return "".join(dim[0] if scores[dim] >= 0 else dim[1] for dim in DIMENSIONS)
+
+    def personality_types(self, scores: "np.ndarray") -> List[str]:
+        """Determine four-letter types for a (sheets x dimensions) score matrix"""
+        return [PERSONALITY_TYPES[code] for code in self.type_codes(scores)]
@@ -0,0 +1,53 @@
+"""
+Bounded cache of recent responses, for replaying retried requests
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class ReplayCache:
+    """Last few response bodies of each session, keyed by the client's request id
+
+    A retried request carrying a request id that was already handled gets
+    the stored response instead of being applied a second time. Each session
+    keeps at most ``per_session`` responses and at most ``max_sessions``
+    sessions are tracked, least recently used first out.
+    """
+
+    def __init__(self, max_sessions: int = 4096, per_session: int = 4):
+        self.max_sessions = max_sessions
+        self.per_session = per_session
+        self.replays = 0
+        self._sessions: "OrderedDict[Hashable, List[Tuple[str, bytes]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: Hashable, request_id: Any) -> Optional[bytes]:
+        """Response body stored for a request id of a session, if any"""
+        entries = self._sessions.get(session_id)
+        if entries:
+            request_id = str(request_id)
+            for key, body in entries:
+                if key == request_id:
+                    self.replays += 1
+                    return body
+        return None
+
+    def put(self, session_id: Hashable, request_id: Any, body: bytes):
+        """Remember the response to a request id, dropping the session's oldest one if full"""
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+            entries = self._sessions[session_id] = []
+        else:
+            self._sessions.move_to_end(session_id)
+        if len(entries) >= self.per_session:
+            del entries[0]
+        entries.append((str(request_id), body))
+
+    def clear(self, session_id: Hashable):
+        """Forget a session's responses, e.g. when its test restarts and request ids may repeat"""
+        self._sessions.pop(session_id, None)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Offline re-scoring of exported answer sheets
+
+Streams a JSONL or CSV file of answer sheets in fixed-size chunks, scores
+the chunks in parallel on a process pool with the same scoring code as the
+server, and writes the results in input order. Memory stays bounded by the
+chunk size and the number of chunks in flight, whatever the input size.
+
+JSONL lines are objects whose "answers" field is either a list of answers in
+question order or a question id -> answer mapping. CSV files have one column
+per question id. In both, "id" and "session_id" fields are copied to the
+output. Answers are 1-5, with 0 or empty for unanswered questions.
+
+Progress lines on stderr include a resume point: the input byte offset up to
+which results have been written, and the length of the output at that point,
+reported only once that output has been flushed. Re-run with --start-offset
+and --output-offset to continue from there; the output is cut back to the
+given length first, so results written after the last report are neither
+duplicated nor lost.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from question_bank import personality_questions
+from questionnaire import CompiledQuestionnaire, DIMENSIONS, PERSONALITY_TYPES
+
+# Fields copied from each input record to its result
+PASSTHROUGH_FIELDS = ("id", "session_id")
+
+# Compiled once per worker process
+_questionnaire: Optional[CompiledQuestionnaire] = None
+
+
+def _init_worker():
+    """Compile the question bank in each worker process"""
+    global _questionnaire
+    _questionnaire = CompiledQuestionnaire(personality_questions)
+
+
+def parse_record(line: bytes, input_format: str, header: Optional[List[str]]) -> Dict[str, Any]:
+    """Parse one input line into a record with an "answers" field"""
+    if input_format == "jsonl":
+        return json.loads(line)
+
+    row = next(csv.reader([line.decode("utf-8")]))
+    record: Dict[str, Any] = {}
+    answers = {}
+    for column, cell in zip(header, row):
+        if column in PASSTHROUGH_FIELDS:
+            record[column] = cell
+        elif cell.strip():
+            answers[column] = int(cell)
+    record["answers"] = answers
+    return record
+
+
+def score_chunk(lines: List[bytes], input_format: str, header: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Score a chunk of input lines, returning one result per non-blank line"""
+    questionnaire = _questionnaire
+    results: List[Dict[str, Any]] = []
+    # Answer rows of parseable records, and the results they belong to
+    matrix = np.zeros((len(lines), len(questionnaire)), dtype=np.int8)
+    parsed: List[Dict[str, Any]] = []
+
+    for line in lines:
+        if not line.strip():
+            continue
+        result: Dict[str, Any] = {}
+        results.append(result)
+        try:
+            record = parse_record(line, input_format, header)
+            for field in PASSTHROUGH_FIELDS:
+                if field in record:
+                    result[field] = record[field]
+            # Floats, booleans and out-of-range answers make the record invalid rather than being truncated
+            matrix[len(parsed)] = questionnaire.answer_row(record["answers"])
+        except (ValueError, TypeError, KeyError, OverflowError) as e:
+            result["error"] = str(e)
+        else:
+            parsed.append(result)
+
+    # Score every valid sheet of the chunk at once
+    codes, scores = questionnaire.score_batch(matrix[:len(parsed)])
+    for result, code, row_scores in zip(parsed, codes.tolist(), scores.tolist()):
+        result["personality_type"] = PERSONALITY_TYPES[code]
+        result["scores"] = dict(zip(DIMENSIONS, row_scores))
+    return results
+
+
+def format_results(results: List[Dict[str, Any]], output_format: str) -> str:
+    """Serialize results as JSONL or CSV rows"""
+    if output_format == "jsonl":
+        return "".join(json.dumps(result) + "\n" for result in results)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for result in results:
+        scores = result.get("scores", {})
+        writer.writerow(
+            [result.get(field, "") for field in PASSTHROUGH_FIELDS]
+            + [result.get("personality_type", "")]
+            + [scores.get(dim, "") for dim in DIMENSIONS]
+            + [result.get("error", "")]
+        )
+    return buffer.getvalue()
+
+
+def read_chunks(infile, chunk_size: int):
+    """Yield (lines, end offset) chunks of up to chunk_size lines"""
+    offset = infile.tell()
+    lines = []
+    for line in infile:
+        lines.append(line)
+        offset += len(line)
+        if len(lines) >= chunk_size:
+            yield lines, offset
+            lines = []
+    if lines:
+        yield lines, offset
+
+
+def main():
+    """Re-score an answer sheet export"""
+    parser = argparse.ArgumentParser(description="Re-score exported personality test answer sheets")
+    parser.add_argument("input", help="JSONL or CSV file of answer sheets")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"], help="Input format (default: from file extension)")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], default="jsonl", help="Output format")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Answer sheets per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    parser.add_argument("--start-offset", type=int, default=0, help="Input byte offset to resume from")
+    parser.add_argument("--output-offset", type=int,
+                        help="Output length to cut the output file back to when resuming, as reported with the offset")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    input_format = args.input_format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    if args.output_offset is not None and not (args.output and args.start_offset):
+        parser.error("--output-offset needs --output and --start-offset")
+    # Resuming appends to the previous output, from the reported resume point
+    outfile = open(args.output, "a" if args.start_offset else "w", newline="") if args.output else sys.stdout
+    if args.output_offset is not None:
+        outfile.truncate(args.output_offset)
+
+    with open(args.input, "rb") as infile:
+        header = None
+        if input_format == "csv":
+            header = next(csv.reader([infile.readline().decode("utf-8")]))
+            if args.start_offset == 0 and args.output_format == "csv":
+                outfile.write(",".join(PASSTHROUGH_FIELDS + ("personality_type",) + DIMENSIONS + ("error",)) + "\n")
+        if args.start_offset:
+            infile.seek(args.start_offset)
+
+        start = time.monotonic()
+        last_report = start
+        records = 0
+        # Bound the chunks in flight so memory doesn't grow with the input
+        pending = deque()
+        max_pending = args.workers * 2
+
+        def resume_point(end_offset: int) -> str:
+            """Flush the output and describe where a resumed run would continue"""
+            outfile.flush()
+            if outfile is sys.stdout:
+                return f"resume offset {end_offset}"
+            return f"resume with --start-offset {end_offset} --output-offset {outfile.tell()}"
+
+        def write_next():
+            nonlocal records, last_report
+            future, end_offset = pending.popleft()
+            results = future.result()
+            outfile.write(format_results(results, args.output_format))
+            records += len(results)
+            now = time.monotonic()
+            if now - last_report >= args.progress_interval:
+                last_report = now
+                print(f"{records} records, {records / (now - start):.0f} records/s, {resume_point(end_offset)}",
+                      file=sys.stderr)
+            return end_offset
+
+        end_offset = args.start_offset
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+            for lines, chunk_end in read_chunks(infile, args.chunk_size):
+                pending.append((pool.submit(score_chunk, lines, input_format, header), chunk_end))
+                if len(pending) >= max_pending:
+                    end_offset = write_next()
+            while pending:
+                end_offset = write_next()
+        done = resume_point(end_offset)
+
+    if outfile is not sys.stdout:
+        outfile.close()
+    elapsed = time.monotonic() - start
+    print(f"Done: {records} records in {elapsed:.1f}s ({records / max(elapsed, 1e-9):.0f} records/s), {done}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Pre-rendered MCP responses for the personality test
+"""
+
+import json
+import marshal
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+# Bumped whenever the snapshot layout changes
+_SNAPSHOT_FORMAT = 2
+
+
+def _dumps(value: Any) -> str:
+    # Same encoding FastAPI's JSONResponse uses
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _saved_note(saved: int) -> str:
+    # Sentence telling how many questions adaptive testing skipped, if any
+    if not saved:
+        return ""
+    return f" {saved} question{'s' if saved > 1 else ''} could no longer change your result and {'were' if saved > 1 else 'was'} skipped."
+
+
+def _completed_context(saved: int) -> Dict[str, Any]:
+    return {"completed": True, "questions_saved": saved} if saved else {"completed": True}
+
+
+def _completed_response(saved: int) -> "PreparedResponse":
+    return PreparedResponse(
+        f"Thank you for completing the test!{_saved_note(saved)} Type 'results' to see your personality type.",
+        _completed_context(saved)
+    )
+
+
+def _completed_results_response(saved: int, result: "PreparedResponse") -> "PreparedResponse":
+    personality_type, description = result.context["personality_type"], result.context["description"]
+    return PreparedResponse(
+        f"Thank you for completing the test!{_saved_note(saved)} Your personality type is: "
+        f"{personality_type}\n\n{description}",
+        {**_completed_context(saved), "personality_type": personality_type, "description": description}
+    )
+
+
+class PreparedResponse:
+    """MCP response serialized once, with only the session id spliced in per request"""
+
+    __slots__ = ("response", "context", "_head", "_tail")
+
+    def __init__(self, response: str, context: Optional[Dict[str, Any]] = None):
+        self.response = response
+        self.context = context or {}
+
+        # The session id is always the first context field, so the body splits
+        # into a fixed head and tail around it
+        self._head = f'{{"response":{_dumps(response)},"context":{{"session_id":'.encode("utf-8")
+        rest = _dumps(self.context)[1:] if self.context else "}"
+        self._tail = (("," + rest) if self.context else rest).encode("utf-8") + b"}"
+
+    def render(self, session_id: Any) -> bytes:
+        """Serialized JSON body for the given session"""
+        return self._head + _dumps(session_id).encode("utf-8") + self._tail
+
+    def to_dict(self, session_id: Any) -> Dict[str, Any]:
+        """Response as a plain dict for the given session"""
+        return {"response": self.response, "context": {"session_id": session_id, **self.context}}
+
+    def to_tuple(self) -> tuple:
+        """Plain values to rebuild the response from, without serializing it again"""
+        return self.response, self.context, self._head, self._tail
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> "PreparedResponse":
+        """Response rebuilt from to_tuple()"""
+        prepared = cls.__new__(cls)
+        prepared.response, prepared.context, prepared._head, prepared._tail = values
+        return prepared
+
+
+class ResponseCache:
+    """Every distinct response of a question bank, rendered at startup"""
+
+    def __init__(self, questions: Sequence[Dict[str, Any]], descriptions: Dict[str, str], personality_types: List[str]):
+        total = len(questions)
+
+        self.welcome = PreparedResponse("Welcome to the Personality Test. Type 'start test' to begin.")
+        self.invalid_answer = PreparedResponse(
+            "Please provide an answer between 1 (Strongly Disagree) and 5 (Strongly Agree)."
+        )
+        self.unparseable_answer = PreparedResponse(
+            "I couldn't understand your answer. Please respond with 'answer: X' where X is a number from 1-5."
+        )
+        self.test_complete = PreparedResponse(
+            "Your personality test is complete. Ask for 'results' to see your personality type."
+        )
+        self.not_completed = PreparedResponse("You haven't completed the test yet.")
+        self.invalid_answers = PreparedResponse(
+            "Please provide your answers as numbers from 1-5, either as 'answers: 4,5,3' for the questions "
+            "starting at the current one, or as a mapping from question id to answer."
+        )
+        # For a test without skipped questions; see completion() for the others
+        self.completed = _completed_response(0)
+
+        self.start = PreparedResponse(
+            f"Let's start your personality test. For each statement, respond with a number from 1-5:\n"
+            f"1 = Strongly Disagree\n2 = Disagree\n3 = Neutral\n4 = Agree\n5 = Strongly Agree\n\n"
+            f"Question 1: {questions[0]['question']}\n\n"
+            f"Respond with 'answer: X' where X is your rating.",
+            {"current_question": 1, "total_questions": total}
+        )
+
+        # Indexed by question number (1-based); index 0 is unused
+        self.question: List[Optional[PreparedResponse]] = [None]
+        self.current: List[Optional[PreparedResponse]] = [None]
+        # Indexed by question number, then by previous answer (0 = none)
+        self.back: List[Optional[List[PreparedResponse]]] = [None]
+        for number, question in enumerate(questions, start=1):
+            progress = {
+                "current_question": number,
+                "total_questions": total,
+                "progress": f"{number}/{total}"
+            }
+            self.question.append(PreparedResponse(
+                f"Question {number}/{total}: {question['question']}\n\n"
+                f"(1=Strongly Disagree, 5=Strongly Agree)\n\n"
+                f"Type 'back' to go back to the previous question.",
+                progress
+            ))
+            self.current.append(PreparedResponse(
+                f"Please answer the current question: {question['question']} (1-5, where 1=Strongly Disagree, 5=Strongly Agree)\n\n"
+                f"Type 'back' to go back to the previous question.",
+                {"current_question": number}
+            ))
+            self.back.append([
+                PreparedResponse(
+                    f"Going back to Question {number}/{total}: {question['question']}\n\n"
+                    f"(1=Strongly Disagree, 5=Strongly Agree){f' (Your previous answer: {answer})' if answer else ''}\n\n"
+                    f"Type 'answer: X' to provide a new answer.",
+                    progress
+                )
+                for answer in range(6)
+            ])
+
+        # Indexed by the question number the session is on (0 or 1)
+        self.already_first = [
+            PreparedResponse("You're already at the first question.", {"current_question": number})
+            for number in range(2)
+        ]
+
+        # Indexed by type code
+        self.results = []
+        for personality_type in personality_types:
+            description = descriptions.get(personality_type, "No description available.")
+            self.results.append(PreparedResponse(
+                f"Your personality type is: {personality_type}\n\n{description}",
+                {"personality_type": personality_type, "description": description}
+            ))
+
+        # Completion combined with the results, for answer sets that finish the test
+        # without skipped questions; indexed by type code
+        self.completed_results = [_completed_results_response(0, result) for result in self.results]
+
+    # Adaptive testing can end a test with any number of questions skipped. Those
+    # completions are rare next to the other responses, so they are rendered when
+    # needed rather than kept for every possible count.
+
+    def completion(self, saved: int) -> PreparedResponse:
+        """Completion response, noting how many questions adaptive testing skipped"""
+        return _completed_response(saved) if saved else self.completed
+
+    def completion_with_results(self, saved: int, type_code: int) -> PreparedResponse:
+        """Completion response combined with the results, for answer sets that finish the test"""
+        return _completed_results_response(saved, self.results[type_code]) if saved else self.completed_results[type_code]
+
+
+def _to_plain(value: Any) -> Any:
+    # Responses become tuples and tables stay lists, so loading can tell them apart
+    if isinstance(value, PreparedResponse):
+        return value.to_tuple()
+    if isinstance(value, list):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+def _from_plain(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return PreparedResponse.from_tuple(value)
+    if isinstance(value, list):
+        return [_from_plain(item) for item in value]
+    return value
+
+
+def save_snapshot(cache: ResponseCache, path: str):
+    """Write a cache's tables as plain strings, bytes and dicts"""
+    tables = {name: _to_plain(table) for name, table in vars(cache).items()}
+    data = marshal.dumps({"format": _SNAPSHOT_FORMAT, "tables": tables})
+    # Written under a temporary name and renamed, so concurrent workers never read a partial file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str) -> ResponseCache:
+    """Cache read from a snapshot written by save_snapshot; raises ValueError if it isn't one"""
+    with open(path, "rb") as f:
+        snapshot = marshal.load(f)
+    if not isinstance(snapshot, dict) or snapshot.get("format") != _SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a response snapshot of format {_SNAPSHOT_FORMAT}")
+    cache = ResponseCache.__new__(ResponseCache)
+    for name, table in snapshot["tables"].items():
+        setattr(cache, name, _from_plain(table))
+    return cache
+
+
+def load_responses(snapshot: str, source: str, questions: Sequence[Dict[str, Any]], descriptions: Dict[str, str],
+                   personality_types: List[str]) -> ResponseCache:
+    """Response tables from a snapshot rendered ahead of time, rendering and saving them if it is missing or stale
+
+    A snapshot is stale once the bank file it was rendered from, or this
+    module, is newer than it. Loading one takes a fraction of the time of
+    rendering every response, which is most of a cold start.
+    """
+    newest_source = max(os.path.getmtime(source), os.path.getmtime(__file__))
+    try:
+        if os.path.getmtime(snapshot) >= newest_source:
+            return load_snapshot(snapshot)
+    except Exception:
+        # Missing, truncated, or written by another Python version: render instead
+        pass
+
+    cache = ResponseCache(questions, descriptions, personality_types)
+    try:
+        save_snapshot(cache, snapshot)
+    except OSError:
+        # A read-only install just renders the responses on every start
+        pass
+    return cache
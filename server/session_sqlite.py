@@ -0,0 +1,193 @@
+"""
+SQLite session backend shared by several worker processes on one host
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from session_store import RECORD_FORMAT, Session, SessionBackend
+
+# How often expired sessions are purged, in seconds
+_PURGE_INTERVAL = 60.0
+
+
+class SQLiteSessionStore(SessionBackend):
+    """Session backend stored in a SQLite database in WAL mode
+
+    Every worker opens its own connection to the same file. WAL mode lets
+    readers run alongside a writer, and with ``synchronous=NORMAL`` commits
+    are not fsynced individually; the WAL is synced at checkpoints instead.
+
+    With ``flush_interval`` > 0, saves are buffered in-process and written in
+    one transaction per interval (or every ``batch_size`` sessions), with
+    repeated saves of the same session coalesced into one write. Buffered
+    changes are only visible to other workers after a flush, so only enable
+    this when requests for a session stick to one worker.
+
+    Session counts are kept in a one-row table maintained by triggers, so
+    every worker reads the same totals without scanning the sessions table.
+    Like everything else, they only include buffered sessions once flushed.
+
+    The database's ``user_version`` records the session record format.
+    Sessions stored in another format are discarded when the database is
+    opened, as they can't be read back.
+    """
+
+    def __init__(self, path: str, num_questions: int, idle_ttl: float = 3600.0,
+                 flush_interval: float = 0.0, batch_size: int = 256):
+        self.path = path
+        self.num_questions = num_questions
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, bytes] = {}
+        self._last_flush = time.monotonic()
+        self._last_purge = 0.0
+
+        self._db = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " state BLOB NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._discard_other_formats()
+        self._create_counts()
+
+    def _discard_other_formats(self):
+        """Drop sessions written in another record format, e.g. by an older release"""
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != RECORD_FORMAT:
+                # Goes through the count triggers, if they exist yet, so the counts stay right
+                self._db.execute("DELETE FROM sessions")
+                self._db.execute(f"PRAGMA user_version = {RECORD_FORMAT}")
+
+    def _create_counts(self):
+        """Create the session counts table and its triggers, counting existing sessions once"""
+        # The type code is the signed byte after the question cursor, -1 while in progress
+        completed = "(substr({row}.state, 3, 1) != x'ff')"
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS session_counts ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total INTEGER NOT NULL,"
+                " completed INTEGER NOT NULL"
+                ")"
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO session_counts (id, total, completed) "
+                f"SELECT 0, COUNT(*), COALESCE(SUM({completed.format(row='sessions')}), 0) FROM sessions"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS sessions_counts_insert AFTER INSERT ON sessions BEGIN "
+                f"UPDATE session_counts SET total = total + 1, completed = completed + {completed.format(row='new')}; END"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS sessions_counts_update AFTER UPDATE OF state ON sessions BEGIN "
+                f"UPDATE session_counts SET completed = completed + {completed.format(row='new')}"
+                f" - {completed.format(row='old')}; END"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS sessions_counts_delete AFTER DELETE ON sessions BEGIN "
+                f"UPDATE session_counts SET total = total - 1, completed = completed - {completed.format(row='old')}; END"
+            )
+
+    def _counts(self) -> Tuple[int, int]:
+        """Stored and completed sessions, as of the last flush"""
+        with self._lock:
+            return self._db.execute("SELECT total, completed FROM session_counts").fetchone()
+
+    def __len__(self) -> int:
+        return self._counts()[0]
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Look up a session without creating it"""
+        with self._lock:
+            state = self._pending.get(session_id)
+            if state is None:
+                row = self._db.execute(
+                    "SELECT state FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                    (session_id, time.time() - self.idle_ttl)
+                ).fetchone()
+                if row is None:
+                    return None
+                state = row[0]
+        return Session.from_bytes(state)
+
+    def create(self, session_id: str, num_questions: Optional[int] = None, bank: int = 0) -> Session:
+        """Create (or reset) a session"""
+        self.purge_expired()
+        session = Session(num_questions or self.num_questions, bank)
+        self.save(session_id, session)
+        return session
+
+    def save(self, session_id: str, session: Session):
+        """Persist a session, buffering the write if batching is enabled"""
+        with self._lock:
+            self._pending[session_id] = session.to_bytes()
+        if (self.flush_interval <= 0
+                or len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def delete(self, session_id: str):
+        """Drop a session if it exists"""
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def flush(self):
+        """Write all buffered sessions in a single transaction"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            now = time.time()
+            rows = [(session_id, state, now) for session_id, state in self._pending.items()]
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.executemany(
+                    "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    rows
+                )
+            self._pending.clear()
+
+    def purge_expired(self):
+        """Delete sessions idle for longer than the TTL, at most once per purge interval"""
+        now = time.monotonic()
+        if now - self._last_purge < _PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.idle_ttl,))
+
+    def completed_count(self) -> int:
+        """Number of stored sessions whose test is completed"""
+        return self._counts()[1]
+
+    def bytes_per_session(self) -> int:
+        """Approximate database bytes used per stored session"""
+        with self._lock:
+            pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+            count = self._db.execute("SELECT total FROM session_counts").fetchone()[0]
+        if not count:
+            return len(Session(self.num_questions).to_bytes())
+        return pages * page_size // count
+
+    def close(self):
+        """Flush buffered sessions and close the database"""
+        self.flush()
+        with self._lock:
+            self._db.close()
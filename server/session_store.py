@@ -0,0 +1,218 @@
+"""
+Memory-bounded session storage for personality tests
+"""
+
+import struct
+import sys
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+
+# Type code stored while a test is still in progress
+NO_TYPE = -1
+
+# Approximate per-entry cost of the LRU OrderedDict (hash slot plus link node),
+# measured with tracemalloc on CPython 3.11
+_LRU_ENTRY_BYTES = 96
+
+# Length of the uuid4 session ids issued by the bundled client
+_TYPICAL_SESSION_ID_LENGTH = 36
+
+# Packed record header: question cursor, type code, question bank code, running
+# per-dimension scores, answered question count. The type code stays at byte 3,
+# where the SQLite backend's count triggers read it.
+_RECORD_HEADER = struct.Struct("<HbI" + "h" * len(DIMENSIONS) + "H")
+
+# Bumped whenever the record layout changes; backends that persist records
+# discard ones written in another format
+RECORD_FORMAT = 2
+
+
+class Session:
+    """Compact state of one test session
+
+    Answers are packed one byte per question in bank order, with 0 meaning
+    "not answered yet". Running per-dimension scores and the number of
+    answered questions are kept alongside, updated by the questionnaire on
+    every answer and packed into the record header, so a session loaded from
+    a backend never rescans its answers.
+
+    ``bank`` is the code of the question bank the test runs on, 0 for the
+    server's default bank.
+    """
+
+    __slots__ = ("current_question", "answers", "type_code", "bank", "scores", "answered", "last_access")
+
+    def __init__(self, num_questions: int, bank: int = 0):
+        self.current_question = 0
+        self.answers = bytearray(num_questions)
+        self.type_code = NO_TYPE
+        self.bank = bank
+        self.scores: Optional[List[int]] = [0] * len(DIMENSIONS)
+        self.answered = 0
+        self.last_access = time.monotonic()
+
+    @property
+    def completed(self) -> bool:
+        """Whether the test has been completed and scored"""
+        return self.type_code != NO_TYPE
+
+    @property
+    def personality_type(self) -> Optional[str]:
+        """Four-letter type of a completed test"""
+        return PERSONALITY_TYPES[self.type_code] if self.completed else None
+
+    def to_bytes(self) -> bytes:
+        """Pack the session into a compact record"""
+        return _RECORD_HEADER.pack(self.current_question, self.type_code, self.bank, *self.scores,
+                                   self.answered) + self.answers
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Session":
+        """Unpack a session record produced by to_bytes"""
+        session = cls.__new__(cls)
+        fields = _RECORD_HEADER.unpack_from(data)
+        session.current_question, session.type_code, session.bank = fields[:3]
+        session.scores = list(fields[3:-1])
+        session.answered = fields[-1]
+        session.answers = bytearray(data[_RECORD_HEADER.size:])
+        session.last_access = time.monotonic()
+        return session
+
+
+class SessionBackend:
+    """Interface for session storage backends
+
+    Handlers look sessions up with get(), create them with create() and call
+    save() after changing one, so backends that keep sessions outside the
+    process can persist the change.
+    """
+
+    # Maximum number of stored sessions, None when only bounded by the TTL
+    max_sessions: Optional[int] = None
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Look up a session without creating it"""
+        raise NotImplementedError
+
+    def create(self, session_id: str, num_questions: Optional[int] = None, bank: int = 0) -> Session:
+        """Create (or reset) a session for a question bank (by default the store's)"""
+        raise NotImplementedError
+
+    def save(self, session_id: str, session: Session):
+        """Persist changes made to a session"""
+
+    def delete(self, session_id: str):
+        """Drop a session if it exists"""
+        raise NotImplementedError
+
+    def record_completion(self, session_id: str, session: Session):
+        """Note that a stored session's test was just completed, before it is saved"""
+
+    def completed_count(self) -> int:
+        """Number of stored sessions whose test is completed, without looking at every session"""
+        raise NotImplementedError
+
+    def bytes_per_session(self) -> int:
+        """Approximate storage used per session"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write out any buffered changes"""
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+
+class SessionStore(SessionBackend):
+    """In-process LRU session store with an idle TTL and a fixed memory budget"""
+
+    def __init__(self, num_questions: int, memory_budget: int = 64 * 1024 * 1024, idle_ttl: float = 3600.0):
+        self.num_questions = num_questions
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max(1, memory_budget // self.bytes_per_session())
+        self.evictions = 0
+        # Stored sessions with a completed test, kept up to date so metrics never scan the store
+        self._completed = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Look up a session without creating it, refreshing its LRU position"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+
+        now = time.monotonic()
+        if now - session.last_access > self.idle_ttl:
+            self._drop(session_id)
+            self.evictions += 1
+            return None
+
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def create(self, session_id: str, num_questions: Optional[int] = None, bank: int = 0) -> Session:
+        """Create (or reset) a session, evicting idle and least recently used ones"""
+        self._drop(session_id)
+        self.evict_expired()
+        while len(self._sessions) >= self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+            self.evictions += 1
+
+        session = Session(num_questions or self.num_questions, bank)
+        self._sessions[session_id] = session
+        return session
+
+    def delete(self, session_id: str):
+        """Drop a session if it exists"""
+        self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None and session.type_code != NO_TYPE:
+            self._completed -= 1
+
+    def evict_expired(self):
+        """Drop sessions idle for longer than the TTL"""
+        # Entries are kept in access order, so expired ones sit at the front
+        deadline = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access > deadline:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def record_completion(self, session_id: str, session: Session):
+        """Count a session whose test was just completed, unless it has been dropped from the store"""
+        if self._sessions.get(session_id) is session:
+            self._completed += 1
+
+    def completed_count(self) -> int:
+        """Number of stored sessions whose test is completed"""
+        return self._completed
+
+    def bytes_per_session(self) -> int:
+        """Approximate memory held by one stored session, including its key and LRU entry"""
+        session = Session(self.num_questions)
+        return (
+            sys.getsizeof(session)
+            + sys.getsizeof(session.answers)
+            + sys.getsizeof(session.scores)
+            + sys.getsizeof(session.last_access)
+            + sys.getsizeof("x" * _TYPICAL_SESSION_ID_LENGTH)
+            + _LRU_ENTRY_BYTES
+        )
@@ -0,0 +1,10 @@
+"""
+Shared setup for the tests: the server and client modules are imported from server/ and client/
+"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "client"))
+sys.path.insert(0, os.path.join(ROOT, "server"))
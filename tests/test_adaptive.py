@@ -0,0 +1,86 @@
+"""
+Adaptive testing: locked dimensions and skipped questions
+"""
+
+import json
+import random
+
+import engine
+import responses
+from question_bank import default_bank
+from questionnaire import CompiledQuestionnaire, DIMENSIONS, PERSONALITY_TYPES
+from session_store import Session
+
+questionnaire = CompiledQuestionnaire(default_bank.questions)
+
+
+def assert_scores_match(session: Session):
+    assert session.scores == questionnaire.dimension_bounds(session.answers)[0]
+
+
+def extreme_completion(answers, dim: int, toward_negative: bool) -> bytearray:
+    """Answers with every open item of a dimension pushed as far as possible one way"""
+    completed = bytearray(answers)
+    for i, (item_dim, weight) in enumerate(zip(questionnaire.item_dims, questionnaire.item_weights)):
+        if item_dim == dim and not completed[i]:
+            completed[i] = 1 if (weight > 0) == toward_negative else 5
+    return completed
+
+
+def test_locked_dimensions_are_decided():
+    rng = random.Random(3)
+    for _ in range(500):
+        answers = bytearray(rng.choice((0, 0, 1, 2, 3, 4, 5)) for _ in range(len(questionnaire)))
+        scores = questionnaire.dimension_bounds(answers)[0]
+        for dim, locked in enumerate(questionnaire.locked_dimensions(answers)):
+            negative = scores[dim] < 0
+            # The completion most likely to flip the letter
+            flipped = questionnaire.dimension_bounds(extreme_completion(answers, dim, not negative))[0][dim] < 0
+            assert locked == (flipped == negative), (DIMENSIONS[dim], answers)
+
+
+def test_adaptive_test_only_skips_decided_questions(monkeypatch):
+    monkeypatch.setattr(engine, "ADAPTIVE_TESTING", True)
+    rng = random.Random(4)
+    skipped = 0
+    for walk in range(50):
+        session_id = f"adaptive-{walk}"
+        engine.process_request(session_id, action="start")
+        session = engine.session_store.get(session_id)
+        while not session.completed:
+            engine.process_request(session_id, action="answer", value=rng.choice((1, 5)))
+            assert_scores_match(session)
+        locked = questionnaire.locked_dimensions(session.answers)
+        for i, answer in enumerate(session.answers):
+            if not answer:
+                skipped += 1
+                assert locked[questionnaire.item_dims[i]]
+        assert session.type_code == questionnaire.scores_type_code(session.scores)
+    assert skipped
+
+
+def test_adaptive_completion_reports_skipped_questions(monkeypatch):
+    monkeypatch.setattr(engine, "ADAPTIVE_TESTING", True)
+    session_id = "adaptive-saved"
+    engine.process_request(session_id, action="start")
+    session = engine.session_store.get(session_id)
+    while not session.completed:
+        _, body = engine.process_request(session_id, action="answer", value=5)
+    saved = session.answers.count(0)
+    assert saved
+    reply = json.loads(body)
+    assert reply["context"]["questions_saved"] == saved
+    assert f" {saved} question" in reply["response"]
+
+
+def test_completion_responses_survive_a_snapshot(tmp_path):
+    cache = engine.default_runtime.responses
+    path = str(tmp_path / "responses")
+    responses.save_snapshot(cache, path)
+    loaded = responses.load_snapshot(path)
+    for saved in range(len(questionnaire) + 1):
+        assert loaded.completion(saved).render("s") == cache.completion(saved).render("s")
+        for type_code in range(len(PERSONALITY_TYPES)):
+            body = loaded.completion_with_results(saved, type_code).render("s")
+            assert body == cache.completion_with_results(saved, type_code).render("s")
+            assert json.loads(body)["context"].get("questions_saved", 0) == saved
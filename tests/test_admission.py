@@ -0,0 +1,70 @@
+"""
+Token bucket and queueing delay checks of the admission controller
+"""
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_disabled_admits_everything():
+    controller = AdmissionController()
+    assert not controller.enabled
+    for _ in range(1000):
+        controller.admit()
+    assert controller.admitted == 1000
+
+
+def test_burst_then_refill():
+    clock = FakeClock()
+    controller = AdmissionController(rate=2.0, burst=3.0, clock=clock)
+    for _ in range(3):
+        controller.admit()
+    with pytest.raises(Overloaded) as rejected:
+        controller.admit()
+    # One token takes half a second at 2/s, rounded up to whole seconds
+    assert rejected.value.retry_after == 1
+
+    clock.now += 0.5
+    controller.admit()
+    with pytest.raises(Overloaded):
+        controller.admit()
+
+    # The bucket never holds more than the burst
+    clock.now += 60
+    for _ in range(3):
+        controller.admit()
+    with pytest.raises(Overloaded):
+        controller.admit()
+    assert (controller.admitted, controller.rejected) == (7, 3)
+
+
+def test_retry_after_at_slow_rates():
+    clock = FakeClock()
+    controller = AdmissionController(rate=0.1, burst=1.0, clock=clock)
+    controller.admit()
+    with pytest.raises(Overloaded) as rejected:
+        controller.admit()
+    assert rejected.value.retry_after == 10
+
+
+def test_queueing_delay_sheds_until_it_decays():
+    controller = AdmissionController(max_delay=0.02)
+    controller.observe_delay(0.1)
+    with pytest.raises(Overloaded):
+        controller.admit()
+    # A single quiet measurement doesn't reopen admission right away
+    controller.observe_delay(0.0)
+    with pytest.raises(Overloaded):
+        controller.admit()
+    for _ in range(3):
+        controller.observe_delay(0.0)
+    controller.admit()
@@ -0,0 +1,134 @@
+"""
+Population analytics: streaming aggregates against a brute-force recompute, and snapshots
+"""
+
+import json
+import math
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import analytics
+import app
+import engine
+from analytics import PopulationAnalytics
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+
+runtime = engine.default_runtime
+questionnaire = runtime.questionnaire
+ids = questionnaire.ids
+BANK = runtime.bank.code
+
+client = TestClient(app.app)
+
+
+def scored(answers):
+    scores = questionnaire.dimension_bounds(answers)[0]
+    return list(answers), scores, questionnaire.scores_type_code(scores)
+
+
+def random_sheets(count: int, seed: int, skips: bool = False):
+    rng = random.Random(seed)
+    return [[rng.randint(0 if skips else 1, 5) for _ in ids] for _ in range(count)]
+
+
+def brute_force(completions):
+    """The report of one bank recomputed from every completion kept in full"""
+    items = {}
+    for index, question_id in enumerate(ids):
+        answers = [sheet[index] for sheet, _, _ in completions]
+        items[question_id] = {"answers": [answers.count(a) for a in range(1, 6)], "skipped": answers.count(0)}
+    scores = {}
+    for dim, name in enumerate(DIMENSIONS):
+        values = sorted(s[dim] for _, s, _ in completions)
+        summary = {"count": len(values), "mean": sum(values) / len(values), "min": values[0], "max": values[-1]}
+        for q in analytics.QUANTILES:
+            # Nearest rank: the smallest score with at least that share of scores at or below it
+            summary[f"p{round(q * 100)}"] = values[math.ceil(q * len(values)) - 1]
+        scores[name] = summary
+    return {
+        "code": BANK,
+        "completions": len(completions),
+        "types": {name: sum(1 for *_, t in completions if t == k) for k, name in enumerate(PERSONALITY_TYPES)},
+        "items": items,
+        "scores": scores
+    }
+
+
+def report(population: PopulationAnalytics):
+    return json.loads(population.report(engine.describe_bank))
+
+
+@pytest.mark.parametrize("count, skips", [(1, False), (7, False), (250, False), (120, True)])
+def test_aggregates_match_a_brute_force_recompute(count, skips):
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    completions = [scored(sheet) for sheet in random_sheets(count, count, skips)]
+    for answers, scores, type_code in completions:
+        population.record_completion(BANK, questionnaire, answers, scores, type_code)
+    body = report(population)
+    assert body["completions"] == count
+    assert body["banks"] == {runtime.bank.key: brute_force(completions)}
+
+
+def test_report_is_only_rebuilt_after_completions():
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    population.record_completion(BANK, questionnaire, *scored([3] * len(ids)))
+    first = population.report(engine.describe_bank)
+    assert population.report(engine.describe_bank) is first
+    population.record_completion(BANK, questionnaire, *scored([5] * len(ids)))
+    assert population.report(engine.describe_bank) != first
+
+
+def test_unknown_bank_is_reported_by_code():
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    population.record_completion(12345, questionnaire, *scored([4] * len(ids)))
+    bank = report(population)["banks"]["12345"]
+    assert bank["code"] == 12345 and list(bank["items"]) == [str(n) for n in range(1, len(ids) + 1)]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "analytics.json")
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    completions = [scored(sheet) for sheet in random_sheets(40, 1, skips=True)]
+    for answers, scores, type_code in completions[:30]:
+        population.record_completion(BANK, questionnaire, answers, scores, type_code)
+    assert population.save(path)
+    # Nothing changed since, so nothing is written
+    assert not population.save(path)
+
+    resumed = PopulationAnalytics(PERSONALITY_TYPES)
+    assert resumed.load(path)
+    assert resumed.report(engine.describe_bank) == population.report(engine.describe_bank)
+    assert not resumed.save(path)
+    # Completions after a restart fold into the resumed aggregates
+    for answers, scores, type_code in completions[30:]:
+        resumed.record_completion(BANK, questionnaire, answers, scores, type_code)
+    assert report(resumed)["banks"][runtime.bank.key] == brute_force(completions)
+
+
+def test_snapshot_load_checks(tmp_path):
+    path = str(tmp_path / "analytics.json")
+    assert not PopulationAnalytics(PERSONALITY_TYPES).load(path)
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    population.record_completion(BANK, questionnaire, *scored([2] * len(ids)))
+    population.save(path)
+    with pytest.raises(ValueError):
+        PopulationAnalytics(list(reversed(PERSONALITY_TYPES))).load(path)
+
+
+def test_endpoint_after_completions(monkeypatch):
+    population = PopulationAnalytics(PERSONALITY_TYPES)
+    monkeypatch.setattr(engine, "analytics", population)
+    monkeypatch.setattr(app, "analytics", population)
+    sheets = random_sheets(25, 2)
+    for n, sheet in enumerate(sheets):
+        response = client.post("/mcp", json={"action": "answers", "value": sheet,
+                                             "context": {"session_id": f"analytics-{n}"}})
+        assert response.status_code == 200
+    # A test still in progress is not counted
+    client.post("/mcp", json={"action": "answers", "value": [4, 4], "context": {"session_id": "analytics-open"}})
+
+    body = client.get("/analytics").json()
+    assert body["completions"] == len(sheets)
+    assert body["banks"] == {runtime.bank.key: brute_force([scored(sheet) for sheet in sheets])}
@@ -0,0 +1,83 @@
+"""
+Full and partial answer sets submitted in one request
+"""
+
+import pytest
+
+import engine
+
+ids = engine.default_runtime.questionnaire.ids
+total = engine.default_runtime.total
+
+
+def started(session_id: str):
+    engine.process_request(session_id, action="start")
+    return engine.session_store.get(session_id)
+
+
+def test_list_continues_at_the_current_question():
+    session = started("set-list")
+    engine.process_request("set-list", action="answer", value=2)
+    engine.process_request("set-list", action="answers", value=[4, 5, 1])
+    assert list(session.answers[:4]) == [2, 4, 5, 1]
+    assert session.current_question == 5
+
+
+def test_text_answer_set():
+    session = started("set-text")
+    engine.process_request("set-text", "answers: 4, 5 3")
+    assert list(session.answers[:3]) == [4, 5, 3]
+    assert session.current_question == 4
+
+
+def test_id_map_fills_any_questions():
+    session = started("set-map")
+    engine.process_request("set-map", action="answers", value={ids[0]: 5, ids[3]: "2", ids[7]: 1})
+    assert session.answers[0] == 5 and session.answers[3] == 2 and session.answers[7] == 1
+    # Continues at the first unanswered question
+    assert session.current_question == 2
+
+
+def test_context_answer_set():
+    session = started("set-context")
+    engine.process_request("set-context", "answers:", context={"answers": {ids[1]: 4}})
+    assert session.answers[1] == 4
+
+
+@pytest.mark.parametrize("value", [
+    [4, 6], [0], [4, True], [4.0], [4.5], ["4.5"], [None], [], [4] * (total + 1),
+    {"no-such-question": 4}, {ids[0]: 4, "no-such-question": 4}, {ids[0]: 9}, {ids[0]: False}, {ids[0]: 3.0},
+    4, True, None
+])
+def test_invalid_sets_change_nothing(value):
+    session = started("set-invalid")
+    engine.process_request("set-invalid", action="answer", value=3)
+    before = (bytes(session.answers), session.current_question, list(session.scores))
+    reply = engine.process_request("set-invalid", action="answers", value=value)[1]
+    assert reply == engine.default_runtime.responses.invalid_answers.render("set-invalid")
+    assert (bytes(session.answers), session.current_question, list(session.scores)) == before
+
+
+@pytest.mark.parametrize("value", [True, 4.0, 4.7, "4.7", " 4 x"])
+def test_single_answer_must_be_an_integer(value):
+    session = started("single-invalid")
+    engine.process_request("single-invalid", action="answer", value=value)
+    assert session.current_question == 1 and not any(session.answers)
+
+
+def test_full_set_completes_the_test_in_one_call():
+    sheet = [(i % 5) + 1 for i in range(total)]
+    command, reply = engine.process_request("set-full", action="answers", value=sheet)
+    session = engine.session_store.get("set-full")
+    assert command == "answers"
+    assert session.completed and list(session.answers) == sheet
+    questionnaire = engine.default_runtime.questionnaire
+    assert session.type_code == questionnaire.scores_type_code(questionnaire.dimension_bounds(sheet)[0])
+    assert session.personality_type.encode() in reply
+
+
+def test_answer_set_on_a_completed_test_is_ignored():
+    engine.process_request("set-done", action="answers", value=[3] * total)
+    session = engine.session_store.get("set-done")
+    assert engine.process_request("set-done", action="answers", value=[1])[0] == "fallback"
+    assert list(session.answers) == [3] * total
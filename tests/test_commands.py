@@ -0,0 +1,100 @@
+"""
+Free-text routing against the original substring chain, and structured actions
+"""
+
+import itertools
+
+import pytest
+
+import engine
+
+QUERIES = [
+    "start test", "Take personality test please", "back", "go back", "Go BACK to the last one", "answer: 4",
+    "answer: 9", "answer: x", "results", "show my results", "hello", "start test and go back",
+    "go back answer: 3", "results answer: 2", "answer: 5 then go back", ""
+]
+
+
+def baseline_route(query: str, current_question: int, completed: bool) -> str:
+    """The command the original if/elif chain of substring tests picked for a query"""
+    query = query.lower()
+    if "start test" in query or "take personality test" in query:
+        return "start"
+    # The one intended change: "back" has to be a word of its own
+    elif " back " in f" {query} " and not completed and current_question > 1:
+        return "back"
+    elif "answer:" in query and not completed:
+        return "answer"
+    elif "results" in query and completed:
+        return "results"
+    return "fallback"
+
+
+def session_at(session_id: str, current_question: int) -> str:
+    """Start a session and answer up to the given question, past the last one to complete it"""
+    engine.process_request(session_id, action="start")
+    for _ in range(current_question - 1):
+        engine.process_request(session_id, action="answer", value=3)
+    return session_id
+
+
+@pytest.mark.parametrize("current_question", [1, 5, engine.default_runtime.total + 1])
+def test_free_text_routes_like_the_substring_chain(current_question):
+    for n, query in enumerate(QUERIES):
+        session_id = session_at(f"route-{current_question}-{n}", current_question)
+        session = engine.session_store.get(session_id)
+        expected = baseline_route(query, session.current_question, session.completed)
+        command, _ = engine.process_request(session_id, query)
+        assert command == expected, query
+
+
+def test_new_session_routes_like_the_substring_chain():
+    for n, query in enumerate(q for q in QUERIES if "answer:" not in q):
+        command, _ = engine.process_request(f"route-new-{n}", query)
+        assert command == baseline_route(query, 0, False), query
+
+
+def test_back_inside_other_words_is_not_a_command():
+    session_id = session_at("feedback", 5)
+    assert engine.process_request(session_id, "I have some feedback")[0] == "fallback"
+    assert engine.process_request(session_id, "backwards answer: 4")[0] == "answer"
+    assert engine.session_store.get(session_id).current_question == 6
+
+
+def test_parse_query_finds_each_command_once():
+    assert engine.parse_query("answer: 4 answer: 5 back") == {"answer": " 4 ", "back": None}
+    assert engine.parse_query("answers: 4,5,3") == {"answers": " 4,5,3"}
+    assert engine.parse_query("what is my status") == {"status": None}
+    assert engine.parse_query("feedback, backup, setback") == {}
+
+
+@pytest.mark.parametrize("query, action, value, expected", [
+    ("start test", "answer", 4, "answer"),
+    ("back", "status", None, "status"),
+    ("answer: 1", "back", None, "back"),
+    ("results", "answers", [4, 4], "answers"),
+    ("hello", "start", None, "start")
+])
+def test_action_overrides_query(query, action, value, expected):
+    session_id = session_at(f"action-{action}", 3)
+    before = engine.session_store.get(session_id).current_question
+    command, _ = engine.process_request(session_id, query, action=action, value=value)
+    assert command == expected
+    session = engine.session_store.get(session_id)
+    if action == "answer":
+        assert session.current_question == before + 1 and session.answers[before - 1] == 4
+    elif action == "back":
+        assert session.current_question == before - 1
+
+
+def test_unknown_action_is_rejected():
+    with pytest.raises(ValueError):
+        engine.process_request("unknown-action", "start test", action="restart")
+
+
+def test_actions_need_the_right_session_state():
+    for action, value in itertools.product(("back", "answer", "results", "status"), (None, 3)):
+        assert engine.process_request(f"early-{action}-{value}", action=action, value=value)[0] == "fallback"
+    session_id = session_at("completed-actions", engine.default_runtime.total + 1)
+    assert engine.process_request(session_id, action="answer", value=3)[0] == "fallback"
+    assert engine.process_request(session_id, action="results")[0] == "results"
@@ -0,0 +1,91 @@
+"""
+MCP over stdio: a full test through the server process, and JSON-RPC errors
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import engine
+import mcp_stdio
+from questionnaire import PERSONALITY_TYPES
+
+SERVER = os.path.abspath(mcp_stdio.__file__)
+
+
+class Pipe:
+    """The server spawned as a subprocess, one JSON-RPC message per line each way"""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, SERVER, "--session-id", "pipe"], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    def send(self, line: str):
+        self.process.stdin.write(line + "\n")
+        self.process.stdin.flush()
+
+    def receive(self):
+        return json.loads(self.process.stdout.readline())
+
+    def call(self, message_id, method, params=None):
+        self.send(json.dumps({"jsonrpc": "2.0", "id": message_id, "method": method, "params": params or {}}))
+        reply = self.receive()
+        assert reply["id"] == message_id
+        return reply
+
+    def tool(self, message_id, name, **arguments):
+        result = self.call(message_id, "tools/call", {"name": name, "arguments": arguments})["result"]
+        assert not result["isError"], result
+        return result
+
+    def close(self) -> int:
+        self.process.stdin.close()
+        return self.process.wait(timeout=10)
+
+
+@pytest.fixture
+def pipe():
+    pipe = Pipe()
+    yield pipe
+    if pipe.process.poll() is None:
+        pipe.process.kill()
+
+
+def test_full_test_over_a_pipe(pipe):
+    initialized = pipe.call(1, "initialize", {"protocolVersion": mcp_stdio.PROTOCOL_VERSION})["result"]
+    assert initialized["serverInfo"] == mcp_stdio.SERVER_INFO and "tools" in initialized["capabilities"]
+    # Notifications get no reply: the next line read answers the ping
+    pipe.send(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}))
+    assert pipe.call(2, "ping")["result"] == {}
+    tools = pipe.call(3, "tools/list")["result"]["tools"]
+    assert [tool["name"] for tool in tools] == list(mcp_stdio.TOOLS)
+
+    started = pipe.tool(4, "start_test")["structuredContent"]
+    assert started["session_id"] == "pipe" and started["current_question"] == 1
+    sheet = [(n % 5) + 1 for n in range(started["total_questions"])]
+    pipe.tool(5, "submit_answers", answers=sheet)
+    results = pipe.tool(6, "get_results")
+    questionnaire = engine.default_runtime.questionnaire
+    personality_type = PERSONALITY_TYPES[questionnaire.scores_type_code(questionnaire.dimension_bounds(sheet)[0])]
+    assert results["structuredContent"]["personality_type"] == personality_type
+    assert personality_type in results["content"][0]["text"]
+    assert pipe.close() == 0
+
+
+def test_errors_keep_the_server_running(pipe):
+    pipe.send("{not json")
+    assert pipe.receive()["error"]["code"] == mcp_stdio.PARSE_ERROR
+    assert pipe.call(1, "no/such/method")["error"]["code"] == mcp_stdio.METHOD_NOT_FOUND
+    pipe.send(json.dumps([1, 2]))
+    assert pipe.receive()["error"]["code"] == mcp_stdio.INVALID_REQUEST
+    assert pipe.call(2, "tools/call", {"name": "no_such_tool"})["error"]["code"] == mcp_stdio.INVALID_PARAMS
+    assert pipe.call(3, "tools/call", {"name": "start_test", "arguments": [1]})["error"]["code"] == \
+        mcp_stdio.INVALID_PARAMS
+    # A call the engine rejects is a tool error, not a protocol error
+    rejected = pipe.call(4, "tools/call", {"name": "start_test", "arguments": {"instrument": "unknown"}})
+    assert rejected["result"]["isError"]
+    assert pipe.call(5, "ping")["result"] == {}
+    assert pipe.close() == 0
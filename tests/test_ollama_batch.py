@@ -0,0 +1,115 @@
+"""
+Batch dispatcher against the Ollama stub: concurrency, ordering and retries
+"""
+
+import asyncio
+import threading
+
+from ollama_batch import OllamaBatchDispatcher
+from ollama_stub import OllamaStub, OllamaStubHandler
+from personas import persona_prompt
+
+TYPES = ["INTJ", "ENFP", "INTJ", "ISTP", "ENFP", "INTJ"]
+JOBS = [{"id": n, "personality_type": t, "prompt": f"hello {n}"} for n, t in enumerate(TYPES)]
+
+
+def start_stub(**kwargs) -> OllamaStub:
+    """A stub counting the chats it is answering at once"""
+    stub = OllamaStub(**kwargs)
+    stub.in_flight = stub.peak_in_flight = 0
+    lock = threading.Lock()
+
+    class CountingHandler(OllamaStubHandler):
+        def do_POST(self):
+            with lock:
+                stub.in_flight += 1
+                stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+            try:
+                super().do_POST()
+            finally:
+                with lock:
+                    stub.in_flight -= 1
+
+    stub.RequestHandlerClass = CountingHandler
+    return stub.start()
+
+
+def run(stub: OllamaStub, jobs, **kwargs):
+    dispatcher = OllamaBatchDispatcher(stub.url, model="stub", backoff=0.0, **kwargs)
+    results = []
+    summary = asyncio.run(dispatcher.run(jobs, results.append))
+    return summary, results
+
+
+def test_concurrency_is_bounded():
+    stub = start_stub(first_token_delay=0.05)
+    try:
+        jobs = [dict(job, id=n) for n, job in enumerate(JOBS * 4)]
+        summary, results = run(stub, jobs, concurrency=3)
+    finally:
+        stub.stop()
+    assert summary["completed"] == len(jobs) and summary["failed"] == 0
+    assert stub.peak_in_flight == 3
+    assert sorted(result["id"] for result in results) == list(range(len(jobs)))
+    assert all(result["reply"] == f"You said: hello {result['id'] % len(JOBS)} " for result in results)
+
+
+def test_jobs_are_grouped_by_persona_prompt():
+    stub = start_stub()
+    try:
+        _, results = run(stub, JOBS, concurrency=1)
+    finally:
+        stub.stop()
+    # Grouped in order of first appearance, input order kept within a group
+    assert [result["id"] for result in results] == [0, 2, 5, 1, 4, 3]
+    prompts = [request["messages"][0]["content"] for request in stub.requests]
+    assert prompts == [persona_prompt(TYPES[n]) for n in (0, 2, 5, 1, 4, 3)]
+
+
+def test_input_order_without_grouping():
+    stub = start_stub()
+    try:
+        _, results = run(stub, JOBS, concurrency=1, group=False)
+    finally:
+        stub.stop()
+    assert [result["id"] for result in results] == list(range(len(JOBS)))
+
+
+def test_overloaded_chats_are_retried():
+    stub = start_stub(error_rate=0.3, seed=1)
+    try:
+        summary, results = run(stub, JOBS * 3, concurrency=2, retries=10)
+    finally:
+        stub.stop()
+    assert summary["completed"] == len(results) == len(JOBS) * 3 and summary["failed"] == 0
+    assert summary["retries"] == sum(result["attempts"] - 1 for result in results) > 0
+
+
+def test_failure_after_the_last_retry():
+    stub = start_stub(error_rate=1.0)
+    try:
+        summary, results = run(stub, JOBS[:2], concurrency=2, retries=2)
+    finally:
+        stub.stop()
+    assert summary["failed"] == 2 and summary["completed"] == 0
+    assert all(result["attempts"] == 3 and "503" in result["error"] and "reply" not in result for result in results)
+    assert len(stub.requests) == 6
+
+
+def test_unreachable_server_is_reported_per_job():
+    stub = OllamaStub()
+    url = stub.url
+    stub.server_close()
+    dispatcher = OllamaBatchDispatcher(url, model="stub", retries=1, backoff=0.0)
+    results = []
+    summary = asyncio.run(dispatcher.run(JOBS[:1], results.append))
+    assert summary["failed"] == 1 and results[0]["attempts"] == 2 and results[0]["error"]
+
+
+def test_request_history_is_bounded():
+    stub = start_stub(history=4)
+    try:
+        run(stub, JOBS, concurrency=1)
+    finally:
+        stub.stop()
+    assert [request["messages"][1]["content"] for request in stub.requests] == [f"hello {n}" for n in (5, 1, 4, 3)]
@@ -0,0 +1,108 @@
+"""
+ConversationWindow trimming and streamed chat replies
+"""
+
+import pytest
+import requests
+
+from ollama_integration import ConversationWindow, OllamaPersonalityIntegration
+from ollama_stub import OllamaStub
+
+
+def window_chars(window: ConversationWindow) -> int:
+    return sum(len(message["content"]) for message in window.messages())
+
+
+def test_window_stays_within_budget():
+    window = ConversationWindow("s" * 200, max_chars=1000)
+    for n in range(50):
+        window.add("user", f"question {n} " + "q" * 90)
+        window.add("assistant", f"answer {n} " + "a" * 150)
+        assert window_chars(window) <= window.max_chars
+    # The summary is counted against the budget and takes at most a quarter of it
+    assert window.summary() and len(window.summary()) <= window.max_chars // 4
+    assert window_chars(window) <= window.max_chars
+
+
+def test_whole_exchanges_are_dropped():
+    window = ConversationWindow("system", max_chars=600)
+    for n in range(20):
+        window.add("user", f"question {n} " + "q" * 60)
+        window.add("assistant", f"answer {n} " + "a" * 60)
+        # The window always opens on a user turn, never on an orphaned reply
+        assert window.turns[0]["role"] == "user"
+        assert [turn["role"] for turn in window.turns] == ["user", "assistant"] * (len(window.turns) // 2)
+    assert window.turns[-1]["content"].startswith("answer 19")
+    assert window.turns[-2]["content"].startswith("question 19")
+
+
+def test_summary_keeps_the_newest_dropped_topics():
+    window = ConversationWindow("system", max_chars=400)
+    for n in range(30):
+        window.add("user", f"topic{n:02d} please")
+        window.add("assistant", "y" * 100)
+    summary = window.summary()
+    assert summary.startswith(ConversationWindow.SUMMARY_PREFIX)
+    kept = [n for n in range(30) if f"topic{n:02d}" in summary]
+    newest_dropped = int(window.dropped_topics[-1][5:7])
+    # A run of the most recently dropped topics, oldest first
+    assert kept == list(range(newest_dropped - len(kept) + 1, newest_dropped + 1))
+    assert 1 < len(kept) < newest_dropped
+    assert window.messages()[1] == {"role": "system", "content": summary}
+
+
+def test_latest_exchange_is_kept_even_over_budget():
+    window = ConversationWindow("system", max_chars=100)
+    window.add("user", "short")
+    window.add("assistant", "fine")
+    window.add("user", "u" * 300)
+    window.add("assistant", "a" * 300)
+    assert [turn["content"][0] for turn in window.turns] == ["u", "a"]
+    window.add("user", "next " + "n" * 300)
+    assert window.turns == [{"role": "user", "content": "next " + "n" * 300}]
+
+
+@pytest.fixture
+def stub():
+    stub = OllamaStub().start()
+    yield stub
+    stub.stop()
+
+
+def test_send_message_streams_and_records_the_reply(stub):
+    integration = OllamaPersonalityIntegration(stub.url, model="stub")
+    window = ConversationWindow("system")
+    tokens = []
+    reply = integration.send_message(window, "hello there", on_token=tokens.append)
+    assert reply == "You said: hello there "
+    assert "".join(tokens) == reply
+    assert window.turns == [{"role": "user", "content": "hello there"}, {"role": "assistant", "content": reply}]
+    assert integration.last_ttft is not None
+
+
+class GarbledResponse:
+    """A streamed reply whose second line is cut off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        yield b'{"message": {"content": "Hi "}, "done": false}'
+        yield b'{"message": {"content": "the'
+
+
+class GarbledSession:
+    def post(self, *args, **kwargs):
+        return GarbledResponse()
+
+
+def test_malformed_chunk_is_a_request_error():
+    integration = OllamaPersonalityIntegration(http=GarbledSession())
+    with pytest.raises(requests.exceptions.RequestException, match="Malformed reply"):
+        integration.send_message(ConversationWindow("system"), "hello")
@@ -0,0 +1,81 @@
+"""
+Question bank registry: selectors, the compiled cache and its fallbacks
+"""
+
+import os
+import shutil
+import struct
+
+import pytest
+
+import question_bank
+from question_bank import BankRegistry, QuestionBank, compile_bank
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(question_bank.__file__)), "banks", "personality.en.v1.json")
+
+
+@pytest.fixture
+def bank_dir(tmp_path):
+    banks = tmp_path / "banks"
+    banks.mkdir()
+    shutil.copy(SOURCE, banks)
+    return banks
+
+
+def test_compiled_once_and_reused(bank_dir, tmp_path):
+    registry = BankRegistry(str(bank_dir), str(tmp_path / "compiled"))
+    bank = registry.get("personality", "en", 1)
+    path = registry.compiled_path("personality", "en", 1)
+    assert bank.path == path and os.path.exists(path)
+    assert bank.questions == question_bank.default_bank.questions
+    assert bank.descriptions == question_bank.default_bank.descriptions
+    mtime = os.path.getmtime(path)
+    assert BankRegistry(str(bank_dir), str(tmp_path / "compiled")).get().path == path
+    assert os.path.getmtime(path) == mtime
+
+
+@pytest.mark.parametrize("stale", [
+    struct.pack("<4sH", b"PTQB", 99) + b"\0" * 64,
+    b"not a bank",
+    b""
+])
+def test_stale_compiled_file_is_compiled_again(bank_dir, tmp_path, stale):
+    registry = BankRegistry(str(bank_dir), str(tmp_path / "compiled"))
+    path = registry.compiled_path("personality", "en", 1)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(stale)
+    bank = registry.get()
+    assert len(bank) == len(question_bank.default_bank)
+    with open(path, "rb") as f:
+        assert f.read() == compile_bank(registry._definition("personality", "en", 1))
+
+
+def test_unwritable_cache_compiles_in_memory(bank_dir, tmp_path):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    registry = BankRegistry(str(bank_dir), str(blocker / "compiled"))
+    bank = registry.get()
+    assert bank.questions == question_bank.default_bank.questions
+    assert bank.source == str(bank_dir / "personality.en.v1.json")
+    assert not os.path.exists(bank.path)
+
+
+def test_bank_from_bytes_rejects_other_data():
+    with pytest.raises(ValueError):
+        QuestionBank("memory", b"PTQB")
+
+
+@pytest.mark.parametrize("selectors", [
+    {"instrument": 1}, {"locale": ["en"]}, {"version": "one"}, {"version": True}, {"version": 2},
+    {"instrument": "unknown"}
+])
+def test_bad_selectors(bank_dir, tmp_path, selectors):
+    registry = BankRegistry(str(bank_dir), str(tmp_path / "compiled"))
+    with pytest.raises(ValueError):
+        registry.get(**selectors)
+
+
+def test_version_given_as_text(bank_dir, tmp_path):
+    registry = BankRegistry(str(bank_dir), str(tmp_path / "compiled"))
+    assert registry.get(version="1").version == 1
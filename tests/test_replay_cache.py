@@ -0,0 +1,43 @@
+"""
+Replaying retried requests by request id
+"""
+
+import engine
+from replay_cache import ReplayCache
+
+
+def test_cache_bounds():
+    cache = ReplayCache(max_sessions=2, per_session=2)
+    cache.put("a", 1, b"a1")
+    cache.put("a", 2, b"a2")
+    cache.put("a", 3, b"a3")
+    assert cache.get("a", 1) is None
+    assert cache.get("a", "3") == b"a3"
+
+    cache.put("b", 1, b"b1")
+    cache.put("c", 1, b"c1")
+    assert cache.get("a", 2) is None
+    assert len(cache) == 2
+
+
+def test_retry_is_replayed_not_reapplied():
+    engine.process_request("replay-1", action="start", request_id=1)
+    command, body = engine.process_request("replay-1", action="answer", value=4, request_id=2)
+    assert command == "answer"
+
+    replayed_command, replayed_body = engine.process_request("replay-1", action="answer", value=4, request_id=2)
+    assert (replayed_command, replayed_body) == ("replay", body)
+    session = engine.session_store.get("replay-1")
+    assert session.current_question == 2
+    assert session.answers.count(0) == len(session.answers) - 1
+
+
+def test_start_clears_request_ids():
+    engine.process_request("replay-2", action="start", request_id=1)
+    engine.process_request("replay-2", action="answer", value=2, request_id=2)
+
+    # A new test may number its requests from the start again
+    engine.process_request("replay-2", action="start", request_id=10)
+    command, _ = engine.process_request("replay-2", action="answer", value=5, request_id=2)
+    assert command == "answer"
+    assert engine.session_store.get("replay-2").answers[0] == 5
@@ -0,0 +1,91 @@
+"""
+Offline re-scoring: per-record validation and resuming an interrupted run
+"""
+
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+
+import rescore
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+
+RESCORE = os.path.join(os.path.dirname(os.path.abspath(rescore.__file__)), "rescore.py")
+
+rescore._init_worker()
+questionnaire = rescore._questionnaire
+ids = questionnaire.ids
+
+
+def expected(answers):
+    scores = questionnaire.dimension_bounds(answers)[0]
+    return {"personality_type": PERSONALITY_TYPES[questionnaire.scores_type_code(scores)],
+            "scores": dict(zip(DIMENSIONS, scores))}
+
+
+def test_valid_records_are_scored():
+    sheet = [(i % 5) + 1 for i in range(len(ids))]
+    lines = [json.dumps({"id": 1, "answers": sheet}).encode(), b"\n",
+             json.dumps({"session_id": "s", "answers": {ids[2]: 5}}).encode()]
+    one_answer = [0] * len(ids)
+    one_answer[2] = 5
+    assert rescore.score_chunk(lines, "jsonl", None) == [
+        dict(expected(sheet), id=1),
+        dict(expected(one_answer), session_id="s")
+    ]
+
+
+def test_invalid_records_get_an_error():
+    records = [
+        {"answers": [4.9] * len(ids)},
+        {"answers": [True] * len(ids)},
+        {"answers": [6] * len(ids)},
+        {"answers": [4] * (len(ids) - 1)},
+        {"answers": {ids[0]: 2.5}},
+        {"answers": "4,4"},
+        {"id": 7}
+    ]
+    lines = [json.dumps(record).encode() for record in records] + [b"{not json"]
+    lines.append(json.dumps({"answers": [3] * len(ids)}).encode())
+    results = rescore.score_chunk(lines, "jsonl", None)
+    assert all("error" in result and "scores" not in result for result in results[:-1])
+    assert len(results) == len(lines) and results[6]["id"] == 7
+    assert results[-1] == expected([3] * len(ids))
+
+
+def test_csv_records():
+    header = ["id"] + ids
+    lines = [("a," + ",".join(["5"] * len(ids))).encode(), ("b," + ",".join(["4.5"] * len(ids))).encode(),
+             ("c," + ",".join([""] * len(ids))).encode()]
+    results = rescore.score_chunk(lines, "csv", header)
+    assert results[0] == dict(expected([5] * len(ids)), id="a")
+    assert "error" in results[1]
+    assert results[2] == dict(expected([0] * len(ids)), id="c")
+
+
+def run(*args) -> str:
+    process = subprocess.run([sys.executable, RESCORE, *args, "--workers", "1", "--chunk-size", "7",
+                              "--progress-interval", "0"], capture_output=True, text=True, check=True)
+    return process.stderr
+
+
+def test_resume_after_interruption(tmp_path):
+    rng = random.Random(0)
+    source = tmp_path / "answers.jsonl"
+    with open(source, "w") as f:
+        for i in range(100):
+            f.write(json.dumps({"id": i, "answers": [rng.randint(0, 5) for _ in ids]}) + "\n")
+    complete = tmp_path / "complete.jsonl"
+    reports = re.findall(r"--start-offset (\d+) --output-offset (\d+)", run(str(source), "-o", str(complete)))
+    assert len(reports) > 3
+
+    # Killed mid-write: output past the resume point, ending in a partial line
+    start_offset, output_offset = reports[len(reports) // 2]
+    resumed = tmp_path / "resumed.jsonl"
+    data = complete.read_bytes()
+    resumed.write_bytes(data[:int(output_offset) + 150])
+    run(str(source), "-o", str(resumed), "--start-offset", start_offset, "--output-offset", output_offset)
+    assert resumed.read_bytes() == data
+    assert [json.loads(line)["id"] for line in data.splitlines()] == list(range(100))
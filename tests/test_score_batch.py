@@ -0,0 +1,80 @@
+"""
+POST /score/batch with JSON and packed bodies, against scoring one sheet at a time
+"""
+
+import random
+import struct
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from questionnaire import DIMENSIONS, PERSONALITY_TYPES
+
+client = TestClient(app.app)
+questionnaire = app.default_runtime.questionnaire
+ids = questionnaire.ids
+
+
+def expected(sheet):
+    scores = questionnaire.dimension_bounds(sheet)[0]
+    return PERSONALITY_TYPES[questionnaire.scores_type_code(scores)], scores
+
+
+def test_json_sheets():
+    rng = random.Random(0)
+    sheets = [[rng.randint(0, 5) for _ in ids] for _ in range(50)]
+    reply = client.post("/score/batch", json={"sheets": sheets})
+    assert reply.status_code == 200
+    body = reply.json()
+    assert body["count"] == len(sheets)
+    assert body["dimensions"] == list(DIMENSIONS)
+    for sheet, personality_type, scores in zip(sheets, body["types"], body["scores"]):
+        assert (personality_type, scores) == expected(sheet)
+
+
+def test_id_map_and_list_sheets_mixed():
+    reply = client.post("/score/batch", json={"sheets": [{ids[0]: 1, ids[5]: 5}, [4] * len(ids)]})
+    assert reply.status_code == 200
+    sheet = [0] * len(ids)
+    sheet[0], sheet[5] = 1, 5
+    assert reply.json()["types"] == [expected(sheet)[0], expected([4] * len(ids))[0]]
+
+
+def test_packed_sheets():
+    rng = random.Random(1)
+    sheets = [[rng.randint(0, 5) for _ in ids] for _ in range(20)]
+    reply = client.post("/score/batch", content=bytes(answer for sheet in sheets for answer in sheet),
+                        headers={"Content-Type": "application/octet-stream", "Accept": "application/octet-stream"})
+    assert reply.status_code == 200
+    assert reply.headers["X-Sheet-Count"] == str(len(sheets))
+    codes = reply.content[:len(sheets)]
+    scores = struct.unpack(f"<{len(sheets) * len(DIMENSIONS)}h", reply.content[len(sheets):])
+    for i, sheet in enumerate(sheets):
+        personality_type, sheet_scores = expected(sheet)
+        assert PERSONALITY_TYPES[codes[i]] == personality_type
+        assert list(scores[i * len(DIMENSIONS):(i + 1) * len(DIMENSIONS)]) == sheet_scores
+
+
+@pytest.mark.parametrize("sheets", [
+    [[1.7] * len(ids)],
+    [[True] * len(ids)],
+    [["4"] * len(ids)],
+    [[4] * (len(ids) - 1)],
+    [[6] * len(ids)],
+    [[-1] * len(ids)],
+    [[300] * len(ids)],
+    [4, 5],
+    [{ids[0]: 4.5}],
+    [{ids[0]: False}],
+    "4,5",
+    {ids[0]: 4}
+])
+def test_invalid_json_sheets(sheets):
+    assert client.post("/score/batch", json={"sheets": sheets}).status_code == 400
+
+
+@pytest.mark.parametrize("body", [bytes([3] * (len(ids) + 1)), bytes([6] * len(ids)), bytes([255] * len(ids))])
+def test_invalid_packed_sheets(body):
+    reply = client.post("/score/batch", content=body, headers={"Content-Type": "application/octet-stream"})
+    assert reply.status_code == 400
@@ -0,0 +1,85 @@
+"""
+Running scores against full recomputation
+"""
+
+import random
+
+import engine
+from question_bank import default_bank
+from questionnaire import CompiledQuestionnaire
+from session_sqlite import SQLiteSessionStore
+from session_store import Session
+
+questionnaire = CompiledQuestionnaire(default_bank.questions)
+
+
+def assert_scores_match(session: Session):
+    assert session.scores == questionnaire.dimension_bounds(session.answers)[0]
+
+
+def test_running_scores_after_answer_back_and_reanswer():
+    rng = random.Random(0)
+    for walk in range(50):
+        session_id = f"scores-{walk}"
+        engine.process_request(session_id, action="start")
+        session = engine.session_store.get(session_id)
+        while not session.completed:
+            if session.current_question > 1 and rng.random() < 0.25:
+                engine.process_request(session_id, action="back")
+            else:
+                engine.process_request(session_id, action="answer", value=rng.randint(1, 5))
+            assert_scores_match(session)
+        assert session.type_code == questionnaire.scores_type_code(session.scores)
+
+
+def test_answer_sets_update_running_scores():
+    rng = random.Random(1)
+    session_id = "scores-set"
+    engine.process_request(session_id, action="start")
+    engine.process_request(session_id, action="answers", value=[rng.randint(1, 5) for _ in range(5)])
+    session = engine.session_store.get(session_id)
+    assert_scores_match(session)
+    ids = [question["id"] for question in default_bank.questions]
+    engine.process_request(session_id, action="answers", value={ids[0]: 1, ids[7]: 5})
+    assert_scores_match(session)
+
+
+def test_rebuilt_scores_match():
+    session = Session(len(questionnaire))
+    session.answers[:] = bytes(random.Random(2).randint(0, 5) for _ in range(len(questionnaire)))
+    session.scores = None
+    assert questionnaire.running_scores(session) == questionnaire.dimension_bounds(session.answers)[0]
+    assert session.answered == len(questionnaire) - session.answers.count(0)
+
+
+def test_scores_and_answered_count_survive_the_record(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), len(questionnaire))
+    monkeypatch.setattr(engine, "session_store", store)
+    rng = random.Random(5)
+    session_id = "scores-sqlite"
+    engine.process_request(session_id, action="start")
+    # Every request loads the session from its packed record, so nothing may need rebuilding
+    monkeypatch.setattr(CompiledQuestionnaire, "dimension_bounds", None)
+    while True:
+        session = store.get(session_id)
+        assert session.scores is not None
+        if session.completed:
+            break
+        if session.current_question > 1 and rng.random() < 0.25:
+            engine.process_request(session_id, action="back")
+        else:
+            engine.process_request(session_id, action="answer", value=rng.randint(1, 5))
+        engine.process_request(session_id, action="status")
+    monkeypatch.undo()
+    assert_scores_match(session)
+    assert session.answered == len(questionnaire) - session.answers.count(0)
+    store.close()
+
+
+def test_record_round_trip_keeps_scores():
+    session = Session(len(questionnaire))
+    for index, answer in enumerate([5, 1, 4, 2, 3]):
+        questionnaire.record_answer(session, index, answer)
+    restored = Session.from_bytes(session.to_bytes())
+    assert restored.scores == session.scores and restored.answered == 5
+    assert restored.answers == session.answers
@@ -0,0 +1,137 @@
+"""
+SQLite session backend shared by several connections and processes
+"""
+
+import multiprocessing
+import sqlite3
+import time
+
+import session_sqlite
+from session_sqlite import SQLiteSessionStore
+from session_store import NO_TYPE, RECORD_FORMAT
+
+NUM_QUESTIONS = 20
+
+
+def write_sessions(path: str, prefix: str, count: int):
+    store = SQLiteSessionStore(path, NUM_QUESTIONS)
+    for i in range(count):
+        session = store.create(f"{prefix}-{i}")
+        session.current_question = 3
+        session.answers[0] = 4
+        store.save(f"{prefix}-{i}", session)
+    store.close()
+
+
+def row_count(path: str) -> int:
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_shared_between_connections(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteSessionStore(path, NUM_QUESTIONS), SQLiteSessionStore(path, NUM_QUESTIONS)
+    session = first.create("shared")
+    session.current_question = 2
+    session.answers[0] = 5
+    first.save("shared", session)
+
+    seen = second.get("shared")
+    assert seen.current_question == 2 and seen.answers[0] == 5
+    seen.type_code = 3
+    second.save("shared", seen)
+    assert first.get("shared").type_code == 3
+    assert (len(first), first.completed_count()) == (1, 1)
+
+    first.delete("shared")
+    assert second.get("shared") is None
+    assert (len(second), second.completed_count()) == (0, 0)
+    first.close()
+    second.close()
+
+
+def test_shared_between_processes(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path, NUM_QUESTIONS).close()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=write_sessions, args=(path, f"worker{n}", 50)) for n in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    store = SQLiteSessionStore(path, NUM_QUESTIONS)
+    assert len(store) == 100
+    assert store.get("worker1-49").answers[0] == 4
+    store.close()
+
+
+def test_buffered_saves_are_coalesced(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    writer = SQLiteSessionStore(path, NUM_QUESTIONS, flush_interval=3600.0, batch_size=100)
+    reader = SQLiteSessionStore(path, NUM_QUESTIONS)
+    session = writer.create("buffered")
+    for question in range(1, 6):
+        session.current_question = question
+        writer.save("buffered", session)
+
+    # Visible to its own worker right away, to others only once flushed
+    assert writer.get("buffered").current_question == 5
+    assert reader.get("buffered") is None
+    writer.flush()
+    assert reader.get("buffered").current_question == 5
+    assert row_count(path) == 1
+    writer.close()
+    reader.close()
+
+
+def test_batch_size_triggers_a_flush(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    writer = SQLiteSessionStore(path, NUM_QUESTIONS, flush_interval=3600.0, batch_size=3)
+    for i in range(2):
+        writer.create(f"batch-{i}")
+    assert row_count(path) == 0
+    writer.create("batch-2")
+    assert row_count(path) == 3
+    writer.close()
+
+
+def test_idle_sessions_expire(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_sqlite, "_PURGE_INTERVAL", 0.0)
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, NUM_QUESTIONS, idle_ttl=0.05)
+    session = store.create("idle")
+    session.type_code = 1
+    store.save("idle", session)
+    assert store.get("idle") is not None
+    time.sleep(0.1)
+    assert store.get("idle") is None
+
+    # Expired rows are purged on the next create, and drop out of the counts
+    store.create("fresh")
+    assert row_count(path) == 1
+    assert (len(store), store.completed_count()) == (1, 0)
+    assert store.get("fresh").type_code == NO_TYPE
+    store.close()
+
+
+def test_records_of_another_format_are_discarded(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    write_sessions(path, "old", 3)
+    db = sqlite3.connect(path)
+    db.execute(f"PRAGMA user_version = {RECORD_FORMAT - 1}")
+    db.close()
+
+    store = SQLiteSessionStore(path, NUM_QUESTIONS)
+    assert len(store) == 0 and store.completed_count() == 0
+    assert store.get("old-0") is None
+    store.create("new")
+    store.close()
+    # Reopening at the current format keeps sessions
+    store = SQLiteSessionStore(path, NUM_QUESTIONS)
+    assert len(store) == 1 and store.get("new") is not None
+    store.close()
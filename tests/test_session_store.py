@@ -0,0 +1,137 @@
+"""
+In-memory SessionStore: LRU order, idle TTL, memory budget and the completed count
+"""
+
+import pytest
+
+import session_store
+from session_store import NO_TYPE, Session, SessionStore
+
+QUESTIONS = 20
+
+
+class Clock:
+    """Stand-in for the time module with a monotonic clock moved by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+def make_store(max_sessions: int, idle_ttl: float = 3600.0) -> SessionStore:
+    budget = max_sessions * SessionStore(QUESTIONS).bytes_per_session()
+    store = SessionStore(QUESTIONS, memory_budget=budget, idle_ttl=idle_ttl)
+    assert store.max_sessions == max_sessions
+    return store
+
+
+def complete(store: SessionStore, session_id: str):
+    session = store.get(session_id)
+    session.type_code = 0
+    store.record_completion(session_id, session)
+
+
+def test_budget_evicts_least_recently_used(clock):
+    store = make_store(3)
+    for session_id in ("a", "b", "c"):
+        store.create(session_id)
+        clock.now += 1
+    # Touching "a" leaves "b" as the oldest untouched session
+    store.get("a")
+    store.create("d")
+    assert "b" not in store
+    assert all(session_id in store for session_id in ("a", "c", "d"))
+    store.create("e")
+    assert "c" not in store
+    assert len(store) == 3
+    assert store.evictions == 2
+
+
+def test_recreate_does_not_evict(clock):
+    store = make_store(2)
+    store.create("a")
+    store.create("b")
+    store.create("a")
+    assert len(store) == 2 and store.evictions == 0
+
+
+def test_idle_sessions_expire(clock):
+    store = make_store(10, idle_ttl=60)
+    store.create("old")
+    clock.now += 30
+    store.create("recent")
+    clock.now += 31
+    assert store.get("old") is None
+    assert store.get("recent") is not None
+
+    clock.now += 61
+    store.evict_expired()
+    assert len(store) == 0
+    assert store.evictions == 2
+
+
+def test_access_extends_the_ttl(clock):
+    store = make_store(10, idle_ttl=60)
+    store.create("a")
+    for _ in range(5):
+        clock.now += 50
+        assert store.get("a") is not None
+    store.evict_expired()
+    assert "a" in store
+
+
+def test_completed_count_follows_evictions(clock):
+    store = make_store(3, idle_ttl=60)
+    for session_id in ("a", "b", "c"):
+        store.create(session_id)
+        complete(store, session_id)
+        clock.now += 1
+    assert store.completed_count() == 3
+
+    # LRU eviction, deletion, restarting a test and TTL expiry all drop a completed session
+    store.create("d")
+    assert store.completed_count() == 2
+    store.delete("b")
+    assert store.completed_count() == 1
+    store.create("c")
+    assert store.completed_count() == 0
+    complete(store, "c")
+    clock.now += 61
+    store.evict_expired()
+    assert store.completed_count() == 0 and len(store) == 0
+
+
+def test_completion_after_eviction_is_not_counted(clock):
+    store = make_store(1)
+    session = store.create("a")
+    store.create("b")
+    session.type_code = 0
+    store.record_completion("a", session)
+    assert store.completed_count() == 0
+    assert len(store) == 1
+
+
+def test_bytes_per_session_covers_a_stored_session():
+    store = SessionStore(QUESTIONS)
+    session = Session(QUESTIONS)
+    assert store.bytes_per_session() > len(session.to_bytes()) + len(session.answers)
+    assert store.max_sessions == 64 * 1024 * 1024 // store.bytes_per_session()
+    assert SessionStore(2 * QUESTIONS).bytes_per_session() > store.bytes_per_session()
+
+
+def test_record_round_trip():
+    session = Session(QUESTIONS, bank=123456)
+    session.current_question = 7
+    session.answers[:6] = bytes([1, 2, 3, 4, 5, 1])
+    restored = Session.from_bytes(session.to_bytes())
+    assert (restored.current_question, restored.type_code, restored.bank) == (7, NO_TYPE, 123456)
+    assert restored.answers == session.answers
@@ -0,0 +1,68 @@
+"""
+/ws sessions against a small in-memory session store
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import app
+import engine
+from session_store import SessionStore
+
+client = TestClient(app.app)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """A store with room for two sessions, used by both /mcp and /ws"""
+    total = engine.default_runtime.total
+    store = SessionStore(total, memory_budget=2 * SessionStore(total).bytes_per_session())
+    assert store.max_sessions == 2
+    monkeypatch.setattr(engine, "session_store", store)
+    monkeypatch.setattr(app, "session_store", store)
+    return store
+
+
+def start_over_http(session_id: str):
+    assert client.post("/mcp", json={"action": "start", "context": {"session_id": session_id}}).status_code == 200
+
+
+def test_open_session_stays_in_use(store):
+    with client.websocket_connect("/ws?session_id=ws-a") as websocket:
+        assert websocket.receive_json()["context"]["current_question"] == 1
+        start_over_http("http-b")
+        websocket.send_text("4")
+        websocket.receive_json()
+        # ws-a was just used, so http-b is the least recently used session
+        start_over_http("http-c")
+        assert "http-b" not in store and "ws-a" in store
+        for _ in range(engine.default_runtime.total - 1):
+            websocket.send_text("4")
+            reply = websocket.receive_json()
+        assert "personality type" in reply["response"].lower() and store.get("ws-a").completed
+    assert store.completed_count() == 1
+    assert len(store) == 2
+
+
+def test_evicted_session_closes_the_connection(store):
+    with client.websocket_connect("/ws?session_id=ws-a") as websocket:
+        websocket.receive_json()
+        start_over_http("http-b")
+        start_over_http("http-c")
+        assert "ws-a" not in store
+        websocket.send_text("4")
+        assert "expired" in websocket.receive_json()["error"]
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1008
+    assert store.completed_count() == 0
+    assert len(store) == 2
+
+
+def test_completion_of_a_dropped_session_is_not_counted(store):
+    session = store.create("dropped")
+    store.delete("dropped")
+    session.type_code = 0
+    store.record_completion("dropped", session)
+    assert store.completed_count() == 0